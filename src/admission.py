@@ -0,0 +1,214 @@
+"""
+Zugangsbegrenzung für Stellbefehle der Web-API: Token-Buckets pro Client und pro Client und Servo
+sowie eine faire Warteschlange über alle Clients für die gemeinsame Befehlsrate.
+
+Ein Befehl wird sofort abgewiesen (429 mit Retry-After), wenn der Client sein Kontingent insgesamt
+oder für einen der Servos aufgebraucht hat oder die Warteschlange des Clients voll ist. Das
+Servo-Kontingent gilt pro Client, damit ein Skript, das einen Servo dauernd stellt, die anderen
+Clients (z.B. das Tablet) für diesen Servo nicht aussperrt. Zugelassene Befehle
+laufen sofort, solange die gemeinsame Rate frei ist; sonst werden sie pro Client eingereiht und
+reihum freigegeben, sodass ein Skript mit vielen Befehlen das Tablet nicht aushungert.
+Aufwand pro Befehl O(1) (bei Batch-Befehlen O(1) pro Servo).
+"""
+import math
+import time
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+
+import metrics
+
+REJECTED = metrics.counter('admission_rejected_total', 'Mit 429 abgewiesene Stellbefehle', ('scope',))
+QUEUE_WAIT = metrics.histogram('admission_queue_wait_seconds',
+                               'Wartezeit zugelassener Stellbefehle in der fairen Warteschlange')
+
+# Standardwerte, überschreibbar in config.json unter WEB.ADMISSION
+DEFAULTS = {
+    'ENABLED': True,
+    'CLIENT_RATE': 10.0,    # Befehle pro Sekunde und Client
+    'CLIENT_BURST': 20,
+    'SERVO_RATE': 2.0,      # Befehle pro Sekunde, Client und Servo
+    'SERVO_BURST': 4,
+    'GLOBAL_RATE': 50.0,    # Befehle pro Sekunde insgesamt, darüber wird fair eingereiht
+    'GLOBAL_BURST': 50,
+    'MAX_QUEUED': 8,        # wartende Befehle pro Client
+    'MAX_CLIENTS': 1024     # gemerkte Clients, der am längsten inaktive wird verworfen
+}
+
+
+class RateLimited(Exception):
+    """Befehl abgewiesen; retry_after in Sekunden, scope: 'client', 'servo' oder 'queue'"""
+
+    def __init__(self, scope, retry_after):
+        super().__init__(f"Zu viele Stellbefehle ({scope}), erneut versuchen in {retry_after:.2f} s")
+        self.scope = scope
+        self.retry_after = retry_after
+
+    @property
+    def retry_after_header(self):
+        """Wert für den Retry-After-Header (ganze Sekunden, mindestens 1)"""
+        return str(max(1, math.ceil(self.retry_after)))
+
+    def to_dict(self):
+        return {'error': str(self), 'scope': self.scope, 'retry_after': round(self.retry_after, 2)}
+
+
+class TokenBucket:
+    """Token-Bucket mit Nachfüllen beim Zugriff (keine Timer)"""
+
+    __slots__ = ('rate', 'burst', 'tokens', 'updated')
+
+    def __init__(self, rate, burst, now):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = now
+
+    def wait_time(self, cost, now):
+        """Sekunden, bis cost Token verfügbar sind (0: sofort); mehr als burst zählt als burst"""
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        missing = min(cost, self.burst) - self.tokens
+        return missing / self.rate if missing > 0 else 0.0
+
+    def take(self, cost):
+        self.tokens -= min(cost, self.burst)
+
+
+class AdmissionControl:
+    """Token-Buckets pro Client und pro (Client, Servo), faire Warteschlange (Round Robin) für die gemeinsame Rate"""
+
+    def __init__(self, num_servos, config=None):
+        """:param num_servos: Anzahl der Servos; nur für diese IDs werden Buckets angelegt"""
+        self.config = dict(DEFAULTS)
+        self.config.update(config or {})
+        now = time.monotonic()
+        self.num_servos = num_servos
+        # Client -> (TokenBucket, {Servo-ID: TokenBucket}), zuletzt aktive am Ende; mit dem Client
+        # werden auch seine Servo-Buckets verworfen
+        self._clients = OrderedDict()
+        self._global = TokenBucket(self.config['GLOBAL_RATE'], self.config['GLOBAL_BURST'], now)
+        self._queues = {}               # Client -> deque von (Future, Kosten, Einreihzeit)
+        self._ready = deque()           # Clients mit wartenden Befehlen in Round-Robin-Reihenfolge
+        self._queued = 0
+        self._admitted = 0
+        self._cond = threading.Condition()
+        self._thread = None
+        metrics.callback('admission_queue_depth', 'Stellbefehle in der fairen Warteschlange', lambda: self._queued)
+
+    @classmethod
+    def from_config(cls, num_servos, config):
+        """AdmissionControl aus WEB.ADMISSION oder None, wenn abgeschaltet"""
+        config = config or {}
+        if not config.get('ENABLED', DEFAULTS['ENABLED']):
+            return None
+        return cls(num_servos, config)
+
+    def _client_buckets(self, client, now):
+        """Bucket des Clients und Dict seiner Servo-Buckets (werden bei Bedarf angelegt)"""
+        entry = self._clients.get(client)
+        if entry is None:
+            entry = self._clients[client] = (
+                TokenBucket(self.config['CLIENT_RATE'], self.config['CLIENT_BURST'], now), {})
+            if len(self._clients) > self.config['MAX_CLIENTS']:
+                self._clients.popitem(last=False)
+        else:
+            self._clients.move_to_end(client)
+        return entry
+
+    def _servo_bucket(self, servos, servo_id, now):
+        """Bucket eines Clients für einen Servo"""
+        bucket = servos.get(servo_id)
+        if bucket is None:
+            bucket = servos[servo_id] = TokenBucket(self.config['SERVO_RATE'], self.config['SERVO_BURST'], now)
+        return bucket
+
+    def acquire(self, client, servo_ids):
+        """
+        Lässt einen Stellbefehl zu oder weist ihn ab
+        :param client: Kennung des Clients (IP-Adresse)
+        :param servo_ids: betroffene Servos (ein Token pro Servo)
+        :return: Future, erfüllt sobald der Befehl an der Reihe ist (Ergebnis: Wartezeit in Sekunden)
+        :raises RateLimited: Kontingent aufgebraucht oder Warteschlange des Clients voll
+        :raises ValueError: unbekannte Servo-ID (ohne Tokens zu verbrauchen)
+        """
+        now = time.monotonic()
+        cost = max(len(servo_ids), 1)
+        for servo_id in servo_ids:
+            # Unbekannte IDs legen keine Buckets an
+            if not 0 <= servo_id < self.num_servos:
+                raise ValueError(f"Ungültige Servo-Nummer: {servo_id}")
+        with self._cond:
+            client_bucket, servos = self._client_buckets(client, now)
+            servo_buckets = [self._servo_bucket(servos, servo_id, now) for servo_id in servo_ids]
+            wait, scope = client_bucket.wait_time(cost, now), 'client'
+            for bucket in servo_buckets:
+                servo_wait = bucket.wait_time(1, now)
+                if servo_wait > wait:
+                    wait, scope = servo_wait, 'servo'
+            queue = self._queues.get(client)
+            if not wait and queue is not None and len(queue) >= self.config['MAX_QUEUED']:
+                # Geschätzt: eigene wartende Befehle bei gleichem Anteil an der gemeinsamen Rate
+                wait, scope = len(queue) * len(self._ready) / self._global.rate, 'queue'
+            if wait:
+                REJECTED.inc(scope)
+                raise RateLimited(scope, wait)
+
+            client_bucket.take(cost)
+            for bucket in servo_buckets:
+                bucket.take(1)
+            future = Future()
+            if not self._ready and not self._global.wait_time(cost, now):
+                # Niemand wartet und die gemeinsame Rate ist frei
+                self._global.take(cost)
+                self._admitted += 1
+                future.set_result(0.0)
+                return future
+
+            if queue is None:
+                queue = self._queues[client] = deque()
+                self._ready.append(client)
+            queue.append((future, cost, now))
+            self._queued += 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._dispatch, name='admission', daemon=True)
+                self._thread.start()
+            self._cond.notify()
+        return future
+
+    def _dispatch(self):
+        """Gibt wartende Befehle reihum frei, sobald die gemeinsame Rate es erlaubt"""
+        while True:
+            with self._cond:
+                while not self._ready:
+                    self._cond.wait()
+                client = self._ready[0]
+                queue = self._queues[client]
+                future, cost, queued_at = queue[0]
+                now = time.monotonic()
+                wait = self._global.wait_time(cost, now)
+                if wait:
+                    self._cond.wait(wait)
+                    continue
+                self._global.take(cost)
+                queue.popleft()
+                self._ready.popleft()
+                if queue:
+                    # Nächster Befehl dieses Clients erst nach allen anderen wartenden Clients
+                    self._ready.append(client)
+                else:
+                    del self._queues[client]
+                self._queued -= 1
+                self._admitted += 1
+            QUEUE_WAIT.observe(now - queued_at)
+            future.set_result(now - queued_at)
+
+    def get_stats(self):
+        """Zugelassene und wartende Befehle, bekannte Clients"""
+        with self._cond:
+            return {
+                'admitted': self._admitted,
+                'queued': self._queued,
+                'waiting_clients': len(self._ready),
+                'clients': len(self._clients)
+            }
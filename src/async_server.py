@@ -0,0 +1,390 @@
+"""
+Web-Server auf Basis von aiohttp: eine einzige, dauerhaft laufende Event-Loop für alle Clients.
+
+Routen und JSON-Formate entsprechen dem Flask-Server (web_server.py). Blockierende Aufrufe
+des Controllers (Servo-Bewegungen) laufen in einem Thread-Pool; auf Statusänderungen
+(Long-Polling, Event-Stream) wartet die Loop ohne eigenen Thread pro Client.
+
+    python3 web_server.py --mode aiohttp
+"""
+import json
+import time
+import uuid
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from aiohttp import web
+
+import metrics
+from static_bundle import StaticBundle
+from admission import AdmissionControl, RateLimited
+
+from web_server import (get_ip_address, servo_summary, parse_batch, sse_event, setup_logging,
+                        SSE_KEEPALIVE, LONG_POLL_TIMEOUT, HTTP_SECONDS)
+
+logger = logging.getLogger('car_motion_system')
+
+# Threads für blockierende Controller-Aufrufe (gleichzeitig laufende Stellbefehle)
+EXECUTOR_WORKERS = 16
+
+def json_response(data, status=200):
+    return web.json_response(data, status=status, dumps=json.dumps)
+
+
+@web.middleware
+async def cors_middleware(request, handler):
+    """Erlaubt Anfragen von beliebigen Ursprüngen (wie flask_cors im Flask-Server)"""
+    if request.method == 'OPTIONS' and 'Access-Control-Request-Method' in request.headers:
+        response = web.Response()
+        response.headers['Access-Control-Allow-Methods'] = request.headers['Access-Control-Request-Method']
+        if 'Access-Control-Request-Headers' in request.headers:
+            response.headers['Access-Control-Allow-Headers'] = request.headers['Access-Control-Request-Headers']
+    else:
+        response = await handler(request)
+    response.headers['Access-Control-Allow-Origin'] = '*'
+    return response
+
+
+@web.middleware
+async def metrics_middleware(request, handler):
+    """Erfasst die Bearbeitungszeit pro Route (gleiche Metrik wie im Flask-Server)"""
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await handler(request)
+        status = response.status
+        return response
+    except web.HTTPException as e:
+        status = e.status
+        raise
+    finally:
+        resource = request.match_info.route.resource
+        route = resource.canonical if resource is not None else 'unmatched'
+        HTTP_SECONDS.observe(time.perf_counter() - started, request.method, route, str(status))
+
+
+class StateWatcher:
+    """
+    Überträgt Statusänderungen des Controllers in die Event-Loop: ein Hintergrund-Thread wartet
+    auf neue Versionen, Coroutinen warten auf ein asyncio.Event, das bei jeder Änderung ausgelöst wird
+    """
+
+    def __init__(self, controller, loop):
+        self.controller = controller
+        self.loop = loop
+        self._changed = asyncio.Event()
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name='state-watcher', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        version = self.controller.get_state_version()
+        while self._running:
+            snapshot = self.controller.wait_for_state_change(version, timeout=1.0)
+            if snapshot is None:
+                continue
+            version = snapshot.version
+            try:
+                self.loop.call_soon_threadsafe(self._notify)
+            except RuntimeError:
+                # Loop bereits geschlossen
+                break
+
+    def _notify(self):
+        # Wartende wecken und für die nächste Änderung ein neues Event bereitstellen
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    async def wait_for_change(self, version, timeout):
+        """Wartet bis der Status neuer als version ist; liefert den neuen Snapshot oder None (Timeout)"""
+        deadline = self.loop.time() + timeout
+        while True:
+            snapshot = self.controller.get_all_servo_status()
+            if snapshot.version > version:
+                return snapshot
+            remaining = deadline - self.loop.time()
+            if remaining <= 0:
+                return None
+            try:
+                await asyncio.wait_for(self._changed.wait(), remaining)
+            except asyncio.TimeoutError:
+                return None
+
+    def stop(self):
+        self._running = False
+
+
+class AsyncWebServer:
+    def __init__(self, servo_controller):
+        self.servo_controller = servo_controller
+        setup_logging(self.servo_controller.config.get('LOGGING'))
+
+        # Gleiche ETag-Bildung wie im Flask-Server (Prozess-Kennung und Status-Version)
+        self.etag_prefix = uuid.uuid4().hex[:8]
+        self._servos_body = (None, None)
+        self.static_bundle = StaticBundle()
+        self.admission = AdmissionControl.from_config(
+            self.servo_controller.num_servos, self.servo_controller.config.get('WEB', {}).get('ADMISSION'))
+        self.executor = ThreadPoolExecutor(max_workers=EXECUTOR_WORKERS, thread_name_prefix='web-hw')
+        self.watcher = None
+
+        self.app = web.Application(middlewares=[metrics_middleware, cors_middleware])
+        self.app.on_startup.append(self._on_startup)
+        self.app.on_cleanup.append(self._on_cleanup)
+        self.setup_routes()
+
+    async def _on_startup(self, app):
+        self.watcher = StateWatcher(self.servo_controller, asyncio.get_running_loop())
+
+    async def _on_cleanup(self, app):
+        if self.watcher is not None:
+            self.watcher.stop()
+        self.executor.shutdown(wait=False)
+
+    def run_blocking(self, func, *args):
+        """Führt einen blockierenden Controller-Aufruf im Thread-Pool aus"""
+        return asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+
+    async def wait_for_version(self, request):
+        """Long-Polling wie im Flask-Server: bei ?since=<version> warten bis der Status neuer ist"""
+        controller = self.servo_controller
+        since = request.query.get('since')
+        if since is not None:
+            try:
+                since = int(since)
+            except ValueError:
+                since = None
+        if since is not None:
+            try:
+                timeout = float(request.query.get('timeout', LONG_POLL_TIMEOUT))
+            except ValueError:
+                timeout = LONG_POLL_TIMEOUT
+            await self.watcher.wait_for_change(since, min(max(timeout, 0), LONG_POLL_TIMEOUT))
+        return controller.get_all_servo_status()
+
+    def conditional_response(self, request, snapshot, build_body):
+        """Antwort mit ETag/Version; 304 ohne Body, wenn der Client diesen Stand schon hat"""
+        etag = f"{self.etag_prefix}-{snapshot.version}"
+        if_none_match = request.if_none_match
+        if if_none_match and any(tag.value in (etag, '*') for tag in if_none_match):
+            response = web.Response(status=304)
+        else:
+            response = web.Response(text=build_body(), content_type='application/json')
+        response.etag = etag
+        response.headers['X-State-Version'] = str(snapshot.version)
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
+
+    async def admit(self, request, servo_ids):
+        """Zugangsbegrenzung wie im Flask-Server; wartet in der Loop statt in einem Thread"""
+        if self.admission is not None:
+            await asyncio.wrap_future(self.admission.acquire(request.remote, servo_ids))
+
+    @staticmethod
+    def rate_limited_response(error):
+        """429 mit Retry-After"""
+        response = json_response(error.to_dict(), status=429)
+        response.headers['Retry-After'] = error.retry_after_header
+        return response
+
+    def static_response(self, request, asset):
+        """Vorberechnete Variante einer Datei passend zu Accept-Encoding (304 bei passendem ETag)"""
+        status, headers, body = asset.respond(request.headers.get('Accept-Encoding'),
+                                              request.headers.get('If-None-Match'))
+        return web.Response(body=body or None, status=status, headers=headers)
+
+    def render_metrics(self):
+        """
+        Metriken dieses Prozesses plus die des Controller-Daemons, falls der Controller dort läuft
+        (gleichnamige Metriken wie log_queue_depth liefert dann der Daemon)
+        """
+        if not hasattr(self.servo_controller, 'get_metrics'):
+            return metrics.render()
+        remote = self.servo_controller.get_metrics()
+        return metrics.render(exclude=metrics.names(remote)) + remote
+
+    def servos_body(self, snapshot):
+        """JSON von /api/servos, einmal pro Status-Version erzeugt und für alle Clients wiederverwendet"""
+        version, body = self._servos_body
+        if version != snapshot.version:
+            servos = {str(i): servo_summary(state) for i, state in enumerate(snapshot)}
+            body = json.dumps(servos)
+            self._servos_body = (snapshot.version, body)
+        return body
+
+    def setup_routes(self):
+        routes = web.RouteTableDef()
+
+        @routes.get('/')
+        async def index(request):
+            return self.static_response(request, self.static_bundle.index)
+
+        @routes.get('/static/{filename:.+}')
+        async def static_file(request):
+            asset = self.static_bundle.get_static(request.match_info['filename'])
+            if asset is None:
+                return json_response({'error': 'Datei nicht gefunden'}, status=404)
+            return self.static_response(request, asset)
+
+        @routes.get('/metrics')
+        async def get_metrics(request):
+            """Zähler und Histogramme im Prometheus-Textformat"""
+            if hasattr(self.servo_controller, 'get_metrics'):
+                body = await self.run_blocking(self.render_metrics)
+            else:
+                body = self.render_metrics()
+            return web.Response(body=body.encode(), headers={'Content-Type': metrics.CONTENT_TYPE})
+
+        @routes.get('/api/ip')
+        async def ip(request):
+            """Liefert die IP-Adresse des Servers"""
+            return json_response({'ip': f"{get_ip_address()}:{request.url.port or 5000}"})
+
+        @routes.get('/api/servos')
+        async def get_servos(request):
+            """Liefert Status aller Servos (ETag/304, Long-Polling mit ?since=<version>)"""
+            try:
+                snapshot = await self.wait_for_version(request)
+                return self.conditional_response(request, snapshot, lambda: self.servos_body(snapshot))
+            except Exception as e:
+                logger.error("Fehler beim Abrufen der Servos: %s", e)
+                return json_response({'error': str(e)}, status=500)
+
+        @routes.get('/api/events')
+        async def servo_events(request):
+            """Server-Sent Events: zuerst 'snapshot', danach nur geänderte Servos als 'delta'"""
+            controller = self.servo_controller
+            last_id = request.headers.get('Last-Event-ID') or request.query.get('since')
+            base = None
+            if last_id is not None:
+                try:
+                    base = controller.get_state_at(int(last_id))
+                except ValueError:
+                    base = None
+
+            response = web.StreamResponse(headers={
+                'Content-Type': 'text/event-stream',
+                'Cache-Control': 'no-cache',
+                'X-Accel-Buffering': 'no'
+            })
+            await response.prepare(request)
+            try:
+                await response.write(b"retry: 2000\n\n")
+                while True:
+                    snapshot = await self.watcher.wait_for_change(
+                        base.version if base is not None else -1, SSE_KEEPALIVE
+                    )
+                    if snapshot is None:
+                        await response.write(b": keepalive\n\n")
+                        continue
+                    changed = snapshot.changed_since(base)
+                    event = 'delta' if base is not None else 'snapshot'
+                    base = snapshot
+                    if not changed:
+                        continue
+                    data = {str(i): servo_summary(snapshot[i]) for i in changed}
+                    await response.write(sse_event(event, data, snapshot.version).encode())
+            except ConnectionResetError:
+                # Client hat die Verbindung getrennt
+                pass
+            return response
+
+        @routes.post(r'/api/servo/{servo_id:\d+}')
+        async def set_servo(request):
+            """Setzt die Position eines Servos: sofort 202 mit dem Stellauftrag"""
+            servo_id = int(request.match_info['servo_id'])
+            try:
+                data = await request.json()
+                position = data.get('position')
+
+                if position not in ['left', 'right']:
+                    return json_response({'error': 'Ungültige Position'}, status=400)
+
+                # Servo-ID vor der Zugangsbegrenzung prüfen: ungültige Anfragen verbrauchen keine Tokens
+                if not 0 <= servo_id < self.servo_controller.num_servos:
+                    return json_response({'error': f"Ungültige Servo-Nummer: {servo_id}"}, status=400)
+
+                await self.admit(request, (servo_id,))
+                job = await self.run_blocking(self.servo_controller.submit_move, servo_id, position)
+                response = json_response({'status': 'accepted', 'job': job.to_dict()}, status=202)
+                response.headers['Location'] = f"/api/jobs/{job.id}"
+                return response
+
+            except RateLimited as e:
+                return self.rate_limited_response(e)
+            except ValueError as e:
+                return json_response({'error': str(e)}, status=400)
+            except Exception as e:
+                logger.error("Fehler beim Setzen von Servo %s: %s", servo_id, e)
+                return json_response({'error': str(e)}, status=500)
+
+        @routes.get(r'/api/jobs/{job_id:\d+}')
+        async def get_job(request):
+            """Status eines Stellauftrags; mit ?wait=<s> bis zum Abschluss warten"""
+            job = self.servo_controller.get_move_job(int(request.match_info['job_id']))
+            if job is None:
+                return json_response({'error': 'Auftrag nicht gefunden'}, status=404)
+            try:
+                wait = float(request.query.get('wait', 0))
+            except ValueError:
+                wait = 0
+            if wait > 0 and not job.finished:
+                done = asyncio.wrap_future(job.future)
+                # Fehler stehen im Auftrag; hier nur als abgerufen markieren
+                done.add_done_callback(lambda f: f.cancelled() or f.exception())
+                await asyncio.wait([done], timeout=min(wait, LONG_POLL_TIMEOUT))
+            return json_response(job.to_dict())
+
+        @routes.post('/api/servos/batch')
+        async def set_servos_batch(request):
+            """Setzt mehrere Servos mit einer Anfrage (Format wie im Flask-Server)"""
+            started = time.perf_counter()
+            try:
+                try:
+                    data = await request.json()
+                except ValueError:
+                    data = None
+                directions, errors = parse_batch(data, self.servo_controller.num_servos)
+                if errors:
+                    return json_response({'error': 'Ungültige Anfrage, kein Servo bewegt', 'errors': errors}, status=400)
+
+                await self.admit(request, list(directions))
+                results = await self.run_blocking(self.servo_controller.move_servos, directions)
+                failed = sum(1 for result in results.values() if result.get('status') != 'success')
+                return json_response({
+                    'status': 'success' if not failed else ('error' if failed == len(results) else 'partial'),
+                    'results': {str(servo_id): result for servo_id, result in results.items()},
+                    'wall_time_ms': round((time.perf_counter() - started) * 1000, 1)
+                })
+
+            except RateLimited as e:
+                return self.rate_limited_response(e)
+            except Exception as e:
+                logger.error("Fehler beim Setzen mehrerer Servos: %s", e)
+                return json_response({'error': str(e)}, status=500)
+
+        @routes.get(r'/api/servo/{servo_id:\d+}')
+        async def get_servo(request):
+            """Liefert Status eines Servos"""
+            servo_id = int(request.match_info['servo_id'])
+            try:
+                if servo_id >= self.servo_controller.num_servos:
+                    return json_response({'status': 'unavailable', 'message': 'Servo nicht verfügbar (kein Board für diesen Kanal)'})
+
+                snapshot = await self.wait_for_version(request)
+                return self.conditional_response(request, snapshot, lambda: json.dumps(snapshot[servo_id].to_dict()))
+            except Exception as e:
+                return json_response({'status': 'error', 'message': str(e)})
+
+        self.app.add_routes(routes)
+
+
+def run_async_server(servo_controller, host='0.0.0.0', port=5000, admission=True):
+    """Startet den aiohttp-Server (blockiert bis zum Beenden)"""
+    server = AsyncWebServer(servo_controller)
+    if not admission:
+        server.admission = None
+    logger.info(f"Car Motion System (aiohttp) startet auf http://{get_ip_address()}:{port}")
+    web.run_app(server.app, host=host, port=port, print=None)
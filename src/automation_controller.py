@@ -44,38 +44,59 @@ class AutomationController:
             pattern_func()
             time.sleep(1)  # Pause zwischen Durchläufen
             
+    @property
+    def num_servos(self):
+        """Anzahl der Servos über alle Boards"""
+        return getattr(self.servo_controller, 'num_servos', 16)
+
+    def _move(self, servo_id, direction):
+        """Startet eine Bewegung ohne auf das Einschwingen zu warten; Fehler werden nur protokolliert"""
+        try:
+            job = self.servo_controller.submit_move(servo_id, direction)
+        except Exception as e:
+            self.servo_controller.logger.error("Automation: Servo %s nicht bewegt: %s", servo_id, e)
+            return
+        job.future.add_done_callback(lambda future: self._on_move_done(servo_id, future))
+
+    def _on_move_done(self, servo_id, future):
+        """Callback nach dem Einschwingen (läuft im Thread der Motion-Engine)"""
+        error = None if future.cancelled() else future.exception()
+        if error is not None:
+            self.servo_controller.logger.error("Automation: Bewegung von Servo %s fehlgeschlagen: %s",
+                                               servo_id, error)
+
     def _pattern_left_to_right(self):
         """Muster: Von links nach rechts"""
-        for i in range(16):
+        for i in range(self.num_servos):
             if not self.running:
                 break
-            self.servo_controller.move_servo(i, 'right')
+            self._move(i, 'right')
             time.sleep(0.5)
             
     def _pattern_right_to_left(self):
         """Muster: Von rechts nach links"""
-        for i in range(15, -1, -1):
+        for i in range(self.num_servos - 1, -1, -1):
             if not self.running:
                 break
-            self.servo_controller.move_servo(i, 'left')
+            self._move(i, 'left')
             time.sleep(0.5)
             
     def _pattern_alternate(self):
         """Muster: Abwechselnd links und rechts"""
-        for i in range(16):
+        for i in range(self.num_servos):
             if not self.running:
                 break
             direction = 'left' if i % 2 == 0 else 'right'
-            self.servo_controller.move_servo(i, direction)
+            self._move(i, direction)
             time.sleep(0.5)
             
     def _pattern_random(self):
         """Muster: Zufällige Bewegungen"""
         import random
-        for i in range(16):
+        for i in range(self.num_servos):
             if not self.running:
                 break
             direction = random.choice(['left', 'right'])
-            servo = random.randint(0, 15)
-            self.servo_controller.move_servo(servo, direction)
+            servo = random.randint(0, self.num_servos - 1)
+            self._move(servo, direction)
             time.sleep(0.5)
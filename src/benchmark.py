@@ -0,0 +1,397 @@
+"""
+Benchmark für den Befehlspfad von HTTP bis zum Register-Schreibzugriff.
+
+Läuft gegen das simulierte Backend (sim_backend.py) und misst Durchsatz,
+Latenz-Perzentile und Speicher-Allokationen pro Aufruf. Ergebnisse werden
+als JSON gespeichert und können mit früheren Läufen verglichen werden:
+
+    python3 benchmark.py --output bench.json
+    python3 benchmark.py --compare bench_alt.json
+"""
+import os
+import sys
+import json
+import math
+import time
+import argparse
+import platform
+import subprocess
+import tracemalloc
+import types
+from datetime import datetime
+
+# Immer gegen die Simulation messen
+os.environ.setdefault('WEICHEN_BACKEND', 'sim')
+
+SCENARIOS = {}
+
+
+def scenario(name, layer):
+    """Registriert eine Benchmark-Funktion: setup(ctx) -> Callable ohne Argumente"""
+    def decorator(func):
+        SCENARIOS[name] = (layer, func)
+        return func
+    return decorator
+
+
+def percentile(sorted_values, pct):
+    """Perzentil aus einer sortierten Liste (nearest rank)"""
+    if not sorted_values:
+        return 0.0
+    return sorted_values[max(0, math.ceil(pct * len(sorted_values) / 100.0) - 1)]
+
+
+class BenchContext:
+    """Gemeinsame Objekte für alle Szenarien (Controller, Flask-Client, ...)"""
+
+    def __init__(self):
+        self._controller = None
+        self._client = None
+
+    @property
+    def controller(self):
+        if self._controller is None:
+            from servokit_controller import ServoKitController
+            self._controller = ServoKitController()
+        return self._controller
+
+    @property
+    def client(self):
+        if self._client is None:
+            import web_server
+            server = web_server.WebServer(self.controller)
+            # Gemessen wird der Befehlspfad; die Zugangsbegrenzung misst admission_acquire
+            server.admission = None
+            self._client = web_server.app.test_client()
+        return self._client
+
+    def close(self):
+        if self._controller is not None:
+            self._controller.cleanup()
+
+
+# --- Szenarien ---
+
+@scenario('move_servo', 'controller')
+def bench_move_servo(ctx):
+    controller = ctx.controller
+    state = {'i': 0}
+
+    def call():
+        i = state['i']
+        state['i'] = i + 1
+        controller.move_servo(i % 16, 'left' if (i // 16) % 2 == 0 else 'right')
+    return call
+
+
+@scenario('move_servo_repeat', 'controller')
+def bench_move_servo_repeat(ctx):
+    controller = ctx.controller
+
+    def call():
+        controller.move_servo(0, 'left')
+    return call
+
+
+@scenario('set_angle', 'controller')
+def bench_set_angle(ctx):
+    controller = ctx.controller
+    state = {'flip': False}
+
+    def call():
+        state['flip'] = not state['flip']
+        controller.set_angle(0, 60.0 if state['flip'] else 120.0)
+    return call
+
+
+@scenario('set_angles_16', 'controller')
+def bench_set_angles_16(ctx):
+    controller = ctx.controller
+    state = {'flip': False}
+
+    def call():
+        state['flip'] = not state['flip']
+        angle = 60.0 if state['flip'] else 120.0
+        controller.set_angles({i: angle for i in range(16)})
+    return call
+
+
+def _automation_scenario(pattern):
+    def setup(ctx):
+        import automation_controller
+        # Pausen zwischen den Bewegungen entfernen: gemessen wird nur der Befehlspfad
+        automation_controller.time = types.SimpleNamespace(sleep=lambda s: None, time=time.time)
+        automation = automation_controller.AutomationController(ctx.controller)
+        automation.running = True
+        pattern_func = automation.pattern_functions[pattern]
+        return pattern_func
+    return setup
+
+
+for _pattern in ('left_to_right', 'right_to_left', 'alternate', 'random'):
+    scenario(f'automation_{_pattern}', 'automation')(_automation_scenario(_pattern))
+
+
+@scenario('http_get_servos', 'http')
+def bench_http_get_servos(ctx):
+    client = ctx.client
+
+    def call():
+        response = client.get('/api/servos')
+        assert response.status_code == 200, response.status_code
+    return call
+
+
+@scenario('http_get_servos_304', 'http')
+def bench_http_get_servos_304(ctx):
+    client = ctx.client
+    etag = client.get('/api/servos').headers['ETag']
+
+    def call():
+        response = client.get('/api/servos', headers={'If-None-Match': etag})
+        assert response.status_code == 304, response.status_code
+    return call
+
+
+@scenario('http_get_servo', 'http')
+def bench_http_get_servo(ctx):
+    client = ctx.client
+    state = {'i': 0}
+
+    def call():
+        state['i'] += 1
+        response = client.get(f"/api/servo/{state['i'] % 16}")
+        assert response.status_code == 200, response.status_code
+    return call
+
+
+@scenario('http_post_servo', 'http')
+def bench_http_post_servo(ctx):
+    client = ctx.client
+    state = {'i': 0}
+
+    def call():
+        i = state['i']
+        state['i'] = i + 1
+        position = 'left' if (i // 16) % 2 == 0 else 'right'
+        response = client.post(f'/api/servo/{i % 16}', json={'position': position})
+        assert response.status_code < 300, response.status_code
+    return call
+
+
+@scenario('http_post_batch_16', 'http')
+def bench_http_post_batch_16(ctx):
+    client = ctx.client
+    state = {'i': 0}
+
+    def call():
+        state['i'] += 1
+        position = 'left' if state['i'] % 2 else 'right'
+        response = client.post('/api/servos/batch', json={str(i): position for i in range(16)})
+        assert response.status_code == 200, response.status_code
+    return call
+
+
+@scenario('admission_acquire', 'http')
+def bench_admission_acquire(ctx):
+    """Zugangsprüfung eines Stellbefehls (Token-Buckets für Client und Servo, schneller Pfad)"""
+    from admission import AdmissionControl
+    admission = AdmissionControl(16, {'CLIENT_RATE': 1e9, 'CLIENT_BURST': 1e9, 'SERVO_RATE': 1e9,
+                                  'SERVO_BURST': 1e9, 'GLOBAL_RATE': 1e9, 'GLOBAL_BURST': 1e9})
+    state = {'i': 0}
+
+    def call():
+        state['i'] += 1
+        admission.acquire(f"10.0.0.{state['i'] % 200}", (state['i'] % 16,)).result()
+    return call
+
+
+def _log_handler(ctx):
+    """Datei-Handler wie im Web-Server (RotatingFileHandler), aber in einem temporären Verzeichnis"""
+    import logging
+    import tempfile
+    from logging.handlers import RotatingFileHandler
+    handler = RotatingFileHandler(os.path.join(tempfile.mkdtemp(prefix='bench_log_'), 'bench.log'),
+                                  maxBytes=1024 * 1024, backupCount=1)
+    handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+    return handler
+
+
+@scenario('log_move_sync', 'logging')
+def bench_log_move_sync(ctx):
+    """Bisheriges Logging pro Bewegung: DEBUG-Level, f-Strings, json.dumps, Datei-I/O im Aufrufer"""
+    import logging
+    logger = logging.getLogger('bench_log_sync')
+    logger.setLevel(logging.DEBUG)
+    logger.propagate = False
+    logger.handlers = [_log_handler(ctx)]
+    servo_data = {'id': 3, 'gpio': 3, 'left_angle': 45, 'right_angle': 135, 'min_pulse': 500, 'max_pulse': 2500}
+
+    def call():
+        logger.info(f"Bewege Servo {3} nach {'left'} (Winkel: {45.0}°)")
+        logger.debug(f"Servo-Konfiguration: {json.dumps(servo_data, indent=2)}")
+    return call
+
+
+def _log_queue_scenario(sample_rate):
+    def setup(ctx):
+        import logging
+        import log_queue
+        from log_queue import LazyJson
+        logger = logging.getLogger(f'bench_log_queue_{sample_rate}')
+        log_queue.attach(logger, _log_handler(ctx), level=logging.INFO, sample_rate=sample_rate)
+        servo_data = {'id': 3, 'gpio': 3, 'left_angle': 45, 'right_angle': 135, 'min_pulse': 500, 'max_pulse': 2500}
+
+        def call():
+            logger.info("Bewege Servo %s nach %s (Winkel: %s°)", 3, 'left', 45.0)
+            logger.debug("Servo-Konfiguration: %s", LazyJson(servo_data))
+        return call
+    return setup
+
+
+scenario('log_move_queue', 'logging')(_log_queue_scenario(1))
+scenario('log_move_queue_sampled', 'logging')(_log_queue_scenario(10))
+
+
+# --- Messung ---
+
+def run_scenario(name, ctx, iterations, warmup):
+    """Führt ein Szenario aus und liefert die Messwerte als Dict"""
+    layer, setup = SCENARIOS[name]
+    call = setup(ctx)
+
+    for _ in range(warmup):
+        call()
+
+    # Latenz und Durchsatz (ohne tracemalloc, das die Messung verfälschen würde)
+    latencies = []
+    perf_counter = time.perf_counter
+    started = perf_counter()
+    for _ in range(iterations):
+        t0 = perf_counter()
+        call()
+        latencies.append(perf_counter() - t0)
+    total = perf_counter() - started
+    latencies.sort()
+
+    # Allokationen pro Aufruf in einem separaten Durchlauf
+    alloc_iterations = max(1, min(iterations, 50))
+    tracemalloc.start()
+    peak_sum = 0
+    blocks_before = sys.getallocatedblocks()
+    for _ in range(alloc_iterations):
+        tracemalloc.reset_peak()
+        base, _ = tracemalloc.get_traced_memory()
+        call()
+        _, peak = tracemalloc.get_traced_memory()
+        peak_sum += peak - base
+    blocks_after = sys.getallocatedblocks()
+    tracemalloc.stop()
+
+    return {
+        'layer': layer,
+        'iterations': iterations,
+        'total_s': total,
+        'throughput_ops': iterations / total if total > 0 else 0.0,
+        'mean_ms': sum(latencies) / len(latencies) * 1000,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p95_ms': percentile(latencies, 95) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+        'max_ms': latencies[-1] * 1000,
+        'alloc_peak_bytes_per_call': peak_sum / alloc_iterations,
+        'alloc_blocks_retained_per_call': (blocks_after - blocks_before) / alloc_iterations
+    }
+
+
+def git_revision():
+    """Liefert den aktuellen Git-Commit, falls verfügbar"""
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except Exception:
+        return None
+
+
+def print_results(results):
+    """Gibt die Ergebnisse als Tabelle aus"""
+    header = f"{'Szenario':<28}{'ops/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'alloc B':>10}"
+    print(header)
+    print('-' * len(header))
+    for name, r in results.items():
+        print(f"{name:<28}{r['throughput_ops']:>10.1f}{r['p50_ms']:>10.3f}{r['p95_ms']:>10.3f}"
+              f"{r['p99_ms']:>10.3f}{r['alloc_peak_bytes_per_call']:>10.0f}")
+
+
+def print_comparison(results, baseline):
+    """Vergleicht Ergebnisse mit einem früheren Lauf"""
+    print()
+    print(f"Vergleich mit {baseline.get('revision') or '?'} ({baseline.get('timestamp', '?')})")
+    header = f"{'Szenario':<28}{'ops/s':>12}{'p50':>12}{'p99':>12}"
+    print(header)
+    print('-' * len(header))
+    for name, r in results.items():
+        old = baseline.get('results', {}).get(name)
+        if not old:
+            continue
+
+        def ratio(new, previous):
+            return f"{(new / previous - 1) * 100:+.1f}%" if previous else 'n/a'
+        print(f"{name:<28}{ratio(r['throughput_ops'], old['throughput_ops']):>12}"
+              f"{ratio(r['p50_ms'], old['p50_ms']):>12}{ratio(r['p99_ms'], old['p99_ms']):>12}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark für den Servo-Befehlspfad (simuliertes Backend)')
+    parser.add_argument('scenarios', nargs='*', help=f"Szenarien (Standard: alle): {', '.join(SCENARIOS)}")
+    parser.add_argument('-n', '--iterations', type=int, default=200, help='Messungen pro Szenario')
+    parser.add_argument('--warmup', type=int, default=10, help='Aufwärm-Durchläufe pro Szenario')
+    parser.add_argument('--no-realtime', action='store_true', help='I2C-Latenz nur mitzählen statt abwarten')
+    parser.add_argument('-o', '--output', help='Ergebnisse als JSON speichern')
+    parser.add_argument('--compare', help='Mit früherem JSON-Ergebnis vergleichen')
+    args = parser.parse_args(argv)
+
+    names = args.scenarios or list(SCENARIOS)
+    unknown = [n for n in names if n not in SCENARIOS]
+    if unknown:
+        parser.error(f"Unbekannte Szenarien: {', '.join(unknown)}")
+
+    if args.no_realtime:
+        import sim_backend
+        sim_backend.DEFAULT_SIM_CONFIG['REALTIME'] = False
+
+    ctx = BenchContext()
+    results = {}
+    try:
+        for name in names:
+            iterations = args.iterations
+            if SCENARIOS[name][0] == 'automation':
+                iterations = max(1, iterations // 16)
+            results[name] = run_scenario(name, ctx, iterations, args.warmup)
+    finally:
+        ctx.close()
+
+    report = {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'realtime_bus': not args.no_realtime,
+        'results': results
+    }
+
+    print_results(results)
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            print_comparison(results, json.load(f))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=4)
+        print(f"\nErgebnisse gespeichert in {args.output}")
+    return report
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,180 @@
+import queue
+import threading
+import logging
+from concurrent.futures import Future
+
+from hardware import create_i2c_bus, create_servokit
+from pca9685_batch import PCA9685BatchWriter
+
+# Standard: ein Board an Adresse 0x40 auf I2C-Bus 1
+DEFAULT_BOARDS = [{'address': 0x40, 'bus': 1, 'channels': 16}]
+
+
+def parse_address(address):
+    """Akzeptiert I2C-Adressen als Zahl oder als String ('0x41')"""
+    if isinstance(address, str):
+        return int(address, 0)
+    return int(address)
+
+
+class Board:
+    """Ein PCA9685-Board mit seinem Ausschnitt des globalen Kanalraums"""
+
+    __slots__ = ('index', 'bus_id', 'address', 'first_channel', 'channels', 'kit', 'writer')
+
+    def __init__(self, index, bus_id, address, first_channel, channels, kit, writer):
+        self.index = index
+        self.bus_id = bus_id
+        self.address = address
+        self.first_channel = first_channel
+        self.channels = channels
+        self.kit = kit
+        self.writer = writer
+
+
+class BusWorker:
+    """Eigener Thread pro I2C-Bus: Aufträge eines Busses laufen seriell, verschiedene Busse parallel"""
+
+    def __init__(self, bus_id, logger=None):
+        self.bus_id = bus_id
+        self.logger = logger or logging.getLogger('servo_controller')
+        self._queue = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, name=f'i2c-bus-{bus_id}')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def submit(self, func, *args):
+        """Reiht einen Auftrag ein und liefert ein Future"""
+        future = Future()
+        self._queue.put((future, func, args))
+        return future
+
+    def stop(self):
+        """Beendet den Worker nach den bereits eingereihten Aufträgen"""
+        self._queue.put(None)
+        self._thread.join(timeout=1.0)
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            future, func, args = item
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(func(*args))
+            except Exception as e:
+                self.logger.error(f"Fehler auf I2C-Bus {self.bus_id}: {e}")
+                future.set_exception(e)
+
+
+class BoardManager:
+    """Verwaltet mehrere PCA9685-Boards und bildet einen globalen Kanalraum darauf ab"""
+
+    def __init__(self, board_configs=None, frequency=50, backend='servokit', sim_config=None, logger=None):
+        self.logger = logger or logging.getLogger('servo_controller')
+        self.boards = []
+        self.buses = {}
+        self.bus_locks = {}
+        self._boards_by_bus = {}
+        self._channel_map = []
+        self._workers = {}
+
+        first_channel = 0
+        for index, board_config in enumerate(board_configs or DEFAULT_BOARDS):
+            bus_id = int(board_config.get('bus', 1))
+            address = parse_address(board_config.get('address', 0x40 + index))
+            channels = int(board_config.get('channels', 16))
+
+            if bus_id not in self.buses:
+                self.buses[bus_id] = create_i2c_bus(bus_id, backend=backend, sim_config=sim_config)
+                # Eine Sperre pro Bus: alle Zugriffe auf Boards dieses Busses laufen seriell
+                self.bus_locks[bus_id] = threading.RLock()
+            kit = create_servokit(channels=channels, address=address, frequency=frequency,
+                                  i2c=self.buses[bus_id], backend=backend, sim_config=sim_config)
+            writer = PCA9685BatchWriter(kit._pca, channels=channels, logger=self.logger,
+                                        lock=self.bus_locks[bus_id])
+            board = Board(index, bus_id, address, first_channel, channels, kit, writer)
+            self.boards.append(board)
+            self._boards_by_bus.setdefault(bus_id, []).append(board)
+
+            # Globaler Kanal -> (Board, lokaler Kanal): Lookup in O(1)
+            for local in range(channels):
+                self._channel_map.append((board, local))
+            first_channel += channels
+
+            self.logger.info(f"Board {index}: Bus {bus_id}, Adresse 0x{address:02x}, "
+                             f"Kanäle {board.first_channel}-{first_channel - 1}")
+
+        # Worker nur, wenn tatsächlich mehrere Busse parallel bedient werden müssen
+        if len(self.buses) > 1:
+            for bus_id in self.buses:
+                self._workers[bus_id] = BusWorker(bus_id, logger=self.logger)
+
+    @property
+    def channel_count(self):
+        """Anzahl aller Kanäle über alle Boards"""
+        return len(self._channel_map)
+
+    def locate(self, channel):
+        """Liefert (Board, lokaler Kanal) für einen globalen Kanal"""
+        if not 0 <= channel < len(self._channel_map):
+            raise ValueError(f"Ungültige Servo-ID: {channel}")
+        return self._channel_map[channel]
+
+    def get_kit(self, index):
+        """Liefert das ServoKit eines Boards oder None"""
+        if 0 <= index < len(self.boards):
+            return self.boards[index].kit
+        return None
+
+    def stage(self, channel, duty_cycle):
+        """Merkt einen Duty-Cycle für einen globalen Kanal vor"""
+        board, local = self._channel_map[channel]
+        board.writer.stage(local, duty_cycle)
+
+    def stage_many(self, duty_cycles):
+        """Merkt mehrere Duty-Cycles vor ({globaler Kanal: Duty-Cycle})"""
+        channel_map = self._channel_map
+        for channel, duty_cycle in duty_cycles.items():
+            board, local = channel_map[channel]
+            board.writer.stage(local, duty_cycle)
+
+    def flush(self):
+        """Schreibt alle vorgemerkten Kanäle; Boards auf verschiedenen Bussen parallel"""
+        if not self._workers:
+            for board in self.boards:
+                board.writer.flush()
+            return
+
+        futures = []
+        for bus_id, worker in self._workers.items():
+            boards = [b for b in self._boards_by_bus[bus_id] if b.writer.has_pending()]
+            if boards:
+                futures.append(worker.submit(self._flush_boards, boards))
+        for future in futures:
+            future.result()
+
+    @staticmethod
+    def _flush_boards(boards):
+        for board in boards:
+            board.writer.flush()
+
+    def get_stats(self):
+        """Summierte Schreibstatistik aller Boards plus Einzelwerte pro Board"""
+        totals = {'transactions': 0, 'writes_issued': 0, 'writes_skipped': 0, 'writes_filler': 0}
+        per_board = []
+        for board in self.boards:
+            stats = board.writer.get_stats()
+            for key in totals:
+                totals[key] += stats[key]
+            per_board.append(dict(stats, board=board.index, bus=board.bus_id, address=board.address))
+        totals['boards'] = per_board
+        return totals
+
+    def stop(self):
+        """Beendet alle Bus-Worker"""
+        for worker in self._workers.values():
+            worker.stop()
+        self._workers = {}
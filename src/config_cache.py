@@ -0,0 +1,121 @@
+import json
+import os
+import time
+import logging
+import tempfile
+
+
+class ConfigCache:
+    """Hält die config.json im Speicher und lädt sie nur bei Änderungen neu"""
+
+    def __init__(self, config_file, check_interval=1.0, logger=None):
+        """Initialisiert den Cache für die angegebene Config-Datei"""
+        self.config_file = config_file
+        self.check_interval = check_interval
+        self.logger = logger or logging.getLogger('servo_controller')
+
+        self._config = {}
+        self._servos = {}
+        self._signature = None
+        self._bad_signature = None
+        self._last_check = 0.0
+        self.reload_count = 0
+
+    def _stat_signature(self):
+        """Liefert (inode, mtime_ns, size) der Config-Datei"""
+        st = os.stat(self.config_file)
+        return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+    def load(self):
+        """Lädt die Konfiguration von der Platte und baut den Servo-Index neu auf"""
+        if not os.path.exists(self.config_file):
+            self.logger.error("Config-Datei nicht gefunden: %s", self.config_file)
+            raise FileNotFoundError(f"Config-Datei nicht gefunden: {self.config_file}")
+
+        signature = self._stat_signature()
+        with open(self.config_file, 'r') as f:
+            config = json.load(f)
+
+        self._config = config
+        self._signature = signature
+        self._last_check = time.monotonic()
+        self.reload_count += 1
+        self.rebuild_index()
+
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug("Config-Datei geladen: %s", json.dumps(config, indent=2))
+        return config
+
+    def refresh(self):
+        """Lädt die Datei neu, falls sie sich seit dem letzten Laden geändert hat"""
+        now = time.monotonic()
+        if self._signature is not None and now - self._last_check < self.check_interval:
+            return False
+        self._last_check = now
+
+        try:
+            signature = self._stat_signature()
+        except OSError as e:
+            # Datei kurzzeitig nicht lesbar (z.B. während des Schreibens): alten Stand behalten
+            self.logger.warning("Config-Datei nicht lesbar, verwende Cache: %s", e)
+            return False
+
+        if signature == self._signature or signature == self._bad_signature:
+            return False
+
+        self.logger.info("Config-Datei wurde geändert, lade neu: %s", self.config_file)
+        try:
+            self.load()
+        except (OSError, ValueError) as e:
+            # Halb geschriebene oder fehlerhafte Datei: letzten gültigen Stand weiter verwenden,
+            # dieselbe Fassung aber nicht bei jeder Prüfung erneut parsen
+            self._bad_signature = signature
+            self.logger.error("Config-Datei fehlerhaft, verwende letzten gültigen Stand: %s", e)
+            return False
+        return True
+
+    def rebuild_index(self):
+        """Baut den nach Servo-ID indizierten Servo-Index neu auf"""
+        servos = self._config.get('SERVO_CONFIG', {}).get('SERVOS', [])
+        self._servos = {s['id']: s for s in servos if 'id' in s}
+
+    def save(self, config):
+        """Schreibt die Konfiguration atomar und übernimmt sie ohne erneutes Parsen in den Cache"""
+        # In eine temporäre Datei im selben Verzeichnis schreiben und dann ersetzen, damit Leser
+        # (auch andere Prozesse) nie eine halb geschriebene Datei sehen
+        directory = os.path.dirname(os.path.abspath(self.config_file))
+        fd, tmp_path = tempfile.mkstemp(prefix='.config-', suffix='.tmp', dir=directory)
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(config, f, indent=4)
+                f.flush()
+                os.fsync(f.fileno())
+            if os.path.exists(self.config_file):
+                os.chmod(tmp_path, os.stat(self.config_file).st_mode & 0o777)
+            os.replace(tmp_path, self.config_file)
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+        self._config = config
+        self._signature = self._stat_signature()
+        self._last_check = time.monotonic()
+        self.rebuild_index()
+
+    @property
+    def config(self):
+        """Aktuelle Konfiguration (ohne Prüfung auf Änderungen)"""
+        return self._config
+
+    @config.setter
+    def config(self, config):
+        """Ersetzt die Konfiguration im Speicher"""
+        self._config = config
+        self.rebuild_index()
+
+    def get_servo(self, servo_id):
+        """Liefert die Konfiguration eines Servos oder None"""
+        self.refresh()
+        return self._servos.get(servo_id)
@@ -0,0 +1,426 @@
+"""
+Client des Controller-Daemons (controller_daemon.py) für GUI und Web-Server.
+
+Befehle gehen als JSON-Zeilen über ein Unix-Domain-Socket an den Daemon, der als einziger
+Prozess die Hardware besitzt. Der Servo-Status wird per Abonnement gespiegelt: Leser
+(Snapshots, Versionen, Long-Polling) bedienen sich lokal ohne Round-Trip.
+"""
+import os
+import json
+import time
+import socket
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+import metrics
+from servo_state import ServoState, ServoStateStore
+
+# Umgebungsvariablen: Pfad des Sockets und Auswahl des Controllers ('auto', 'daemon' oder 'local')
+SOCKET_ENV = 'WEICHEN_SOCKET'
+CONTROLLER_ENV = 'WEICHEN_CONTROLLER'
+DEFAULT_SOCKET = '/tmp/weichensteuerung.sock'
+
+IPC_SECONDS = metrics.histogram('ipc_roundtrip_seconds', 'Round-Trip-Zeit eines Befehls an den Controller-Daemon',
+                                ('cmd',), buckets=metrics.I2C_BUCKETS + (0.1, 0.25, 0.5, 1.0, 5.0))
+
+# Anzahl abgeschlossener Aufträge, die für späte Abfragen im Client vorgehalten werden
+FINISHED_JOBS = 256
+
+# Der Daemon trennt Befehlsverbindungen nach so vielen Sekunden ohne Anfrage; der Client
+# verwendet freie Verbindungen nur wieder, solange sie höchstens halb so lange ungenutzt sind
+IDLE_TIMEOUT = 60
+# Freie Verbindungen im Pool des Clients; weitere werden nach der Anfrage geschlossen
+MAX_IDLE_CONNECTIONS = 4
+
+
+def socket_path():
+    """Pfad des Daemon-Sockets (Umgebungsvariable oder Standard)"""
+    return os.environ.get(SOCKET_ENV) or DEFAULT_SOCKET
+
+
+def encode(message):
+    """Eine Nachricht als JSON-Zeile"""
+    return (json.dumps(message, separators=(',', ':')) + '\n').encode()
+
+
+def create_controller():
+    """
+    Liefert den Controller für GUI und Web-Server: Client des Daemons, wenn er läuft
+    (bzw. bei WEICHEN_CONTROLLER=daemon zwingend), sonst einen eigenen ServoKitController.
+    Auf den eigenen Controller wird nur ausgewichen, wenn kein Daemon lauscht.
+    """
+    mode = (os.environ.get(CONTROLLER_ENV) or 'auto').lower()
+    if mode != 'local':
+        try:
+            return ControllerClient(connect_timeout=30.0 if mode == 'daemon' else 0)
+        except (FileNotFoundError, ConnectionRefusedError) as e:
+            # Kein Daemon (Socket fehlt oder ist verwaist): nur dann einen eigenen Controller erzeugen
+            if mode == 'daemon':
+                raise Exception(f"Controller-Daemon nicht erreichbar ({socket_path()}): {e}")
+        except OSError as e:
+            # Daemon läuft, aber Verbindung oder Abgleich scheitern: er besitzt weiterhin die Boards,
+            # ein zweiter Controller würde dieselben I2C-Geräte ansteuern
+            logging.getLogger('servo_controller').error(
+                "Controller-Daemon läuft, Verbindung fehlgeschlagen (%s): %s", socket_path(), e)
+            raise
+    from servokit_controller import ServoKitController
+    return ServoKitController()
+
+
+class _Connection:
+    """Eine Verbindung zum Daemon (aus dem Pool ausgeliehen, Anfragen laufen nacheinander)"""
+
+    def __init__(self, path, connect_timeout=0):
+        deadline = time.monotonic() + connect_timeout
+        while True:
+            self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                self.sock.connect(path)
+                break
+            except OSError:
+                self.sock.close()
+                if time.monotonic() >= deadline:
+                    raise
+                time.sleep(0.2)
+        self.rfile = self.sock.makefile('rb')
+        self._ids = 0
+        self.last_used = time.monotonic()
+
+    def send(self, message):
+        self.sock.sendall(encode(message))
+
+    def receive(self):
+        line = self.rfile.readline()
+        if not line:
+            raise ConnectionError("Verbindung zum Controller-Daemon getrennt")
+        return json.loads(line)
+
+    def call(self, cmd, args):
+        self._ids += 1
+        self.send({'id': self._ids, 'cmd': cmd, 'args': args})
+        return self.receive()
+
+    def close(self):
+        try:
+            self.rfile.close()
+            self.sock.close()
+        except OSError:
+            pass
+
+
+class RemoteMoveJob:
+    """Stellauftrag des Daemons (gleiche Schnittstelle wie move_jobs.MoveJob für den Web-Server)"""
+
+    __slots__ = ('id', '_data', 'future')
+
+    def __init__(self, data):
+        self.id = data['id']
+        self._data = data
+        self.future = Future()
+        self.update(data)
+
+    @property
+    def finished(self):
+        return self._data['status'] in ('settled', 'error')
+
+    def update(self, data):
+        """Übernimmt den aktuellen Stand; schließt das Future ab, sobald der Auftrag fertig ist"""
+        self._data = data
+        if self.finished and not self.future.done():
+            if data['status'] == 'error':
+                self.future.set_exception(Exception(data.get('error')))
+            else:
+                self.future.set_result(data.get('reached_angle', data['angle']))
+
+    def fail(self, error):
+        """Schließt einen offenen Auftrag mit Fehler ab (z.B. Verbindung zum Daemon getrennt)"""
+        if not self.future.done():
+            self._data = dict(self._data, status='error', error=str(error))
+            self.future.set_exception(error)
+
+    def to_dict(self):
+        return self._data
+
+
+class ControllerClient:
+    """Schnittstelle wie ServoKitController, ausgeführt im Controller-Daemon"""
+
+    def __init__(self, path=None, connect_timeout=0, sync_timeout=5.0):
+        """
+        :param path: Pfad des Daemon-Sockets (Standard: socket_path())
+        :param connect_timeout: So lange auf den Daemon warten (z.B. beim gemeinsamen Start)
+        """
+        self.path = path or socket_path()
+        self.logger = logging.getLogger('servo_controller')
+        self._idle = []                    # freie Verbindungen, zuletzt benutzte am Ende
+        self._lock = threading.Lock()
+        self._rtt = {}                     # Befehl -> [Anzahl, Summe, Maximum] in Sekunden
+        self._jobs = {}                    # Auftrags-ID -> RemoteMoveJob (offen)
+        self._finished_jobs = OrderedDict()
+        self._running = True
+
+        hello = self._call('hello', connect_timeout=connect_timeout)
+        self.num_servos = hello['num_servos']
+        self._config = hello['config']
+        self.servo_states = ServoStateStore(self.num_servos)
+
+        # Abonnement: spiegelt Status und abgeschlossene Aufträge des Daemons
+        self._synced = threading.Event()
+        self._listener = threading.Thread(target=self._listen, name='controller-client', daemon=True)
+        self._listener.start()
+        if not self._synced.wait(sync_timeout):
+            self.cleanup()
+            raise ConnectionError("Kein Status vom Controller-Daemon erhalten")
+        self.logger.info("Mit Controller-Daemon verbunden (%s, %s Servos)", self.path, self.num_servos)
+
+    # --- Befehle ---------------------------------------------------------------------------
+
+    def _checkout(self, connect_timeout=0):
+        """Leiht eine freie Verbindung aus dem Pool oder baut eine neue auf"""
+        stale = []
+        conn = None
+        with self._lock:
+            while self._idle:
+                candidate = self._idle.pop()
+                if time.monotonic() - candidate.last_used < IDLE_TIMEOUT / 2:
+                    conn = candidate
+                    break
+                stale.append(candidate)
+        for candidate in stale:
+            candidate.close()
+        return conn or _Connection(self.path, connect_timeout)
+
+    def _checkin(self, conn):
+        """Gibt eine Verbindung nach einer vollständigen Antwort an den Pool zurück"""
+        conn.last_used = time.monotonic()
+        with self._lock:
+            if self._running and len(self._idle) < MAX_IDLE_CONNECTIONS:
+                self._idle.append(conn)
+                return
+        conn.close()
+
+    def _call(self, cmd, *args, connect_timeout=0):
+        """Führt einen Befehl im Daemon aus und misst die Round-Trip-Zeit"""
+        started = time.perf_counter()
+        conn = self._checkout(connect_timeout)
+        try:
+            try:
+                response = conn.call(cmd, list(args))
+            except BrokenPipeError:
+                # Daemon wurde neu gestartet: Anfrage kam nicht an, einmal neu verbinden
+                conn.close()
+                conn = _Connection(self.path, connect_timeout)
+                response = conn.call(cmd, list(args))
+        except (OSError, ValueError):
+            conn.close()
+            raise
+        self._checkin(conn)
+        elapsed = time.perf_counter() - started
+        IPC_SECONDS.observe(elapsed, cmd)
+
+        with self._lock:
+            stats = self._rtt.get(cmd)
+            if stats is None:
+                self._rtt[cmd] = [1, elapsed, elapsed]
+            else:
+                stats[0] += 1
+                stats[1] += elapsed
+                if elapsed > stats[2]:
+                    stats[2] = elapsed
+
+        if not response.get('ok'):
+            error = response.get('error', 'Unbekannter Fehler im Controller-Daemon')
+            if response.get('type') == 'ValueError':
+                raise ValueError(error)
+            raise Exception(error)
+        return response.get('result')
+
+    def ping(self):
+        """Leerer Befehl; liefert die Round-Trip-Zeit in Sekunden"""
+        started = time.perf_counter()
+        self._call('ping')
+        return time.perf_counter() - started
+
+    def get_ipc_stats(self):
+        """Gemessene Round-Trip-Zeiten pro Befehl (Anzahl, Mittelwert und Maximum in ms)"""
+        with self._lock:
+            return {cmd: {'count': count, 'avg_ms': round(total / count * 1000, 3), 'max_ms': round(peak * 1000, 3)}
+                    for cmd, (count, total, peak) in self._rtt.items()}
+
+    def get_metrics(self):
+        """Metriken des Daemons (Hardware, Bewegungen) im Prometheus-Textformat"""
+        return self._call('metrics')
+
+    def move_servo(self, servo_id, direction):
+        """Bewegt einen Servo und wartet bis er eingeschwungen ist"""
+        return self._call('move_servo', servo_id, direction)
+
+    def move_servos(self, directions):
+        """Bewegt mehrere Servos gleichzeitig und wartet bis alle eingeschwungen sind"""
+        results = self._call('move_servos', {str(k): v for k, v in directions.items()})
+        return {int(k): v for k, v in results.items()}
+
+    def submit_move(self, servo_id, direction):
+        """Startet eine Bewegung ohne zu warten; liefert den Stellauftrag"""
+        return self._track(self._call('submit_move', servo_id, direction))
+
+    def submit_moves(self, directions):
+        """Startet Bewegungen für mehrere Servos ohne zu warten"""
+        jobs = self._call('submit_moves', {str(k): v for k, v in directions.items()})
+        return {int(k): self._track(job) for k, job in jobs.items()}
+
+    def get_move_job(self, job_id):
+        """Stellauftrag zu einer ID oder None"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            data = self._finished_jobs.get(job_id)
+        if job is not None:
+            return job
+        if data is None:
+            data = self._call('get_move_job', job_id)
+        return self._track(data) if data is not None else None
+
+    def _track(self, data):
+        """Erzeugt den Auftrag im Client; offene Aufträge schließt das Abonnement ab"""
+        job = RemoteMoveJob(data)
+        if job.finished:
+            return job
+        with self._lock:
+            finished = self._finished_jobs.get(job.id)
+            if finished is None:
+                job = self._jobs.setdefault(job.id, job)
+        if finished is not None:
+            job.update(finished)
+        return job
+
+    def get_servo_status(self, servo_id):
+        """Status eines Servos als Dict (aus dem gespiegelten Status)"""
+        state = self.servo_states.get(servo_id)
+        if state is None:
+            return self._call('get_servo_status', servo_id)
+        return state.to_dict()
+
+    def get_all_servo_status(self):
+        """Konsistenter Status aller Servos (lokaler Spiegel, ohne Round-Trip)"""
+        return self.servo_states.snapshot()
+
+    def get_state_version(self):
+        return self.servo_states.version
+
+    def get_state_at(self, version):
+        return self.servo_states.snapshot_at(version)
+
+    def wait_for_state_change(self, version, timeout=None):
+        return self.servo_states.wait_for_change(version, timeout)
+
+    def write_angle(self, servo_num, angle):
+        """Schreibt einen Winkel sofort (ohne Interpolation)"""
+        return self._call('write_angle', servo_num, angle)
+
+    def update_servo_config(self, servo_id, config_data):
+        """Aktualisiert und speichert die Konfiguration eines Servos im Daemon"""
+        result = self._call('update_servo_config', servo_id, config_data)
+        self._config = self._call('get_config')
+        return result
+
+    @property
+    def config(self):
+        """Konfiguration des Daemons (beim Verbinden bzw. Laden übernommen)"""
+        return self._config
+
+    @config.setter
+    def config(self, config):
+        self._config = config
+
+    @property
+    def log_config(self):
+        return self._config.get('LOGGING', {})
+
+    def load_config(self):
+        """Lädt die Konfiguration im Daemon neu"""
+        self._config = self._call('load_config')
+        return self._config
+
+    def save_config(self):
+        """Übernimmt die Konfiguration in den Daemon und speichert sie"""
+        return self._call('save_config', self._config)
+
+    def get_power_stats(self):
+        return self._call('get_power_stats')
+
+    def get_motion_stats(self):
+        return self._call('get_motion_stats')
+
+    def get_bus_stats(self):
+        return self._call('get_bus_stats')
+
+    def cleanup(self):
+        """Trennt die Verbindungen; die Hardware bleibt beim Daemon"""
+        self._running = False
+        with self._lock:
+            connections, self._idle = self._idle, []
+        # Gerade ausgeliehene Verbindungen schließt _checkin nach ihrer Antwort
+        for conn in connections:
+            conn.close()
+        subscription = getattr(self, '_subscription', None)
+        if subscription is not None:
+            subscription.close()
+        self._fail_open_jobs(ConnectionError("Verbindung zum Controller-Daemon beendet"))
+
+    def _fail_open_jobs(self, error):
+        """
+        Schließt alle offenen Aufträge mit Fehler ab: nach einem Abbruch können Abschlussereignisse
+        fehlen, und nach einem Neustart des Daemons beginnen die Auftrags-IDs von vorn
+        """
+        with self._lock:
+            jobs, self._jobs = self._jobs, {}
+            self._finished_jobs.clear()
+        for job in jobs.values():
+            job.fail(error)
+        if jobs:
+            self.logger.warning("%s offene Stellaufträge wegen Verbindungsabbruch abgebrochen", len(jobs))
+
+    # --- Abonnement ------------------------------------------------------------------------
+
+    def _listen(self):
+        """Liest Ereignisse des Daemons; verbindet nach einem Abbruch neu"""
+        while self._running:
+            try:
+                self._subscription = _Connection(self.path)
+                self._subscription.send({'id': 0, 'cmd': 'subscribe', 'args': []})
+                while self._running:
+                    self._handle_event(self._subscription.receive())
+            except (OSError, ValueError) as e:
+                if self._running:
+                    self.logger.warning("Abonnement beim Controller-Daemon unterbrochen: %s", e)
+                    self._fail_open_jobs(e if isinstance(e, ConnectionError)
+                                         else ConnectionError(f"Verbindung zum Controller-Daemon getrennt: {e}"))
+                    time.sleep(1.0)
+            finally:
+                if getattr(self, '_subscription', None) is not None:
+                    self._subscription.close()
+
+    def _handle_event(self, message):
+        event = message.get('event')
+        if event == 'state':
+            version = message['version']
+            full = message.get('full', False)
+            current = self.servo_states.version
+            # Vollständiger Stand mit kleinerer Version: Daemon wurde neu gestartet
+            if version > current or full:
+                states = {int(k): ServoState(**v) for k, v in message['states'].items()}
+                self.servo_states.apply(version, states, reset=full and version <= current)
+            if full:
+                self._synced.set()
+        elif event == 'job':
+            data = message['job']
+            with self._lock:
+                job = self._jobs.pop(data['id'], None)
+                if job is None:
+                    self._finished_jobs[data['id']] = data
+                    while len(self._finished_jobs) > FINISHED_JOBS:
+                        self._finished_jobs.popitem(last=False)
+            if job is not None:
+                job.update(data)
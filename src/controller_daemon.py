@@ -0,0 +1,278 @@
+"""
+Controller-Daemon: einziger Prozess mit Zugriff auf die Hardware (ein ServoKitController).
+GUI und Web-Server sind Clients (controller_client.py) und teilen sich Status und
+Befehlswarteschlange über ein Unix-Domain-Socket.
+
+Protokoll: eine JSON-Nachricht pro Zeile.
+  Anfrage:  {"id": 1, "cmd": "move_servo", "args": [0, "left"]}
+  Antwort:  {"id": 1, "ok": true, "result": ...}
+            {"id": 1, "ok": false, "error": "...", "type": "ValueError"}
+Nach {"cmd": "subscribe"} sendet der Daemon auf dieser Verbindung nur noch Ereignisse:
+  {"event": "state", "version": 12, "full": true, "states": {"0": {...}, ...}}   (danach nur geänderte)
+  {"event": "job", "job": {...}}                                                 (abgeschlossene Aufträge)
+
+    python3 controller_daemon.py               # Daemon starten
+    python3 controller_daemon.py --ping 1000   # Round-Trip-Latenz gegen laufenden Daemon messen
+"""
+import os
+import sys
+import json
+import time
+import queue
+import signal
+import socket
+import logging
+import argparse
+import threading
+import socketserver
+from logging.handlers import RotatingFileHandler
+
+import log_queue
+import metrics
+from controller_client import SOCKET_ENV, IDLE_TIMEOUT, socket_path, encode
+
+logger = logging.getLogger('servo_controller')
+
+# Abstand der Keepalive-Ereignisse im Abonnement (Sekunden), erkennt getrennte Clients
+KEEPALIVE = 15
+
+
+def _dict_keys(directions):
+    return {int(k): v for k, v in directions.items()}
+
+
+def _save_config(controller, config):
+    controller.config = config
+    controller.save_config()
+    return True
+
+
+def _move_job(controller, job_id):
+    job = controller.get_move_job(job_id)
+    return job.to_dict() if job is not None else None
+
+
+# Befehle, die Clients ausführen dürfen: Name -> Callable(controller, *args) mit JSON-fähigem Ergebnis
+COMMANDS = {
+    'hello': lambda c: {'num_servos': c.num_servos, 'config': c.config},
+    'ping': lambda c: None,
+    'move_servo': lambda c, servo_id, direction: c.move_servo(servo_id, direction),
+    'move_servos': lambda c, directions: {str(k): v for k, v in c.move_servos(_dict_keys(directions)).items()},
+    'submit_move': lambda c, servo_id, direction: c.submit_move(servo_id, direction).to_dict(),
+    'submit_moves': lambda c, directions: {str(k): job.to_dict()
+                                           for k, job in c.submit_moves(_dict_keys(directions)).items()},
+    'get_move_job': _move_job,
+    'get_servo_status': lambda c, servo_id: c.get_servo_status(servo_id),
+    'write_angle': lambda c, servo_num, angle: c.write_angle(servo_num, angle),
+    'update_servo_config': lambda c, servo_id, config_data: c.update_servo_config(servo_id, config_data),
+    'get_config': lambda c: c.config,
+    'load_config': lambda c: c.load_config(),
+    'save_config': _save_config,
+    'get_power_stats': lambda c: c.get_power_stats(),
+    'get_motion_stats': lambda c: c.get_motion_stats(),
+    'get_bus_stats': lambda c: c.get_bus_stats(),
+    'metrics': lambda c: metrics.render(),
+}
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    """Eine Client-Verbindung: Befehle nacheinander ausführen oder Ereignisse abonnieren"""
+
+    # Socket-Timeout: ungenutzte Befehlsverbindungen werden getrennt, ihr Thread endet. Im
+    # Abonnement wird nicht mehr gelesen, dort begrenzt er nur Schreibzugriffe auf hängende Clients
+    timeout = IDLE_TIMEOUT
+
+    def handle(self):
+        daemon = self.server.controller_daemon
+        try:
+            for line in self.rfile:
+                try:
+                    message = json.loads(line)
+                except ValueError:
+                    self.wfile.write(encode({'id': None, 'ok': False, 'error': 'Ungültige Nachricht'}))
+                    continue
+                if message.get('cmd') == 'subscribe':
+                    daemon.subscribe(self.wfile)
+                    return
+                self.wfile.write(daemon.execute(message))
+        except socket.timeout:
+            logger.debug("Ungenutzte Verbindung zum Controller-Daemon nach %s s getrennt", IDLE_TIMEOUT)
+        except OSError:
+            # Client hat die Verbindung getrennt
+            pass
+
+
+class _Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class ControllerDaemon:
+    """Stellt einen Controller über ein Unix-Domain-Socket bereit"""
+
+    def __init__(self, controller, path=None):
+        self.controller = controller
+        self.path = path or socket_path()
+        self.server = None
+        self._subscribers = []
+        self._lock = threading.Lock()
+        self._running = False
+        controller.move_jobs.add_listener(self._job_finished)
+
+    def execute(self, message):
+        """Führt einen Befehl aus; liefert die Antwort als JSON-Zeile"""
+        request_id = message.get('id')
+        command = COMMANDS.get(message.get('cmd'))
+        if command is None:
+            return encode({'id': request_id, 'ok': False, 'error': f"Unbekannter Befehl: {message.get('cmd')}"})
+        try:
+            result = command(self.controller, *message.get('args', ()))
+            return encode({'id': request_id, 'ok': True, 'result': result})
+        except Exception as e:
+            logger.debug("Befehl %s fehlgeschlagen: %s", message.get('cmd'), e)
+            return encode({'id': request_id, 'ok': False, 'error': str(e), 'type': type(e).__name__})
+
+    def subscribe(self, wfile):
+        """Sendet Statusänderungen und abgeschlossene Aufträge, bis der Client trennt"""
+        events = queue.SimpleQueue()
+        # Erst anmelden, dann den vollständigen Stand senden: keine Änderung geht verloren,
+        # ältere Deltas verwirft der Client anhand der Version
+        with self._lock:
+            self._subscribers.append(events)
+        try:
+            snapshot = self.controller.get_all_servo_status()
+            wfile.write(encode({
+                'event': 'state', 'version': snapshot.version, 'full': True,
+                'states': {str(i): state.to_dict() for i, state in enumerate(snapshot)}
+            }))
+            while self._running:
+                try:
+                    line = events.get(timeout=KEEPALIVE)
+                except queue.Empty:
+                    line = encode({'event': 'keepalive'})
+                wfile.write(line)
+        except OSError:
+            # Client hat die Verbindung getrennt
+            pass
+        finally:
+            with self._lock:
+                self._subscribers.remove(events)
+
+    def _broadcast(self, line):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for events in subscribers:
+            events.put(line)
+
+    def _job_finished(self, job):
+        self._broadcast(encode({'event': 'job', 'job': job.to_dict()}))
+
+    def _pump(self):
+        """Ein Thread für alle Abonnenten: jede Statusänderung wird einmal kodiert und verteilt"""
+        snapshot = self.controller.get_all_servo_status()
+        while self._running:
+            current = self.controller.wait_for_state_change(snapshot.version, timeout=1.0)
+            if current is None:
+                continue
+            changed = current.changed_since(snapshot)
+            snapshot = current
+            if changed:
+                self._broadcast(encode({
+                    'event': 'state', 'version': current.version,
+                    'states': {str(i): current[i].to_dict() for i in changed}
+                }))
+
+    def serve_forever(self):
+        """Öffnet das Socket und bedient Clients bis shutdown()"""
+        if os.path.exists(self.path):
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(self.path)
+                raise RuntimeError(f"Controller-Daemon läuft bereits ({self.path})")
+            except OSError:
+                # Verwaistes Socket eines beendeten Daemons
+                os.unlink(self.path)
+            finally:
+                probe.close()
+
+        # Socket gleich beim bind() mit 0660 anlegen (kein Zeitfenster mit den Rechten der umask)
+        old_umask = os.umask(0o117)
+        try:
+            self.server = _Server(self.path, _Handler)
+        finally:
+            os.umask(old_umask)
+        self.server.controller_daemon = self
+        self._running = True
+        threading.Thread(target=self._pump, name='daemon-state', daemon=True).start()
+        logger.info("Controller-Daemon bereit auf %s", self.path)
+        self.server.serve_forever()
+
+    def shutdown(self):
+        """Beendet den Server (aus einem anderen Thread oder Signal-Handler)"""
+        self._running = False
+        if self.server is not None:
+            threading.Thread(target=self.server.shutdown, daemon=True).start()
+
+
+def setup_logging(log_config=None):
+    """Schreibt die Controller-Logs des Daemons über den Log-Thread in logs/controller_daemon.log"""
+    log_config = log_config or {}
+    log_dir = os.path.join(os.path.dirname(__file__), 'logs')
+    os.makedirs(log_dir, exist_ok=True)
+    handler = RotatingFileHandler(os.path.join(log_dir, 'controller_daemon.log'), maxBytes=1024*1024, backupCount=5)
+    handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+    log_queue.attach(logger, handler,
+                     level=log_config.get('LEVEL', 'INFO'),
+                     sample_rate=log_config.get('SAMPLE_RATE', 1))
+
+
+def measure_latency(count):
+    """Misst die Round-Trip-Zeit gegen einen laufenden Daemon (ping und get_motion_stats)"""
+    from controller_client import ControllerClient
+
+    client = ControllerClient()
+    for cmd in ('ping', 'get_motion_stats'):
+        samples = []
+        for _ in range(count):
+            started = time.perf_counter()
+            client._call(cmd)
+            samples.append((time.perf_counter() - started) * 1000)
+        samples.sort()
+        print(f"{cmd:<18} p50 {samples[len(samples) // 2]:.3f} ms  p95 {samples[int(len(samples) * 0.95)]:.3f} ms  "
+              f"p99 {samples[int(len(samples) * 0.99)]:.3f} ms  max {samples[-1]:.3f} ms")
+    client.cleanup()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Controller-Daemon der Weichensteuerung')
+    parser.add_argument('--socket', help=f'Pfad des Sockets (Standard: {socket_path()})')
+    parser.add_argument('--ping', type=int, metavar='N', help='Round-Trip-Latenz mit N Anfragen messen')
+    args = parser.parse_args(argv)
+    if args.socket:
+        os.environ[SOCKET_ENV] = args.socket
+
+    if args.ping:
+        measure_latency(args.ping)
+        return 0
+
+    from servokit_controller import ServoKitController
+    controller = ServoKitController()
+    setup_logging(controller.log_config)
+    daemon = ControllerDaemon(controller)
+
+    def stop(signum, frame):
+        logger.info("Controller-Daemon wird beendet")
+        daemon.shutdown()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    try:
+        daemon.serve_forever()
+    finally:
+        controller.cleanup()
+        if os.path.exists(daemon.path):
+            os.unlink(daemon.path)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
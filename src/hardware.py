@@ -0,0 +1,76 @@
+import os
+import logging
+
+# Umgebungsvariable zur Auswahl des Hardware-Backends ('servokit' oder 'sim')
+BACKEND_ENV = 'WEICHEN_BACKEND'
+BACKEND_SERVOKIT = 'servokit'
+BACKEND_SIM = 'sim'
+
+logger = logging.getLogger('servo_controller')
+
+
+def get_backend(config=None):
+    """Ermittelt das Hardware-Backend: Umgebungsvariable vor config.json (HARDWARE.BACKEND)"""
+    backend = os.environ.get(BACKEND_ENV)
+    if not backend and config:
+        backend = config.get('HARDWARE', {}).get('BACKEND')
+    backend = (backend or BACKEND_SERVOKIT).lower()
+    if backend not in (BACKEND_SERVOKIT, BACKEND_SIM):
+        raise ValueError(f"Unbekanntes Hardware-Backend: {backend}")
+    return backend
+
+
+def get_sim_config(config=None):
+    """Liefert die Parameter des Timing-Modells (HARDWARE.SIMULATION)"""
+    if not config:
+        return {}
+    return config.get('HARDWARE', {}).get('SIMULATION', {})
+
+
+def create_i2c_bus(bus_id=1, backend=BACKEND_SERVOKIT, sim_config=None):
+    """Öffnet einen I2C-Bus; Bus 1 über die Pi-Pins, weitere über /dev/i2c-N"""
+    if backend == BACKEND_SIM:
+        from sim_backend import SimulatedI2CBus
+        return SimulatedI2CBus(bus_id, sim_config=sim_config)
+
+    if bus_id == 1:
+        import board
+        import busio
+        # Raspberry Pi I2C Pins: SCL = GPIO 3 (Pin 5), SDA = GPIO 2 (Pin 3)
+        return busio.I2C(board.SCL, board.SDA)
+
+    # Zusätzliche Busse (z.B. i2c-gpio Overlays) benötigen adafruit-extended-bus
+    try:
+        from adafruit_extended_bus import ExtendedI2C
+    except ImportError:
+        raise RuntimeError(f"I2C-Bus {bus_id} benötigt das Paket adafruit-extended-bus")
+    return ExtendedI2C(bus_id)
+
+
+def create_servokit(channels=16, address=0x40, frequency=50, i2c=None, backend=BACKEND_SERVOKIT, sim_config=None):
+    """Erstellt ein ServoKit-Objekt für das gewählte Backend"""
+    if backend == BACKEND_SIM:
+        from sim_backend import SimulatedServoKit
+        logger.info(f"Verwende simuliertes ServoKit (Adresse 0x{address:02x})")
+        return SimulatedServoKit(channels=channels, i2c=i2c, address=address,
+                                 frequency=frequency, sim_config=sim_config)
+
+    # Hardware-Bibliotheken erst hier importieren, damit Module auch ohne Raspberry Pi ladbar sind
+    from adafruit_servokit import ServoKit
+    if i2c is None:
+        i2c = create_i2c_bus(1)
+    return ServoKit(channels=channels, i2c=i2c, address=address, frequency=frequency)
+
+
+def create_pca9685(address=0x40, frequency=50, i2c=None, backend=BACKEND_SERVOKIT, sim_config=None):
+    """Erstellt ein PCA9685-Objekt für das gewählte Backend"""
+    if backend == BACKEND_SIM:
+        from sim_backend import SimulatedI2CBus, SimulatedPCA9685
+        pca = SimulatedPCA9685(i2c or SimulatedI2CBus(sim_config=sim_config), address=address)
+    else:
+        from adafruit_pca9685 import PCA9685
+        if i2c is None:
+            i2c = create_i2c_bus(1)
+        pca = PCA9685(i2c, address=address)
+    pca.frequency = frequency
+    return pca
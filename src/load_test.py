@@ -0,0 +1,279 @@
+"""
+Lastgenerator für die Web-API (simuliertes Backend).
+
+Viele gleichzeitige Clients mit je einer Keep-Alive-Verbindung schicken eine Mischung aus
+Status-Abfragen (GET /api/servos), Stellbefehlen (POST /api/servo/<id>) und GET /api/ip.
+Gemessen werden Durchsatz, Fehlerrate und Latenz-Perzentile. Ohne --url startet der
+Lastgenerator den Web-Server nacheinander in jedem Modus selbst, damit die Modi auf
+derselben Maschine verglichen werden können:
+
+    python3 load_test.py                                            # flask, threaded, async
+    python3 load_test.py --modes async -c 64 -d 20 --mix servos=80,write=15,ip=5
+    python3 load_test.py --url http://127.0.0.1:5000 -o last.json   # laufender Server
+
+Modi: 'flask' (Flask, eine Anfrage nach der anderen), 'threaded' (Flask, ein Thread pro
+Anfrage, Standard von web_server.py) und 'async' (aiohttp, eine Event-Loop).
+"""
+import os
+import sys
+import json
+import time
+import random
+import tempfile
+import asyncio
+import argparse
+import platform
+import subprocess
+import urllib.request
+from datetime import datetime
+
+import aiohttp
+
+# Selbst gestartete Server laufen immer gegen die Simulation
+os.environ.setdefault('WEICHEN_BACKEND', 'sim')
+
+from benchmark import percentile, git_revision
+
+# Modus -> Argumente für web_server.py
+SERVER_MODES = {
+    'flask': ['--mode', 'flask', '--single-thread'],
+    'threaded': ['--mode', 'flask'],
+    'async': ['--mode', 'aiohttp']
+}
+
+REQUEST_KINDS = ('servos', 'write', 'ip')
+DEFAULT_MIX = 'servos=70,write=20,ip=10'
+
+# Wartezeit auf einen selbst gestarteten Server (Sekunden)
+STARTUP_TIMEOUT = 30
+
+
+def parse_mix(text):
+    """Liest das Mischungsverhältnis 'servos=70,write=20,ip=10' als Dict {Art: Gewicht}"""
+    mix = {}
+    for part in text.split(','):
+        kind, _, weight = part.partition('=')
+        kind = kind.strip()
+        if kind not in REQUEST_KINDS:
+            raise ValueError(f"Unbekannte Anfrageart: {kind} (erlaubt: {', '.join(REQUEST_KINDS)})")
+        try:
+            mix[kind] = float(weight)
+        except ValueError:
+            raise ValueError(f"Ungültiges Gewicht für {kind}: {weight!r}")
+    if not any(weight > 0 for weight in mix.values()):
+        raise ValueError("Mindestens eine Anfrageart braucht ein Gewicht > 0")
+    return mix
+
+
+class Stats:
+    """Latenzen und Ergebnisse pro Anfrageart (nur aus der Event-Loop beschrieben, keine Sperre)"""
+
+    def __init__(self):
+        self.latencies = {kind: [] for kind in REQUEST_KINDS}
+        self.statuses = {}
+        self.limited = 0
+        self.errors = 0
+        self.error_samples = []
+
+    def record(self, kind, status, elapsed, error=None):
+        self.latencies[kind].append(elapsed)
+        key = str(status) if status is not None else 'exception'
+        self.statuses[key] = self.statuses.get(key, 0) + 1
+        if status == 429:
+            self.limited += 1
+        elif status is None or status >= 400:
+            self.errors += 1
+            if len(self.error_samples) < 5:
+                self.error_samples.append(f"{kind}: {error or status}")
+
+    def summary(self, duration):
+        """Durchsatz, Fehlerrate und Perzentile (ms) insgesamt und pro Anfrageart"""
+        def latency(values):
+            values = sorted(values)
+            return {
+                'requests': len(values),
+                'p50_ms': percentile(values, 50) * 1000,
+                'p95_ms': percentile(values, 95) * 1000,
+                'p99_ms': percentile(values, 99) * 1000,
+                'max_ms': (values[-1] if values else 0.0) * 1000
+            }
+
+        total = sum(len(values) for values in self.latencies.values())
+        result = latency([v for values in self.latencies.values() for v in values])
+        result.update({
+            'duration_s': duration,
+            'throughput_rps': total / duration if duration > 0 else 0.0,
+            'error_rate': self.errors / total if total else 0.0,
+            'limited_rate': self.limited / total if total else 0.0,
+            'statuses': self.statuses,
+            'error_samples': self.error_samples,
+            'kinds': {kind: latency(values) for kind, values in self.latencies.items() if values}
+        })
+        return result
+
+
+async def client_loop(session, base_url, mix, num_servos, rng, warmup_end, deadline, stats):
+    """Ein Client: Anfragen nacheinander über dieselbe Verbindung, Art zufällig nach Gewichtung"""
+    loop = asyncio.get_running_loop()
+    kinds = list(mix)
+    weights = list(mix.values())
+    while loop.time() < deadline:
+        kind = rng.choices(kinds, weights)[0]
+        if kind == 'write':
+            servo_id = rng.randrange(num_servos)
+            method, url, body = 'POST', f"{base_url}/api/servo/{servo_id}", {'position': rng.choice(('left', 'right'))}
+        elif kind == 'servos':
+            method, url, body = 'GET', f"{base_url}/api/servos", None
+        else:
+            method, url, body = 'GET', f"{base_url}/api/ip", None
+
+        measured = loop.time() >= warmup_end
+        started = time.perf_counter()
+        status, error = None, None
+        try:
+            async with session.request(method, url, json=body) as response:
+                await response.read()
+                status = response.status
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            error = type(e).__name__
+        if measured:
+            stats.record(kind, status, time.perf_counter() - started, error)
+
+
+async def run_load(base_url, clients, duration, warmup, mix, seed=None):
+    """Startet alle Clients gleichzeitig; gemessen wird nur nach der Aufwärmphase"""
+    timeout = aiohttp.ClientTimeout(total=10)
+    async with aiohttp.ClientSession(timeout=timeout) as probe:
+        async with probe.get(f"{base_url}/api/servos") as response:
+            num_servos = len(await response.json())
+
+    loop = asyncio.get_running_loop()
+    warmup_end = loop.time() + warmup
+    deadline = warmup_end + duration
+    stats = Stats()
+    rng = random.Random(seed)
+    sessions = [aiohttp.ClientSession(timeout=timeout, connector=aiohttp.TCPConnector(limit=1))
+                for _ in range(clients)]
+    try:
+        await asyncio.gather(*[
+            client_loop(session, base_url, mix, num_servos, random.Random(rng.random()),
+                        warmup_end, deadline, stats)
+            for session in sessions
+        ])
+    finally:
+        for session in sessions:
+            await session.close()
+    return stats.summary(duration)
+
+
+def start_server(mode, port, admission):
+    """Startet web_server.py im gewünschten Modus und wartet, bis er antwortet"""
+    src_dir = os.path.dirname(os.path.abspath(__file__))
+    args = [sys.executable, os.path.join(src_dir, 'web_server.py'), *SERVER_MODES[mode], '--port', str(port)]
+    if not admission:
+        args.append('--no-admission')
+    env = dict(os.environ, WEICHEN_BACKEND='sim', WEICHEN_CONTROLLER='local')
+    # Ausgabe in eine Datei statt in eine Pipe: eine volle Pipe würde den Server blockieren
+    output = tempfile.TemporaryFile()
+    process = subprocess.Popen(args, cwd=src_dir, env=env, stdout=output, stderr=subprocess.STDOUT)
+
+    deadline = time.monotonic() + STARTUP_TIMEOUT
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            output.seek(0)
+            raise RuntimeError(f"Server ({mode}) beendet: {output.read().decode(errors='replace')[-500:]}")
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/api/servos", timeout=1):
+                return process
+        except OSError:
+            time.sleep(0.2)
+    stop_server(process)
+    raise RuntimeError(f"Server ({mode}) antwortet nicht nach {STARTUP_TIMEOUT} s")
+
+
+def stop_server(process):
+    process.terminate()
+    try:
+        process.wait(timeout=5)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+def print_results(results):
+    """Gibt die Ergebnisse aller Modi als Tabelle aus"""
+    header = (f"{'Modus':<12}{'req/s':>10}{'Fehler':>9}{'429':>8}{'p50 ms':>10}{'p95 ms':>10}"
+              f"{'p99 ms':>10}{'max ms':>10}")
+    print(header)
+    print('-' * len(header))
+    for name, r in results.items():
+        print(f"{name:<12}{r['throughput_rps']:>10.1f}{r['error_rate'] * 100:>8.2f}%{r['limited_rate'] * 100:>7.1f}%"
+              f"{r['p50_ms']:>10.2f}{r['p95_ms']:>10.2f}{r['p99_ms']:>10.2f}{r['max_ms']:>10.1f}")
+        for kind, k in r['kinds'].items():
+            print(f"  {kind:<10}{k['requests']:>10}{'':>17}{k['p50_ms']:>10.2f}{k['p95_ms']:>10.2f}"
+                  f"{k['p99_ms']:>10.2f}{k['max_ms']:>10.1f}")
+        for sample in r['error_samples']:
+            print(f"  Fehler: {sample}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Lastgenerator für die Web-API (simuliertes Backend)')
+    parser.add_argument('--modes', default=','.join(SERVER_MODES),
+                        help=f"Server-Modi, kommagetrennt (Standard: {','.join(SERVER_MODES)})")
+    parser.add_argument('--url', help='Laufenden Server testen statt selbst zu starten (Stellbefehle bewegen Servos!)')
+    parser.add_argument('-c', '--clients', type=int, default=32, help='Gleichzeitige Clients (je eine Verbindung)')
+    parser.add_argument('-d', '--duration', type=float, default=10, help='Messdauer pro Modus in Sekunden')
+    parser.add_argument('--warmup', type=float, default=2, help='Aufwärmzeit vor der Messung in Sekunden')
+    parser.add_argument('--mix', default=DEFAULT_MIX, help=f'Anteile der Anfragearten (Standard: {DEFAULT_MIX})')
+    parser.add_argument('--port', type=int, default=5080, help='Port für selbst gestartete Server')
+    parser.add_argument('--admission', action='store_true',
+                        help='Zugangsbegrenzung eingeschaltet lassen (alle Clients zählen als ein Client)')
+    parser.add_argument('--seed', type=int, help='Startwert für die Zufallsauswahl')
+    parser.add_argument('-o', '--output', help='Ergebnisse als JSON speichern')
+    args = parser.parse_args(argv)
+
+    try:
+        mix = parse_mix(args.mix)
+    except ValueError as e:
+        parser.error(str(e))
+    targets = [args.url.rstrip('/')] if args.url else [m.strip() for m in args.modes.split(',') if m.strip()]
+    unknown = [m for m in targets if not args.url and m not in SERVER_MODES]
+    if unknown:
+        parser.error(f"Unbekannte Modi: {', '.join(unknown)}")
+
+    results = {}
+    for target in targets:
+        print(f"{target}: {args.clients} Clients, {args.duration:.0f} s (+{args.warmup:.0f} s Aufwärmen), "
+              f"Mischung {args.mix} ...")
+        if args.url:
+            results[target] = asyncio.run(run_load(target, args.clients, args.duration, args.warmup, mix, args.seed))
+            continue
+        process = start_server(target, args.port, args.admission)
+        try:
+            results[target] = asyncio.run(run_load(f"http://127.0.0.1:{args.port}", args.clients,
+                                                   args.duration, args.warmup, mix, args.seed))
+        finally:
+            stop_server(process)
+
+    print()
+    print_results(results)
+
+    report = {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'clients': args.clients,
+        'mix': mix,
+        'admission': args.admission,
+        'results': results
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=4)
+        print(f"\nErgebnisse gespeichert in {args.output}")
+    return report
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+import json
+import queue
+import atexit
+import logging
+import threading
+from logging.handlers import QueueHandler, QueueListener
+
+import metrics
+
+_lock = threading.Lock()
+_queue = None
+_listener = None
+_targets = {}     # Logger-Name -> Liste der eigentlichen Handler
+
+
+class LazyQueueHandler(QueueHandler):
+    """
+    QueueHandler, der im aufrufenden Thread nichts formatiert: Nachricht und Argumente werden
+    erst im Listener-Thread zusammengesetzt. Argumente dürfen danach nicht mehr verändert werden.
+    """
+
+    def prepare(self, record):
+        return record
+
+
+class SamplingFilter(logging.Filter):
+    """Lässt pro Nachrichtenvorlage nur jeden n-ten Eintrag bis max_level durch (höhere Level immer)"""
+
+    def __init__(self, rate=1, max_level=logging.INFO):
+        super().__init__()
+        self.rate = max(1, int(rate))
+        self.max_level = max_level
+        self._counters = {}
+        self.dropped = 0
+
+    def filter(self, record):
+        if self.rate == 1 or record.levelno > self.max_level:
+            return True
+        # Zählen ohne Sperre: ein gelegentlich doppelt gezählter Eintrag ist hier unerheblich
+        key = (record.name, record.msg)
+        count = self._counters.get(key, 0)
+        self._counters[key] = count + 1
+        if count % self.rate == 0:
+            return True
+        self.dropped += 1
+        return False
+
+
+class LazyJson:
+    """Serialisiert ein Objekt erst, wenn der Log-Eintrag tatsächlich formatiert wird"""
+
+    __slots__ = ('obj', 'indent')
+
+    def __init__(self, obj, indent=2):
+        self.obj = obj
+        self.indent = indent
+
+    def __str__(self):
+        return json.dumps(self.obj, indent=self.indent)
+
+
+class _Dispatcher(logging.Handler):
+    """Verteilt Einträge im Listener-Thread an die Handler des jeweiligen Loggers"""
+
+    def handle(self, record):
+        name = record.name
+        while True:
+            handlers = _targets.get(name)
+            if handlers is not None or '.' not in name:
+                break
+            name = name.rsplit('.', 1)[0]
+        for handler in handlers or ():
+            if record.levelno >= handler.level:
+                handler.handle(record)
+        return True
+
+
+def attach(logger, *handlers, level=None, sample_rate=1):
+    """
+    Leitet einen Logger über die gemeinsame Queue: die übergebenen Handler laufen im
+    Hintergrund-Thread, im aufrufenden Thread wird der Eintrag nur eingereiht.
+    Ohne Handler werden nur Level und Sampling angepasst.
+    :param level: Level des Loggers (Aufrufe darunter kosten nur einen Level-Vergleich)
+    :param sample_rate: Nur jeden n-ten DEBUG/INFO-Eintrag pro Nachrichtenvorlage schreiben
+    :return: der QueueHandler des Loggers
+    """
+    global _queue, _listener
+    if isinstance(logger, str):
+        logger = logging.getLogger(logger)
+    if isinstance(level, str):
+        level = logging.getLevelName(level.upper())
+
+    with _lock:
+        if _listener is None:
+            _queue = queue.SimpleQueue()
+            _listener = QueueListener(_queue, _Dispatcher())
+            _listener.start()
+            atexit.register(stop)
+
+        if handlers:
+            # Erneutes attach() ersetzt die Handler (z.B. bei mehrfach erzeugtem WebServer)
+            _targets[logger.name] = list(handlers)
+
+        queue_handler = next((h for h in logger.handlers if isinstance(h, LazyQueueHandler)), None)
+        if queue_handler is None:
+            queue_handler = LazyQueueHandler(_queue)
+            logger.addHandler(queue_handler)
+            # Einträge nicht zusätzlich an Eltern-Logger weiterreichen (sonst doppelt bzw. synchron)
+            logger.propagate = False
+        queue_handler.queue = _queue
+
+    queue_handler.filters = [f for f in queue_handler.filters if not isinstance(f, SamplingFilter)]
+    if sample_rate and int(sample_rate) > 1:
+        queue_handler.addFilter(SamplingFilter(sample_rate))
+    if level is not None:
+        logger.setLevel(level)
+    return queue_handler
+
+
+def _depth():
+    return _queue.qsize() if _queue is not None else None
+
+
+metrics.callback('log_queue_depth', 'Eingereihte, noch nicht geschriebene Log-Einträge', _depth)
+
+
+def stop():
+    """Schreibt alle eingereihten Einträge und beendet den Listener-Thread"""
+    global _listener
+    with _lock:
+        listener, _listener = _listener, None
+    if listener is not None:
+        listener.stop()
@@ -1,12 +1,14 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, font
 import threading
+import queue
 import logging
 import os
 import socket
-from servokit_controller import ServoKitController
+from controller_client import create_controller
 from web_server import run_server
 import subprocess
+import log_queue
 
 class WeichensteuerungGUI(tk.Tk):
     def __init__(self):
@@ -49,6 +51,13 @@ class WeichensteuerungGUI(tk.Tk):
             # Flag für Beenden
             self._closing = False
             
+            # Zuletzt angezeigter Status-Snapshot (None = noch nichts angezeigt)
+            self._shown_states = None
+            
+            # Fehlgeschlagene Stellaufträge aus den Callbacks der Motion-Engine; Tk darf nur aus
+            # dem Hauptthread angesprochen werden, update_status zeigt sie an
+            self._move_errors = queue.SimpleQueue()
+            
             # Initialisiere ServoKit Controller
             self.init_servo_controller()
             self.logger.info("Servo-Controller wurde initialisiert")
@@ -95,20 +104,18 @@ class WeichensteuerungGUI(tk.Tk):
     def setup_logging(self):
         """Initialisiert den Logger"""
         try:
-            # Erstelle Logger
+            # Erstelle Logger (Level aus LOGGING.LEVEL, sobald der Controller die Konfiguration geladen hat)
             self.logger = logging.getLogger(__name__)
-            self.logger.setLevel(logging.DEBUG)
             
             # Erstelle Handler
-            console_handler = logging.StreamHandler()
-            console_handler.setLevel(logging.DEBUG)
+            self.console_handler = logging.StreamHandler()
             
             # Erstelle Formatter
             formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-            console_handler.setFormatter(formatter)
+            self.console_handler.setFormatter(formatter)
             
-            # Füge Handler zum Logger hinzu
-            self.logger.addHandler(console_handler)
+            # Ausgabe im Hintergrund-Thread, der Tk-Mainloop reiht Einträge nur ein
+            log_queue.attach(self.logger, self.console_handler, level=logging.INFO)
             
             self.logger.debug("Logger wurde initialisiert")
             
@@ -348,10 +355,17 @@ class WeichensteuerungGUI(tk.Tk):
         if self._closing:
             return
             
+        self.show_move_errors()
         try:
-            # Status für alle Servos aktualisieren
-            for i in range(16):
-                self.update_servo_status(i)
+            # Nur neu zeichnen, wenn sich der Status geändert hat (Versionsvergleich in O(1)),
+            # und dann nur die Servos, deren Datensatz ersetzt wurde
+            snapshot = self.servo_controller.get_all_servo_status()
+            shown = self._shown_states
+            if shown is None or shown.version != snapshot.version:
+                for i in range(min(16, len(snapshot))):
+                    if shown is None or shown[i] is not snapshot[i]:
+                        self.update_servo_status(i)
+                self._shown_states = snapshot
                 
         except Exception as e:
             self.logger.error(f"Fehler beim Aktualisieren des Status: {e}")
@@ -361,16 +375,14 @@ class WeichensteuerungGUI(tk.Tk):
             self.after(500, self.update_status)
 
     def move_servo(self, servo_id, direction):
-        """Bewegt einen Servo in die angegebene Richtung"""
+        """Startet die Bewegung eines Servos ohne die Oberfläche bis zum Einschwingen zu blockieren"""
         try:
-            self.logger.info(f"Bewege Servo {servo_id + 1} nach {direction}")
+            self.logger.info("Bewege Servo %s nach %s", servo_id + 1, direction)
             
-            # Bewege Servo
-            result = self.servo_controller.move_servo(servo_id, direction)
+            # Bewegung nur anstoßen; den neuen Status zeigt update_status, Fehler meldet der Callback
+            job = self.servo_controller.submit_move(servo_id, direction)
+            job.future.add_done_callback(lambda future: self._on_move_done(servo_id, future))
             
-            if result.get('error'):
-                raise Exception(result['error'])
-                
             # Aktualisiere GUI
             self.update_servo_status(servo_id)
             
@@ -378,6 +390,23 @@ class WeichensteuerungGUI(tk.Tk):
             self.logger.error(f"Fehler beim Bewegen von Servo {servo_id + 1}: {e}")
             messagebox.showerror("Fehler", str(e))
 
+    def _on_move_done(self, servo_id, future):
+        """Läuft im Thread der Motion-Engine bzw. des Daemon-Clients: Fehler nur vormerken"""
+        error = None if future.cancelled() else future.exception()
+        if error is not None:
+            self._move_errors.put((servo_id, error))
+
+    def show_move_errors(self):
+        """Zeigt vorgemerkte Fehler von Stellaufträgen an (im Hauptthread)"""
+        while True:
+            try:
+                servo_id, error = self._move_errors.get_nowait()
+            except queue.Empty:
+                return
+            self.logger.error(f"Fehler beim Bewegen von Servo {servo_id + 1}: {error}")
+            self.update_servo_status(servo_id)
+            messagebox.showerror("Fehler", str(error))
+
     def move_left(self, servo_id):
         """Bewegt den Servo nach links"""
         try:
@@ -398,7 +427,15 @@ class WeichensteuerungGUI(tk.Tk):
         """Initialisiert den Servo-Controller"""
         try:
             self.logger.info("Initialisiere Servo-Controller...")
-            self.servo_controller = ServoKitController()
+            # Client des Controller-Daemons, falls dieser läuft, sonst ein eigener Controller
+            self.servo_controller = create_controller()
+            
+            # Controller-Logs über dieselbe Konsole, Level und Sampling aus der Konfiguration
+            log_config = self.servo_controller.log_config
+            log_queue.attach(self.logger, level=log_config.get('LEVEL', 'INFO'))
+            log_queue.attach(self.servo_controller.logger, self.console_handler,
+                             level=log_config.get('LEVEL', 'INFO'),
+                             sample_rate=log_config.get('SAMPLE_RATE', 1))
             self.logger.info("Servo-Controller erfolgreich initialisiert")
             
         except Exception as e:
@@ -446,15 +483,12 @@ class WeichensteuerungGUI(tk.Tk):
             else:  # right
                 angle = float(self.right_angle_var.get())
             
-            self.logger.info(f"Test: Bewege Servo {servo_id + 1} nach {position} (Winkel: {angle}°)")
+            self.logger.info("Test: Bewege Servo %s nach %s (Winkel: %s°)", servo_id + 1, position, angle)
             
-            # Setze Winkel
-            if servo_id < 16:
-                self.servo_controller.kit1.servo[servo_id].angle = angle
-            else:
-                if not self.servo_controller.kit2:
-                    raise Exception("Zweites Board nicht verfügbar")
-                self.servo_controller.kit2.servo[servo_id-16].angle = angle
+            # Setze Winkel (globale Servo-ID, Board wird vom Controller bestimmt)
+            if servo_id >= self.servo_controller.num_servos:
+                raise Exception("Kein Board für diesen Servo verfügbar")
+            self.servo_controller.write_angle(servo_id, angle)
             
         except Exception as e:
             self.logger.error(f"Fehler beim Testen des Winkels: {e}")
@@ -0,0 +1,218 @@
+"""
+Prozessinterne Metriken (Zähler, Histogramme mit festen Buckets, Messwerte per Callback) und
+Ausgabe im Prometheus-Textformat für /metrics.
+
+Erfassung ohne Sperre: jeder Thread zählt in eine eigene Teilmenge (Shard), die nur er selbst
+schreibt; erst beim Abruf werden alle Shards zusammengezählt. Shards beendeter Threads
+(z.B. Request-Threads des Flask-Servers) werden dabei in einen gemeinsamen Rest übernommen.
+"""
+import bisect
+import threading
+
+# Bucket-Grenzen in Sekunden
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+I2C_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05)
+MOVE_BUCKETS = (0.02, 0.05, 0.1, 0.15, 0.2, 0.3, 0.5, 1.0, 2.0, 5.0, 10.0)
+
+
+class _Shards:
+    """Pro Thread ein Dict {Label-Werte: Wert}, das nur von diesem Thread geschrieben wird"""
+
+    def __init__(self, merge):
+        self._merge = merge
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._shards = []          # (Thread, Shard)
+        self._retired = {}         # zusammengeführte Shards beendeter Threads
+
+    def get(self):
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = self._local.shard = {}
+            with self._lock:
+                self._shards.append((threading.current_thread(), shard))
+        return shard
+
+    def collect(self):
+        """Summe aller Shards als Dict {Label-Werte: Wert}"""
+        with self._lock:
+            alive = []
+            for thread, shard in self._shards:
+                if thread.is_alive():
+                    alive.append((thread, shard))
+                else:
+                    self._merge_into(self._retired, shard)
+            self._shards = alive
+            total = {}
+            self._merge_into(total, self._retired)
+            for _, shard in alive:
+                self._merge_into(total, shard)
+        return total
+
+    def _merge_into(self, target, shard):
+        for key, value in list(shard.items()):
+            target[key] = self._merge(target.get(key), value)
+
+
+class Counter:
+    """Monoton steigender Zähler, optional mit Labels"""
+
+    type = 'counter'
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._shards = _Shards(lambda a, b: (a or 0) + b)
+
+    def inc(self, *labels, amount=1):
+        shard = self._shards.get()
+        shard[labels] = shard.get(labels, 0) + amount
+
+    def samples(self):
+        for labels, value in sorted(self._shards.collect().items()):
+            yield self.name, labels, value
+
+
+class Histogram:
+    """Verteilung mit festen Bucket-Grenzen (kumulativ ausgegeben wie bei Prometheus)"""
+
+    type = 'histogram'
+
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._shards = _Shards(self._merge)
+
+    @staticmethod
+    def _merge(a, b):
+        if a is None:
+            return list(b)
+        return [x + y for x, y in zip(a, b)]
+
+    def observe(self, value, *labels):
+        """Erfasst einen Wert: ein Bucket-Zähler plus Summe, ohne Sperre"""
+        shard = self._shards.get()
+        counts = shard.get(labels)
+        if counts is None:
+            # Buckets, +Inf und Summe
+            counts = shard[labels] = [0] * (len(self.buckets) + 2)
+        counts[bisect.bisect_left(self.buckets, value)] += 1
+        counts[-1] += value
+
+    def samples(self):
+        for labels, counts in sorted(self._shards.collect().items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += count
+                yield self.name + '_bucket', labels + (('le', bound),), cumulative
+            yield self.name + '_sum', labels, counts[-1]
+            yield self.name + '_count', labels, cumulative
+
+
+class Callback:
+    """Wert, der erst beim Abruf ermittelt wird (Warteschlangen, Zählerstände anderer Objekte)"""
+
+    def __init__(self, name, help, func, type='gauge', labelnames=()):
+        """:param func: Callable -> Zahl oder Dict {Label-Werte (Tupel): Zahl}"""
+        self.name = name
+        self.help = help
+        self.func = func
+        self.type = type
+        self.labelnames = tuple(labelnames)
+
+    def samples(self):
+        value = self.func()
+        if isinstance(value, dict):
+            for labels, v in sorted(value.items()):
+                yield self.name, labels, v
+        elif value is not None:
+            yield self.name, (), value
+
+
+class Registry:
+    """Sammlung aller Metriken eines Prozesses"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric, replace=False):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None and not replace:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name, help, labelnames=()):
+        return self._register(Counter(name, help, labelnames))
+
+    def histogram(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._register(Histogram(name, help, labelnames, buckets))
+
+    def callback(self, name, help, func, type='gauge', labelnames=()):
+        """Registriert einen Callback-Wert; ein bestehender gleichen Namens wird ersetzt"""
+        return self._register(Callback(name, help, func, type, labelnames), replace=True)
+
+    def render(self, exclude=()):
+        """
+        Alle Metriken im Prometheus-Textformat (Metriken ohne Werte werden ausgelassen)
+        :param exclude: Namen, die nicht ausgegeben werden (z.B. weil ein anderer Prozess sie liefert)
+        """
+        with self._lock:
+            metrics = [m for m in self._metrics.values() if m.name not in exclude]
+        lines = []
+        for metric in metrics:
+            try:
+                samples = list(metric.samples())
+            except Exception as e:
+                # Callback eines nicht mehr verfügbaren Objekts: Metrik auslassen
+                lines.append(f"# {metric.name}: {e}")
+                continue
+            if not samples:
+                continue
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            for name, labels, value in samples:
+                lines.append(f"{name}{_format_labels(metric.labelnames, labels)} {_format_value(value)}")
+        return '\n'.join(lines) + '\n'
+
+
+def names(text):
+    """Namen aller Metriken in einer Ausgabe von render()"""
+    return {line.split()[2] for line in text.splitlines() if line.startswith('# TYPE ')}
+
+
+def _format_labels(labelnames, labels):
+    pairs = []
+    for i, label in enumerate(labels):
+        if isinstance(label, tuple):
+            # Zusatzlabel (z.B. le des Histogramms)
+            name, value = label
+        else:
+            name, value = labelnames[i], label
+        value = _format_value(value) if isinstance(value, float) else str(value)
+        value = value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        pairs.append(f'{name}="{value}"')
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value):
+    if isinstance(value, bool):
+        return '1' if value else '0'
+    if isinstance(value, int):
+        return str(value)
+    return repr(float(value))
+
+
+REGISTRY = Registry()
+counter = REGISTRY.counter
+histogram = REGISTRY.histogram
+callback = REGISTRY.callback
+render = REGISTRY.render
+
+# Content-Type des Prometheus-Textformats
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
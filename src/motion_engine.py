@@ -0,0 +1,298 @@
+import time
+import threading
+import logging
+from collections import OrderedDict
+from concurrent.futures import Future, InvalidStateError
+
+
+class _Motion:
+    """Laufende Bewegung eines einzelnen Kanals über eine vorberechnete Duty-Cycle-Trajektorie"""
+
+    __slots__ = ('channel', 'start', 'target', 'duties', 'fractions', 'steps', 'step', 'hold', 'future')
+
+    def __init__(self, channel, start, target, duties, fractions, future, hold=0):
+        self.channel = channel
+        self.start = start
+        self.target = target
+        self.duties = duties
+        self.fractions = fractions
+        self.steps = len(duties)
+        self.step = 0
+        self.hold = hold
+        self.future = future
+
+    def advance(self):
+        """Liefert den Duty-Cycle für den nächsten Tick (None während der Einschwingzeit)"""
+        if self.step < self.steps:
+            duty = self.duties[self.step]
+            self.step += 1
+            return duty
+        self.hold -= 1
+        return None
+
+    @property
+    def current(self):
+        """Zuletzt geschriebener Winkel (für Übernahme durch eine neue Bewegung)"""
+        if self.step == 0:
+            return self.start
+        return self.start + (self.target - self.start) * float(self.fractions[self.step - 1])
+
+    @property
+    def done(self):
+        return self.step >= self.steps and self.hold <= 0
+
+
+def _chain(source, target):
+    """Schließt target mit dem Ergebnis von source ab (für zusammengefasste Befehle)"""
+    def copy(f):
+        if target.done():
+            return
+        try:
+            if f.cancelled():
+                target.cancel()
+            elif f.exception() is not None:
+                target.set_exception(f.exception())
+            else:
+                target.set_result(f.result())
+        except InvalidStateError:
+            pass
+    source.add_done_callback(copy)
+
+
+class _Request:
+    """Wegen des Stromkontingents zurückgestellte Bewegung"""
+
+    __slots__ = ('channel', 'start', 'target', 'steps', 'profile', 'future')
+
+    def __init__(self, channel, start, target, steps, profile, future):
+        self.channel = channel
+        self.start = start
+        self.target = target
+        self.steps = steps
+        self.profile = profile
+        self.future = future
+
+
+class MotionEngine:
+    """Bewegt beliebig viele Kanäle gleichzeitig über eine gemeinsame Tick-Schleife"""
+
+    def __init__(self, apply, planner, on_settled=None, tick_interval=0.02, logger=None,
+                 power_budget=None, current_for=None, settle_ticks=None, on_started=None):
+        """
+        :param apply: Callable, das pro Tick mit einer Liste von (Kanal, Duty-Cycle) aufgerufen wird
+        :param planner: Callable({Kanal: (Start, Ziel)}, steps, profile) -> {Kanal: (Duty-Cycles, normierter Weg)}
+        :param on_settled: Optionales Callable(Kanal, Winkel), aufgerufen wenn ein Kanal sein Ziel erreicht
+        :param tick_interval: Abstand zwischen zwei Ticks in Sekunden
+        :param power_budget: Optionales PowerBudget; Bewegungen ohne freies Kontingent werden eingereiht
+        :param current_for: Optionales Callable(Kanal) -> geschätzter Strom in Ampere
+        :param settle_ticks: Optionales Callable(Kanal, Start, Ziel, Ticks) -> zusätzliche Ticks bis zum
+                             physikalischen Erreichen des Ziels (Kontingent bleibt so lange belegt)
+        :param on_started: Optionales Callable(Kanal), aufgerufen wenn eine Bewegung tatsächlich startet
+                           (unter der Sperre der Engine, darf nicht blockieren)
+        """
+        self.apply = apply
+        self.planner = planner
+        self.on_settled = on_settled
+        self.tick_interval = tick_interval
+        self.logger = logger or logging.getLogger('servo_controller')
+        self.power_budget = power_budget
+        self.current_for = current_for
+        self.settle_ticks = settle_ticks
+        self.on_started = on_started
+
+        self._motions = {}
+        self._queued = OrderedDict()   # Kanal -> _Request (FIFO)
+        self.coalesced = 0             # durch neuere Ziele ersetzte bzw. zusammengefasste Befehle
+        self._lock = threading.RLock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._running = False
+
+    def start(self):
+        """Startet den Tick-Thread (falls noch nicht gestartet)"""
+        with self._lock:
+            if self._running:
+                return
+            self._running = True
+            self._thread = threading.Thread(target=self._run, name='motion-engine')
+            self._thread.daemon = True
+            self._thread.start()
+
+    def stop(self):
+        """Stoppt den Tick-Thread; offene und eingereihte Bewegungen werden abgebrochen"""
+        with self._lock:
+            self._running = False
+            pending = [m.future for m in self._motions.values()]
+            pending += [r.future for r in self._queued.values()]
+            for channel in self._motions:
+                self._release_power(channel)
+            self._motions.clear()
+            self._queued.clear()
+            thread = self._thread
+            self._thread = None
+        self._wakeup.set()
+        if thread and thread is not threading.current_thread():
+            thread.join(timeout=1.0)
+        for future in pending:
+            future.cancel()
+
+    def move(self, channel, start, target, steps=10, profile=None):
+        """Plant eine Bewegung und kehrt sofort mit einem Future zurück"""
+        return self.move_many({channel: (start, target)}, steps, profile)[channel]
+
+    def move_many(self, targets, steps=10, profile=None):
+        """
+        Plant Bewegungen für mehrere Kanäle; alle, für die das Stromkontingent reicht,
+        starten im selben Tick, der Rest wird in Reihenfolge eingereiht. Pro Kanal zählt nur das
+        neueste Ziel: eingereihte Ziele werden ersetzt, laufende Bewegungen umgelenkt, und die
+        Futures überholter Befehle liefern das Ziel, das der Kanal tatsächlich erreicht.
+        :param targets: Dict {Kanal: (Startwinkel, Zielwinkel)}
+        :return: Dict {Kanal: Future}
+        """
+        self.start()
+        futures = {}
+        with self._lock:
+            runnable = {}
+            for channel, (start, target) in targets.items():
+                future = Future()
+                futures[channel] = future
+
+                previous = self._motions.get(channel)
+                if previous is not None:
+                    self.coalesced += 1
+                    if previous.target == target:
+                        # Gleiches Ziel: laufende Bewegung weiterführen, kein neuer Plan
+                        _chain(previous.future, future)
+                        continue
+                    # Laufende Bewegung wird ab ihrer aktuellen Position umgelenkt (Kontingent bleibt belegt);
+                    # wer auf das alte Ziel wartet, wird mit dem neuen Ziel fertig
+                    _chain(future, previous.future)
+                    runnable[channel] = (previous.current, target, future)
+                    continue
+
+                queued = self._queued.get(channel)
+                if queued is not None:
+                    # Noch nicht gestartete Bewegung: nur das Ziel ersetzen, Platz in der Warteschlange behalten
+                    self.coalesced += 1
+                    _chain(future, queued.future)
+                    queued.target, queued.steps, queued.profile, queued.future = target, steps, profile, future
+                    continue
+
+                if self._acquire_power(channel):
+                    runnable[channel] = (start, target, future)
+                else:
+                    self._queued[channel] = _Request(channel, start, target, steps, profile, future)
+
+            self._start_motions(runnable, steps, profile)
+        self._wakeup.set()
+        return futures
+
+    def is_moving(self, channel):
+        """Prüft ob ein Kanal gerade bewegt wird oder auf das Stromkontingent wartet"""
+        return channel in self._motions or channel in self._queued
+
+    def is_running(self, channel):
+        """Prüft ob ein Kanal gerade bewegt wird (nicht nur eingereiht)"""
+        return channel in self._motions
+
+    def get_stats(self):
+        """Anzahl aktiver, eingereihter und zusammengefasster Bewegungen plus Kontingent"""
+        stats = {'active': len(self._motions), 'queued': len(self._queued), 'coalesced': self.coalesced}
+        if self.power_budget is not None:
+            stats['power'] = self.power_budget.get_stats()
+        return stats
+
+    def _acquire_power(self, channel):
+        if self.power_budget is None:
+            return True
+        current = self.current_for(channel) if self.current_for else None
+        return self.power_budget.try_acquire(channel, current)
+
+    def _release_power(self, channel):
+        if self.power_budget is not None:
+            self.power_budget.release(channel)
+
+    def _start_motions(self, runnable, steps, profile):
+        """Berechnet die Trajektorien und startet die Bewegungen (Aufrufer hält die Sperre)"""
+        if not runnable:
+            return
+        plans = self.planner({c: (s, t) for c, (s, t, _) in runnable.items()}, steps, profile)
+        for channel, (start, target, future) in runnable.items():
+            duties, fractions = plans[channel]
+            hold = self.settle_ticks(channel, start, target, len(duties)) if self.settle_ticks else 0
+            self._motions[channel] = _Motion(channel, start, target, duties, fractions, future, hold)
+            if self.on_started:
+                self.on_started(channel)
+
+    def _start_queued(self):
+        """Startet eingereihte Bewegungen, solange das Kontingent reicht (Aufrufer hält die Sperre)"""
+        while self._queued:
+            channel, request = next(iter(self._queued.items()))
+            if not self._acquire_power(channel):
+                break
+            del self._queued[channel]
+            self._start_motions({channel: (request.start, request.target, request.future)},
+                                request.steps, request.profile)
+
+    def _finish(self, motions):
+        """Entfernt abgeschlossene Bewegungen und gibt ihr Kontingent frei (Aufrufer hält die Sperre)"""
+        finished = []
+        for m in motions:
+            # Zwischenzeitlich ersetzte Bewegungen gelten nicht als abgeschlossen
+            if self._motions.get(m.channel) is m:
+                del self._motions[m.channel]
+                self._release_power(m.channel)
+                finished.append(m)
+        self._start_queued()
+        return finished
+
+    def _run(self):
+        """Tick-Schleife: schreibt pro Tick die vorberechneten Duty-Cycles aller aktiven Kanäle"""
+        next_tick = time.monotonic()
+        while self._running:
+            if not self._motions:
+                self._wakeup.wait()
+                self._wakeup.clear()
+                next_tick = time.monotonic()
+                continue
+
+            with self._lock:
+                motions = list(self._motions.values())
+            updates = []
+            for m in motions:
+                duty = m.advance()
+                if duty is not None:
+                    updates.append((m.channel, duty))
+
+            try:
+                if updates:
+                    self.apply(updates)
+            except Exception as e:
+                self.logger.error("Fehler im Bewegungs-Tick: %s", e)
+                with self._lock:
+                    failed = self._finish(motions)
+                for m in failed:
+                    if not m.future.done():
+                        m.future.set_exception(e)
+                continue
+
+            finished = [m for m in motions if m.done]
+            if finished:
+                with self._lock:
+                    finished = self._finish(finished)
+                for m in finished:
+                    if self.on_settled:
+                        try:
+                            self.on_settled(m.channel, m.target)
+                        except Exception as e:
+                            self.logger.error("Fehler im Settled-Callback für Kanal %s: %s", m.channel, e)
+                    if not m.future.done():
+                        m.future.set_result(m.target)
+
+            # Fester Takt: verpasste Ticks werden nicht nachgeholt
+            next_tick += self.tick_interval
+            delay = next_tick - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                next_tick = time.monotonic()
@@ -0,0 +1,155 @@
+import math
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+
+import numpy as np
+
+PROFILE_LINEAR = 'linear'
+PROFILE_TRAPEZOIDAL = 'trapezoidal'
+PROFILE_SCURVE = 's-curve'
+PROFILES = (PROFILE_LINEAR, PROFILE_TRAPEZOIDAL, PROFILE_SCURVE)
+
+# Anteil der Bewegungszeit für Beschleunigen bzw. Bremsen beim Trapezprofil
+TRAPEZOID_RAMP = 0.25
+
+# ServoKit-Standard-Pulsbereich für Kanäle ohne Konfiguration
+DEFAULT_MIN_PULSE = 750
+DEFAULT_MAX_PULSE = 2250
+
+
+def calibration_from_config(servo_data, frequency=50):
+    """
+    Rechnet die Servo-Konfiguration in eine Kalibrierung (c0, c1, c2) um,
+    mit duty = c0 + floor(angle * c1 + c2). Das Tupel ist hashbar und dient als Cache-Schlüssel.
+    """
+    if servo_data is not None and ('min_duty' in servo_data or 'max_duty' in servo_data):
+        # Duty-Cycle in Prozent (min_duty/max_duty)
+        min_duty = float(servo_data.get('min_duty', 2.5))
+        max_duty = float(servo_data.get('max_duty', 12.5))
+        return (0, (max_duty - min_duty) / 180.0 * 655.35, min_duty * 655.35)
+
+    if servo_data is None:
+        min_pulse, max_pulse = DEFAULT_MIN_PULSE, DEFAULT_MAX_PULSE
+    else:
+        min_pulse = servo_data.get('min_pulse', 500)
+        max_pulse = servo_data.get('max_pulse', 2500)
+
+    # Wie adafruit_motor.servo: ganzzahliger Minimalwert plus ganzzahliger Anteil des Bereichs
+    min_duty = int((min_pulse * frequency) / 1000000 * 0xFFFF)
+    max_duty = (max_pulse * frequency) / 1000000 * 0xFFFF
+    duty_range = int(max_duty - min_duty)
+    return (min_duty, duty_range / 180.0, 0.0)
+
+
+def duty_for_angle(angle, calibration):
+    """Duty-Cycle für einen einzelnen Winkel (gleiche Rechnung wie die Vektorvariante)"""
+    c0, c1, c2 = calibration
+    return c0 + math.floor(angle * c1 + c2)
+
+
+@lru_cache(maxsize=64)
+def normalized_profile(profile, steps):
+    """Normierter Weg (0..1] für jeden Schritt eines Profils; der letzte Wert ist immer 1.0"""
+    steps = max(1, int(steps))
+    t = np.arange(1, steps + 1, dtype=np.float64) / steps
+
+    if profile == PROFILE_LINEAR:
+        s = t
+    elif profile == PROFILE_SCURVE:
+        # Minimum-Jerk (quintisch): Geschwindigkeit und Beschleunigung an beiden Enden null
+        s = t * t * t * (10.0 - 15.0 * t + 6.0 * t * t)
+    elif profile == PROFILE_TRAPEZOIDAL:
+        # Konstante Beschleunigung, konstante Geschwindigkeit, konstantes Bremsen
+        r = TRAPEZOID_RAMP
+        v = 1.0 / (1.0 - r)
+        s = np.where(
+            t < r,
+            0.5 * v / r * t * t,
+            np.where(
+                t <= 1.0 - r,
+                v * (t - 0.5 * r),
+                1.0 - 0.5 * v / r * (1.0 - t) ** 2
+            )
+        )
+    else:
+        raise ValueError(f"Unbekanntes Bewegungsprofil: {profile}")
+
+    s = np.asarray(s, dtype=np.float64)
+    s[-1] = 1.0
+    s.setflags(write=False)
+    return s
+
+
+class TrajectoryCache:
+    """LRU-Cache für fertige Duty-Cycle-Arrays je (Start, Ziel, Profil, Schritte, Kalibrierung)"""
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def plan(self, requests, profile=PROFILE_LINEAR, steps=10):
+        """
+        Berechnet Trajektorien für viele Kanäle auf einmal
+        :param requests: Dict {Kanal: (Startwinkel, Zielwinkel, Kalibrierung)}
+        :return: Dict {Kanal: (Duty-Cycle-Array uint16, normierter Weg)}
+        """
+        fractions = normalized_profile(profile, steps)
+        result = {}
+        missing = OrderedDict()
+        with self._lock:
+            for channel, (start, target, calibration) in requests.items():
+                key = (float(start), float(target), profile, len(fractions), calibration)
+                duties = self._entries.get(key)
+                if duties is not None:
+                    self._entries.move_to_end(key)
+                    result[channel] = (duties, fractions)
+                    self.hits += 1
+                elif key in missing:
+                    # Gleiche Trajektorie für mehrere Kanäle nur einmal berechnen
+                    missing[key].append(channel)
+                    self.hits += 1
+                else:
+                    missing[key] = [channel]
+                    self.misses += 1
+
+        if missing:
+            # Alle fehlenden Trajektorien in einem Rutsch: (Trajektorien x Schritte)
+            keys = list(missing)
+            start = np.array([k[0] for k in keys])[:, None]
+            target = np.array([k[1] for k in keys])[:, None]
+            c0 = np.array([k[4][0] for k in keys], dtype=np.float64)[:, None]
+            c1 = np.array([k[4][1] for k in keys], dtype=np.float64)[:, None]
+            c2 = np.array([k[4][2] for k in keys], dtype=np.float64)[:, None]
+
+            angles = start + (target - start) * fractions[None, :]
+            duties = np.clip(c0 + np.floor(angles * c1 + c2), 0, 0xFFFF).astype(np.uint16)
+            duties.setflags(write=False)
+
+            with self._lock:
+                for row, key in enumerate(keys):
+                    self._entries[key] = duties[row]
+                    for channel in missing[key]:
+                        result[channel] = (duties[row], fractions)
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+        return result
+
+    def get_stats(self):
+        """Cache-Statistik"""
+        return {'entries': len(self._entries), 'hits': self.hits, 'misses': self.misses}
+
+
+@lru_cache(maxsize=256)
+def stepped_angles(start, target, step_size):
+    """Winkelfolge von start nach target in festen Schritten (letzter Wert ist exakt target)"""
+    step_size = abs(step_size)
+    count = max(1, int(math.ceil(abs(target - start) / step_size - 1e-9)))
+    direction = 1.0 if target >= start else -1.0
+    angles = start + direction * step_size * np.arange(1, count + 1, dtype=np.float64)
+    angles = np.minimum(angles, target) if direction > 0 else np.maximum(angles, target)
+    angles[-1] = target
+    return tuple(angles.tolist())
@@ -0,0 +1,160 @@
+import time
+import itertools
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+import metrics
+
+MOVE_SECONDS = metrics.histogram('servo_move_seconds', 'Dauer eines Stellauftrags vom Einreihen bis zum Einschwingen',
+                                 ('result',), buckets=metrics.MOVE_BUCKETS)
+
+
+class MoveJob:
+    """Stellauftrag für einen Servo mit Zeitstempeln für Einreihen, Start und Einschwingen"""
+
+    __slots__ = ('id', 'servo_id', 'position', 'angle', 'status', 'queued_at', 'started_at', 'settled_at',
+                 'reached_angle', 'error', 'future')
+
+    def __init__(self, job_id, servo_id, position, angle):
+        self.id = job_id
+        self.servo_id = servo_id
+        self.position = position
+        self.angle = angle
+        self.status = 'queued'
+        self.queued_at = time.time()
+        self.started_at = None
+        self.settled_at = None
+        self.reached_angle = None
+        self.error = None
+        # Wird erst nach dem Eintragen der Zeitstempel abgeschlossen (Ergebnis: erreichter Winkel)
+        self.future = Future()
+
+    @property
+    def finished(self):
+        return self.status in ('settled', 'error')
+
+    def to_dict(self):
+        """Auftrag als Dict für JSON-Antworten"""
+        job = {
+            'id': self.id,
+            'servo_id': self.servo_id,
+            'position': self.position,
+            'angle': self.angle,
+            'status': self.status,
+            'queued_at': self.queued_at,
+            'started_at': self.started_at,
+            'settled_at': self.settled_at
+        }
+        if self.reached_angle is not None and self.reached_angle != self.angle:
+            # Von einem neueren Ziel für denselben Servo überholt
+            job['coalesced'] = True
+            job['reached_angle'] = self.reached_angle
+        if self.error is not None:
+            job['error'] = self.error
+        return job
+
+
+class MoveJobRegistry:
+    """
+    Verwaltet Stellaufträge: Aufträge werden vor dem Start der Bewegung angelegt, beim
+    tatsächlichen Start (Stromkontingent frei) und beim Einschwingen mit Zeitstempeln versehen.
+    Abgeschlossene Aufträge bleiben abrufbar, bis max_jobs überschritten wird.
+    """
+
+    def __init__(self, max_jobs=1024):
+        self.max_jobs = max_jobs
+        self._jobs = OrderedDict()   # Auftrags-ID -> MoveJob (älteste zuerst)
+        self._pending = {}           # Servo -> Liste noch nicht gestarteter bzw. laufender Aufträge
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._listeners = []
+
+    def add_listener(self, func):
+        """Registriert ein Callable(MoveJob), aufgerufen nach Abschluss jedes Auftrags"""
+        self._listeners.append(func)
+
+    def create(self, servo_id, position, angle):
+        """Legt einen Auftrag an (Status 'queued')"""
+        with self._lock:
+            job = MoveJob(next(self._ids), servo_id, position, angle)
+            self._jobs[job.id] = job
+            self._pending.setdefault(servo_id, []).append(job)
+            self._evict()
+        return job
+
+    def get(self, job_id):
+        """Auftrag zu einer ID oder None"""
+        return self._jobs.get(job_id)
+
+    def started(self, servo_id):
+        """Bewegung eines Servos hat begonnen: alle wartenden Aufträge des Servos laufen jetzt"""
+        now = time.time()
+        with self._lock:
+            for job in self._pending.get(servo_id, ()):
+                if job.started_at is None:
+                    job.started_at = now
+                    job.status = 'running'
+
+    def attach(self, job, future, running=False):
+        """
+        Verknüpft einen Auftrag mit dem Future der Motion-Engine
+        :param running: Servo läuft bereits auf dieses Ziel (Auftrag wurde einer Bewegung angeschlossen)
+        """
+        if running:
+            self.started(job.servo_id)
+        future.add_done_callback(lambda f: self._finish(job, f))
+
+    def fail(self, job, error):
+        """Auftrag ist gescheitert, bevor eine Bewegung geplant wurde"""
+        self._complete(job, error=error)
+
+    def _finish(self, job, future):
+        if future.cancelled():
+            self._complete(job, error=Exception("Bewegung abgebrochen"))
+        elif future.exception() is not None:
+            self._complete(job, error=future.exception())
+        else:
+            self._complete(job, reached=future.result())
+
+    def _complete(self, job, reached=None, error=None):
+        with self._lock:
+            pending = self._pending.get(job.servo_id)
+            if pending and job in pending:
+                pending.remove(job)
+                if not pending:
+                    del self._pending[job.servo_id]
+            job.settled_at = time.time()
+            if job.started_at is None and error is None:
+                job.started_at = job.settled_at
+            if error is not None:
+                job.status = 'error'
+                job.error = str(error)
+            else:
+                job.status = 'settled'
+                job.reached_angle = reached
+        MOVE_SECONDS.observe(job.settled_at - job.queued_at, job.status)
+        if error is not None:
+            job.future.set_exception(error)
+        else:
+            job.future.set_result(reached)
+        for listener in self._listeners:
+            listener(job)
+
+    def _evict(self):
+        """Entfernt die ältesten abgeschlossenen Aufträge über max_jobs (Aufrufer hält die Sperre)"""
+        excess = len(self._jobs) - self.max_jobs
+        if excess <= 0:
+            return
+        stale = []
+        for job_id, job in self._jobs.items():
+            if job.finished:
+                stale.append(job_id)
+                if len(stale) == excess:
+                    break
+        for job_id in stale:
+            del self._jobs[job_id]
+
+    def get_stats(self):
+        """Anzahl gespeicherter und noch offener Aufträge"""
+        return {'jobs': len(self._jobs), 'pending': sum(len(jobs) for jobs in self._pending.values())}
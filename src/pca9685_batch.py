@@ -0,0 +1,170 @@
+import time
+import logging
+import threading
+
+import metrics
+
+# PCA9685 Register
+MODE1 = 0x00
+MODE1_AI = 0x20        # Auto-Increment Bit
+LED0_ON_L = 0x06       # Erstes PWM-Register, 4 Bytes pro Kanal
+FULL_BIT = 0x1000      # Full-On/Full-Off Bit in ON_H/OFF_H
+
+I2C_WRITE_SECONDS = metrics.histogram('i2c_write_seconds', 'Dauer einer I2C-Blockschreibung',
+                                      buckets=metrics.I2C_BUCKETS)
+
+
+def duty_cycle_to_registers(duty_cycle):
+    """Rechnet einen 16-Bit Duty-Cycle in die (ON, OFF) Register-Werte des PCA9685 um"""
+    # Entspricht PWMChannel.duty_cycle aus adafruit_pca9685
+    if duty_cycle >= 0xFFFF:
+        return FULL_BIT, 0
+    if duty_cycle < 0x0010:
+        return 0, FULL_BIT
+    return 0, duty_cycle >> 4
+
+
+def angle_to_duty_cycle(angle, min_pulse=750, max_pulse=2250, frequency=50, actuation_range=180):
+    """Rechnet einen Winkel in einen 16-Bit Duty-Cycle um (wie adafruit_motor.servo)"""
+    min_duty = int((min_pulse * frequency) / 1000000 * 0xFFFF)
+    max_duty = (max_pulse * frequency) / 1000000 * 0xFFFF
+    duty_range = int(max_duty - min_duty)
+    return min_duty + int(angle / actuation_range * duty_range)
+
+
+class PCA9685BatchWriter:
+    """Sammelt Duty-Cycles mehrerer Kanäle und schreibt sie per Auto-Increment Blockschreiben"""
+
+    # Lücken bis zu dieser Länge werden mit den bekannten Registerwerten überbrückt,
+    # statt eine zusätzliche I2C-Transaktion zu beginnen
+    MAX_GAP = 2
+
+    def __init__(self, pca, channels=16, logger=None, lock=None):
+        """
+        :param pca: PCA9685-Objekt (z.B. ServoKit._pca) mit i2c_device
+        :param lock: Sperre des I2C-Busses; Boards am selben Bus teilen sich eine Sperre,
+                     damit Transaktionen verschiedener Threads nie ineinandergreifen
+        """
+        self.pca = pca
+        self.channels = channels
+        self.logger = logger or logging.getLogger('servo_controller')
+        self.lock = lock or threading.RLock()
+        self._pending = {}
+        self._auto_increment = False
+
+        # Schattenkopie der zuletzt geschriebenen (ON, OFF) Register pro Kanal
+        self._shadow = [None] * channels
+
+        # Zähler
+        self.transactions = 0
+        self.writes_issued = 0      # geänderte Kanäle
+        self.writes_skipped = 0     # unveränderte Kanäle, nicht geschrieben
+        self.writes_filler = 0      # unveränderte Kanäle, mitgeschrieben um Lücken zu überbrücken
+
+    def ensure_auto_increment(self):
+        """Setzt das Auto-Increment Bit im MODE1-Register, falls nötig"""
+        if self._auto_increment:
+            return
+        with self.lock:
+            mode1 = self.pca.mode1_reg
+            if not mode1 & MODE1_AI:
+                self.pca.mode1_reg = mode1 | MODE1_AI
+                self.transactions += 1
+            self._auto_increment = True
+
+    def stage(self, channel, duty_cycle):
+        """Merkt einen Duty-Cycle für den nächsten flush() vor"""
+        with self.lock:
+            self._pending[channel] = int(duty_cycle)
+
+    def stage_many(self, duty_cycles):
+        """Merkt mehrere Duty-Cycles vor ({Kanal: Duty-Cycle})"""
+        with self.lock:
+            for channel, duty_cycle in duty_cycles.items():
+                self._pending[channel] = int(duty_cycle)
+
+    def has_pending(self):
+        """Prüft ob Kanäle für den nächsten flush() vorgemerkt sind"""
+        return bool(self._pending)
+
+    def invalidate(self, channel=None):
+        """Verwirft die Schattenkopie (z.B. nach direktem Zugriff auf den PCA9685)"""
+        with self.lock:
+            if channel is None:
+                self._shadow = [None] * self.channels
+            else:
+                self._shadow[channel] = None
+
+    def flush(self):
+        """
+        Schreibt alle geänderten Kanäle; zusammenhängende Kanäle in einer Transaktion.
+        Läuft komplett unter der Bus-Sperre: Vormerkungen anderer Threads landen entweder
+        vollständig in diesem oder im nächsten flush(), Blockschreiben werden nie unterbrochen.
+        """
+        with self.lock:
+            if not self._pending:
+                return 0
+            pending, self._pending = self._pending, {}
+
+            # Nur Kanäle schreiben, deren Registerwerte sich tatsächlich ändern
+            dirty = {}
+            for channel, duty_cycle in pending.items():
+                registers = duty_cycle_to_registers(duty_cycle)
+                if self._shadow[channel] == registers:
+                    self.writes_skipped += 1
+                else:
+                    dirty[channel] = registers
+            if not dirty:
+                return 0
+
+            self.ensure_auto_increment()
+            runs = self._runs(dirty)
+            for first, values in runs:
+                self._write_block(first, values)
+            self.writes_issued += len(dirty)
+            self.writes_filler += sum(len(values) for _, values in runs) - len(dirty)
+            return len(runs)
+
+    def get_stats(self):
+        """Liefert die Zähler für geschriebene, übersprungene und zum Lückenfüllen mitgeschriebene Kanäle"""
+        return {
+            'transactions': self.transactions,
+            'writes_issued': self.writes_issued,
+            'writes_skipped': self.writes_skipped,
+            'writes_filler': self.writes_filler
+        }
+
+    def _runs(self, dirty):
+        """Zerlegt die Kanäle in zusammenhängende Bereiche [(erster Kanal, [(ON, OFF)])]"""
+        runs = []
+        for channel in sorted(dirty):
+            if runs:
+                first, values = runs[-1]
+                next_channel = first + len(values)
+                gap = range(next_channel, channel)
+                if len(gap) <= self.MAX_GAP and all(self._shadow[c] is not None for c in gap):
+                    # Lücke mit unveränderten Schattenwerten füllen und Bereich fortsetzen
+                    values.extend(self._shadow[c] for c in gap)
+                    values.append(dirty[channel])
+                    continue
+            runs.append((channel, [dirty[channel]]))
+        return runs
+
+    def _write_block(self, first_channel, registers):
+        """Schreibt die PWM-Register mehrerer aufeinanderfolgender Kanäle in einer I2C-Transaktion"""
+        buf = bytearray(1 + 4 * len(registers))
+        buf[0] = LED0_ON_L + 4 * first_channel
+        offset = 1
+        for on, off in registers:
+            buf[offset] = on & 0xFF
+            buf[offset + 1] = on >> 8
+            buf[offset + 2] = off & 0xFF
+            buf[offset + 3] = off >> 8
+            offset += 4
+        started = time.perf_counter()
+        with self.pca.i2c_device as i2c:
+            i2c.write(buf)
+        I2C_WRITE_SECONDS.observe(time.perf_counter() - started)
+        self.transactions += 1
+        for i, value in enumerate(registers):
+            self._shadow[first_channel + i] = value
@@ -6,13 +6,7 @@ import logging
 from logging.handlers import RotatingFileHandler
 from concurrent.futures import ThreadPoolExecutor
 import glob
-import board
-import busio
-from adafruit_servokit import ServoKit
-
-# Raspberry Pi spezifische I2C Pins
-SCL = board.SCL  # GPIO 3 (Pin 5)
-SDA = board.SDA  # GPIO 2 (Pin 3)
+from hardware import create_servokit, create_pca9685, get_backend, get_sim_config
 
 class ServoSafetyMonitor:
     def __init__(self, config=None):
@@ -117,7 +111,7 @@ class PiGPIOServoController:
         if self.use_servokit:
             try:
                 # ServoKit mit 8 Kanälen initialisieren
-                self.kit = ServoKit(channels=8)
+                self.kit = create_servokit(channels=8, backend=get_backend())
                 self.logger.info("ServoKit erfolgreich initialisiert")
                 
             except Exception as e:
@@ -468,14 +462,16 @@ class PCA9685ServoController:
         self.config_file = config_file
         self.logger = logging.getLogger('servo_controller')
         
-        # Initialisiere I2C
-        i2c = busio.I2C(board.SCL, board.SDA)
-        self.pca = PCA9685(i2c)
-        self.pca.frequency = 50  # Standard-Frequenz für Servos
-        
         # Lade oder erstelle Konfiguration
         self.load_config()
         
+        # Initialisiere PCA9685 über I2C (oder simuliert, siehe hardware.py)
+        self.pca = create_pca9685(
+            frequency=50,  # Standard-Frequenz für Servos
+            backend=get_backend(self.config),
+            sim_config=get_sim_config(self.config)
+        )
+        
         # Servo-Status initialisieren
         self.servo_states = {}
         for i in range(16):
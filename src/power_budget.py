@@ -0,0 +1,51 @@
+import threading
+
+
+class PowerBudget:
+    """Stromkontingent der gemeinsamen Servo-Versorgung: wie viele Servos dürfen gleichzeitig laufen"""
+
+    def __init__(self, budget, default_current=0.7):
+        """
+        :param budget: Verfügbarer Strom für bewegte Servos in Ampere
+        :param default_current: Geschätzter Strom eines bewegten Servos in Ampere
+        """
+        self.budget = float(budget)
+        self.default_current = float(default_current)
+        self._allocations = {}
+        self._lock = threading.Lock()
+        self.in_use = 0.0
+        self.peak = 0.0
+        self.deferred = 0
+
+    def try_acquire(self, channel, current=None):
+        """Reserviert Strom für einen Kanal; False wenn das Kontingent nicht reicht"""
+        current = self.default_current if current is None else float(current)
+        with self._lock:
+            if channel in self._allocations:
+                return True
+            # Ein einzelner Servo darf immer laufen, auch wenn er allein das Kontingent übersteigt
+            if self._allocations and self.in_use + current > self.budget + 1e-9:
+                self.deferred += 1
+                return False
+            self._allocations[channel] = current
+            self.in_use += current
+            if self.in_use > self.peak:
+                self.peak = self.in_use
+            return True
+
+    def release(self, channel):
+        """Gibt den reservierten Strom eines Kanals frei"""
+        with self._lock:
+            current = self._allocations.pop(channel, None)
+            if current is not None:
+                self.in_use = max(0.0, self.in_use - current)
+
+    def get_stats(self):
+        """Liefert Kontingent, aktuelle und maximale Belastung"""
+        return {
+            'budget': self.budget,
+            'in_use': round(self.in_use, 3),
+            'peak': round(self.peak, 3),
+            'active': len(self._allocations),
+            'deferred': self.deferred
+        }
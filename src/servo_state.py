@@ -0,0 +1,182 @@
+import threading
+from collections import deque
+
+
+class ServoState:
+    """Status eines Servos als kompakter, unveränderlicher Datensatz"""
+
+    __slots__ = ('position', 'current_angle', 'last_move', 'error', 'initialized', 'status', 'message',
+                 'energized', 'release_count', 'reenergize_count')
+
+    def __init__(self, position=None, current_angle=None, last_move=0.0, error=False, initialized=True,
+                 status='initialized', message=None, energized=False, release_count=0, reenergize_count=0):
+        self.position = position
+        self.current_angle = current_angle
+        self.last_move = last_move
+        self.error = error
+        self.initialized = initialized
+        self.status = status
+        self.message = message
+        self.energized = energized
+        self.release_count = release_count
+        self.reenergize_count = reenergize_count
+
+    def replace(self, **fields):
+        """Kopie mit geänderten Feldern (der Datensatz selbst wird nie verändert); ohne Änderung self"""
+        if all(getattr(self, name) == value for name, value in fields.items()):
+            return self
+        state = ServoState.__new__(ServoState)
+        for name in ServoState.__slots__:
+            setattr(state, name, fields[name] if name in fields else getattr(self, name))
+        return state
+
+    def to_dict(self):
+        """Status als Dict für JSON-Antworten ('message' nur bei gesetzter Meldung)"""
+        state = {name: getattr(self, name) for name in ServoState.__slots__}
+        if state['message'] is None:
+            del state['message']
+        return state
+
+
+class StateSnapshot:
+    """Unveränderlicher Stand aller Servos mit Versionsnummer"""
+
+    __slots__ = ('version', 'states')
+
+    def __init__(self, version, states):
+        self.version = version
+        self.states = states
+
+    def __getitem__(self, channel):
+        return self.states[channel]
+
+    def __len__(self):
+        return len(self.states)
+
+    def __iter__(self):
+        return iter(self.states)
+
+    def to_dict(self):
+        """Alle Servos als {Kanal als String: Status-Dict} (Format der Web-API)"""
+        return {str(i): state.to_dict() for i, state in enumerate(self.states)}
+
+    def changed_since(self, previous):
+        """Kanäle, deren Datensatz sich gegenüber einem früheren Snapshot geändert hat (alle ohne previous)"""
+        if previous is None:
+            return list(range(len(self.states)))
+        old = previous.states
+        return [i for i, state in enumerate(self.states) if i >= len(old) or old[i] is not state]
+
+
+class ServoStateStore:
+    """
+    Status aller Servos, indiziert über den globalen Kanal. Schreiber ersetzen Datensätze unter
+    einer Sperre und veröffentlichen einen neuen Snapshot mit erhöhter Version; Leser holen den
+    aktuellen Snapshot ohne Sperre und erkennen über die Version in O(1), ob sich etwas geändert hat.
+    """
+
+    def __init__(self, count, history=256, **defaults):
+        """
+        :param count: Anzahl der Kanäle
+        :param history: Anzahl der letzten Snapshots, ab denen Änderungen nachgeliefert werden können
+        """
+        self._write_lock = threading.Lock()
+        self._changed = threading.Condition(self._write_lock)
+        state = ServoState(**defaults)
+        # Die Referenz wird nur als Ganzes ersetzt; eine Zuweisung ist in CPython atomar
+        self._snapshot = StateSnapshot(0, (state,) * count)
+        self._history = deque([self._snapshot], maxlen=history)
+
+    @property
+    def version(self):
+        """Versionsnummer, steigt bei jeder Änderung"""
+        return self._snapshot.version
+
+    def snapshot(self):
+        """Konsistenter Stand aller Servos (ohne Sperre, ohne Kopie)"""
+        return self._snapshot
+
+    def snapshot_at(self, version):
+        """Früherer Snapshot mit genau dieser Version oder None, wenn er nicht mehr vorliegt"""
+        with self._write_lock:
+            history = list(self._history)
+        for snapshot in reversed(history):
+            if snapshot.version == version:
+                return snapshot
+            if snapshot.version < version:
+                break
+        return None
+
+    def wait_for_change(self, version, timeout=None):
+        """Wartet bis die Version größer als version ist; liefert den neuen Snapshot oder None (Timeout)"""
+        snapshot = self._snapshot
+        if snapshot.version > version:
+            return snapshot
+        with self._changed:
+            if self._changed.wait_for(lambda: self._snapshot.version > version, timeout):
+                return self._snapshot
+        return None
+
+    def __getitem__(self, channel):
+        return self._snapshot.states[channel]
+
+    def __contains__(self, channel):
+        return isinstance(channel, int) and 0 <= channel < len(self._snapshot.states)
+
+    def __len__(self):
+        return len(self._snapshot.states)
+
+    def get(self, channel, default=None):
+        """Status eines Servos oder default für unbekannte Kanäle (ohne Sperre)"""
+        if channel in self:
+            return self._snapshot.states[channel]
+        return default
+
+    def set(self, channel, state):
+        """Ersetzt den Status eines Servos vollständig"""
+        with self._write_lock:
+            self._publish(channel, state)
+
+    def update(self, channel, fields):
+        """Übernimmt einzelne Felder in den Status eines Servos"""
+        with self._write_lock:
+            self._publish(channel, self._snapshot.states[channel].replace(**fields))
+
+    def modify(self, channel, func):
+        """
+        Atomares Lesen-Ändern-Schreiben: func(alter Status) liefert die geänderten Felder
+        (oder None für keine Änderung)
+        """
+        with self._write_lock:
+            current = self._snapshot.states[channel]
+            fields = func(current)
+            if fields:
+                self._publish(channel, current.replace(**fields))
+            return fields
+
+    def apply(self, version, states, reset=False):
+        """
+        Übernimmt Datensätze mit der Version eines anderen Stores (Spiegel des Daemon-Status im Client)
+        :param states: Dict {Kanal: ServoState}
+        :param reset: Verlauf verwerfen (z.B. nach Neustart des Daemons, Versionen beginnen neu)
+        """
+        with self._write_lock:
+            current = list(self._snapshot.states)
+            for channel, state in states.items():
+                current[channel] = state
+            self._snapshot = StateSnapshot(version, tuple(current))
+            if reset:
+                self._history.clear()
+            self._history.append(self._snapshot)
+            self._changed.notify_all()
+
+    def _publish(self, channel, state):
+        """Neuen Snapshot mit erhöhter Version veröffentlichen (Aufrufer hält die Sperre)"""
+        snapshot = self._snapshot
+        if snapshot.states[channel] is state:
+            return
+        states = list(snapshot.states)
+        states[channel] = state
+        self._snapshot = StateSnapshot(snapshot.version + 1, tuple(states))
+        self._history.append(self._snapshot)
+        self._changed.notify_all()
@@ -1,10 +1,22 @@
 import time
-import json
+import math
+import threading
 import os
 import logging
-from adafruit_servokit import ServoKit
-import board
-import busio
+from concurrent.futures import Future
+from config_cache import ConfigCache
+from motion_engine import MotionEngine
+from motion_profile import TrajectoryCache, PROFILE_LINEAR, calibration_from_config, duty_for_angle, stepped_angles
+from hardware import get_backend, get_sim_config
+from board_manager import BoardManager
+from timer_queue import TimerQueue
+from power_budget import PowerBudget
+from servo_state import ServoStateStore
+from move_jobs import MoveJobRegistry
+from log_queue import LazyJson
+import metrics
+
+SERVO_ERRORS = metrics.counter('servo_errors_total', 'Fehler beim Stellen pro Servo', ('servo',))
 
 class ServoKitController:
     """Klasse zur Steuerung der Servos über den ServoKit"""
@@ -12,31 +24,80 @@ class ServoKitController:
     def __init__(self):
         """Initialisiert den ServoKit Controller"""
         try:
-            # Logger initialisieren
+            # Logger initialisieren (Level aus LOGGING.LEVEL, sobald die Konfiguration geladen ist)
             self.logger = logging.getLogger('servo_controller')
-            self.logger.setLevel(logging.DEBUG)
             
             # Config-Datei Pfad bestimmen (absoluter Pfad)
             self.config_file = os.path.abspath(os.path.join(os.path.dirname(__file__), "config.json"))
             self.logger.info(f"Config-Datei Pfad: {self.config_file}")
             
-            # Lade Konfiguration
-            self.config = self.load_config()
-            
-            # Erstelle ServoKit für 16 Servos
-            self.kit1 = ServoKit(channels=16)
-            
-            # Initialisiere Servo-Status
-            self.servo_states = {}
-            for i in range(16):
-                self.servo_states[str(i)] = {
-                    'position': None,
-                    'current_angle': None,
-                    'last_move': time.time(),
-                    'error': False,
-                    'initialized': True,
-                    'status': 'initialized'
-                }
+            # Konfiguration wird im Speicher gehalten und nur bei Dateiänderungen neu geladen
+            self.config_cache = ConfigCache(self.config_file, logger=self.logger)
+            self.load_config()
+            
+            # Standard INFO: DEBUG-Aufrufe im Bewegungspfad kosten dann nur einen Level-Vergleich.
+            # Handler (über log_queue im Hintergrund-Thread) richten Web-Server bzw. GUI ein.
+            self.log_config = self.config.get('LOGGING', {})
+            self.logger.setLevel(self.log_config.get('LEVEL', 'INFO').upper())
+            
+            # Erstelle ServoKits für alle Boards aus HARDWARE.BOARDS (Standard: ein Board mit 16 Servos).
+            # Die Kanäle aller Boards bilden einen globalen Kanalraum; Register-Schreibzugriffe
+            # werden pro Board gebündelt, Boards auf verschiedenen I2C-Bussen parallel beschrieben.
+            self.pwm_frequency = 50
+            self.backend = get_backend(self.config)
+            self.boards = BoardManager(
+                self.config.get('HARDWARE', {}).get('BOARDS'),
+                frequency=self.pwm_frequency,
+                backend=self.backend,
+                sim_config=get_sim_config(self.config),
+                logger=self.logger
+            )
+            self.num_servos = self.boards.channel_count
+            self.kit1 = self.boards.get_kit(0)
+            self.kit2 = self.boards.get_kit(1)
+            
+            # Motion-Engine: bewegt alle Kanäle nicht-blockierend über eine gemeinsame Tick-Schleife
+            # Trajektorien werden als fertige Duty-Cycle-Arrays vorberechnet und gecacht
+            self.trajectory_cache = TrajectoryCache()
+            
+            # Stromkontingent der gemeinsamen 5V-Versorgung (SERVO_CONFIG.POWER): es laufen so viele
+            # Bewegungen gleichzeitig wie das Kontingent erlaubt, der Rest wird eingereiht
+            power_config = self.config.get('SERVO_CONFIG', {}).get('POWER', {})
+            self.power_budget = PowerBudget(
+                power_config.get('BUDGET', power_config.get('SUPPLY_CURRENT', 20.0) * 0.8),
+                default_current=power_config.get('MOVING_CURRENT', 0.7)
+            )
+            self.slew_rate = float(power_config.get('SLEW_RATE', 600.0))
+            
+            # Stellaufträge mit Zeitstempeln (eingereiht, gestartet, eingeschwungen) für die Web-API
+            self.move_jobs = MoveJobRegistry()
+            
+            self.motion_engine = MotionEngine(
+                self._apply_motion_updates,
+                self._plan_motions,
+                on_settled=self._on_motion_settled,
+                tick_interval=0.02,
+                logger=self.logger,
+                power_budget=self.power_budget,
+                current_for=self._moving_current,
+                settle_ticks=self._settle_ticks,
+                on_started=self.move_jobs.started
+            )
+            
+            # Hold-then-release: Servos werden nach dem Einschwingen per Timer stromlos geschaltet
+            # (RELEASE_DELAY in SERVO_CONFIG bzw. release_delay pro Servo, in Sekunden)
+            self.release_timers = TimerQueue('servo-release', logger=self.logger)
+            # Bestromen und Release laufen unter einer Sperre; die Generation pro Servo zählt jedes
+            # Bestromen, ein Release mit veralteter Generation wird verworfen
+            self._power_lock = threading.Lock()
+            self._power_generation = [0] * self.num_servos
+            self.skipped_commands = 0
+            
+            # Servo-Status inkl. Stromzustand als kompakte Datensätze, indiziert über den Kanal:
+            # Schreiber ersetzen Einträge atomar, Leser (Web, GUI, Automatik) holen ohne Sperre einen
+            # Snapshot und erkennen über dessen Versionsnummer, ob sich etwas geändert hat
+            self.servo_states = ServoStateStore(self.num_servos, last_move=time.time())
+            self._register_metrics()
                 
             self.logger.info("ServoKit Controller erfolgreich initialisiert")
             
@@ -44,19 +105,34 @@ class ServoKitController:
             self.logger.error(f"Fehler bei der Initialisierung: {str(e)}")
             raise
             
+    def _register_metrics(self):
+        """Warteschlangen und Zählerstände für /metrics (werden erst beim Abruf gelesen)"""
+        motion_stats = self.motion_engine.get_stats
+        metrics.callback('motion_queue_depth', 'Laufende und auf Stromkontingent wartende Bewegungen',
+                         lambda: {('active',): motion_stats()['active'], ('queued',): motion_stats()['queued']},
+                         labelnames=('state',))
+        metrics.callback('motion_coalesced_total', 'Durch neuere Ziele ersetzte Stellbefehle',
+                         lambda: self.motion_engine.coalesced, type='counter')
+        metrics.callback('motion_skipped_total', 'Stellbefehle ohne Bewegung (Servo stand schon am Ziel)',
+                         lambda: self.skipped_commands, type='counter')
+        metrics.callback('move_jobs_pending', 'Offene Stellaufträge', lambda: self.move_jobs.get_stats()['pending'])
+        metrics.callback('power_in_use_amperes', 'Belegtes Stromkontingent', lambda: self.power_budget.in_use)
+        metrics.callback('config_reloads_total', 'Ladevorgänge der config.json',
+                         lambda: self.config_cache.reload_count, type='counter')
+
     def get_servo_status(self, servo_id):
         """Liefert den Status eines Servos"""
         try:
             # Hole Status aus servo_states
-            status = self.servo_states.get(str(servo_id), {})
-            if not status:
+            status = self.servo_states.get(servo_id)
+            if status is None:
                 return {
                     'initialized': False,
                     'error': True,
                     'status': 'error',
                     'message': 'Servo nicht gefunden'
                 }
-            return status
+            return status.to_dict()
         except Exception as e:
             return {
                 'initialized': False,
@@ -66,69 +142,18 @@ class ServoKitController:
             }
 
     def move_servo(self, servo_id, direction):
-        """Bewegt einen Servo in die angegebene Richtung"""
+        """Bewegt einen Servo und wartet bis er eingeschwungen ist (ohne Warten: submit_move)"""
         try:
-            # Prüfe ob Servo verfügbar ist
-            if servo_id >= 16:
-                raise Exception("Ungültige Servo-ID")
-            if self.kit1 is None:
-                raise Exception("Board nicht verfügbar")
-
-            # Lade aktuelle Konfiguration neu
-            self.config = self.load_config()
-            self.logger.debug(f"Geladene Konfiguration: {json.dumps(self.config, indent=2)}")
-
-            # Hole Konfiguration für den Servo
-            servo_config = self.config.get('SERVO_CONFIG', {})
-            servos = servo_config.get('SERVOS', [])
-            servo_data = next((s for s in servos if s['id'] == servo_id), None)
-            
-            if not servo_data:
-                self.logger.warning(f"Keine Konfiguration für Servo {servo_id} gefunden")
-                # Erstelle Standard-Konfiguration für diesen Servo
-                servo_data = {
-                    'id': servo_id,
-                    'gpio': servo_id,
-                    'left_angle': 45.0,
-                    'right_angle': 135.0,
-                    'min_pulse': 500,
-                    'max_pulse': 2500
-                }
-            
-            # Setze Zielwinkel basierend auf Richtung
-            target_angle = servo_data['left_angle'] if direction == 'left' else servo_data['right_angle']
-            
-            # Setze Pulslängen
-            min_pulse = servo_data.get('min_pulse', 500)
-            max_pulse = servo_data.get('max_pulse', 2500)
-            self.kit1.servo[servo_id].set_pulse_width_range(min_pulse, max_pulse)
-            
-            # Bewege Servo
-            self.logger.info(f"Bewege Servo {servo_id} nach {direction} (Winkel: {target_angle}°)")
-            self.kit1.servo[servo_id].angle = target_angle
-            
-            # Aktualisiere Status
-            self.servo_states[str(servo_id)].update({
-                'position': direction,
-                'current_angle': target_angle,
-                'last_move': time.time(),
-                'error': False,
-                'status': 'ok'
-            })
-            
-            return {
-                'status': 'success',
-                'position': direction,
-                'angle': target_angle
-            }
+            direction = 'left' if direction == 'left' else 'right'
+            return self.move_servos({servo_id: direction})[servo_id]
             
         except Exception as e:
-            error_msg = f"Fehler beim Bewegen von Servo {servo_id}: {str(e)}"
-            self.logger.error(error_msg)
+            self.logger.error("Fehler beim Bewegen von Servo %s: %s", servo_id, e)
             
             # Aktualisiere Fehlerstatus
-            if str(servo_id) in self.servo_states:
-                self.servo_states[str(servo_id)].update({
+            if servo_id in self.servo_states:
+                SERVO_ERRORS.inc(str(servo_id))
+                self.servo_states.update(servo_id, {
                     'error': True,
                     'status': 'error',
                     'message': str(e)
@@ -138,22 +163,123 @@ class ServoKitController:
                 'status': 'error',
                 'error': str(e)
             }
+
+    def move_servos(self, directions):
+        """
+        Bewegt mehrere Servos gleichzeitig in die angegebenen Richtungen (ein gemeinsamer Auftrag
+        an die Motion-Engine, wartet auf freies Stromkontingent und bis alle eingeschwungen sind)
+        :param directions: Dict {Servo-ID: 'left' oder 'right'}
+        :return: Dict {Servo-ID: Ergebnis wie bei move_servo}
+        :raises ValueError: bei einer ungültigen Angabe; dann wird kein Servo bewegt
+        """
+        jobs = self.submit_moves(directions)
+        
+        # Den Status schreibt die Motion-Engine beim Einschwingen (_on_motion_settled),
+        # damit ein verspäteter Aufrufer keinen neueren Stand überschreibt
+        results = {}
+        for servo_id, job in jobs.items():
+            try:
+                reached = job.future.result()
+            except Exception as e:
+                self._set_angle_error(servo_id, e)
+                results[servo_id] = {'status': 'error', 'error': str(e)}
+                continue
+            
+            if reached != job.angle:
+                # Befehl wurde von einem neueren Ziel für denselben Kanal überholt
+                self.logger.debug("Befehl für Servo %s nach %s durch neueres Ziel ersetzt",
+                                  servo_id, directions[servo_id])
+                results[servo_id] = {
+                    'status': 'success',
+                    'position': self._position_for_angle(reached, self._servo_data(servo_id)),
+                    'angle': reached,
+                    'coalesced': True
+                }
+            else:
+                results[servo_id] = {
+                    'status': 'success',
+                    'position': directions[servo_id],
+                    'angle': reached
+                }
+        return results
+
+    def submit_move(self, servo_id, direction):
+        """Startet eine Bewegung ohne zu warten; liefert den Stellauftrag (MoveJob)"""
+        return self.submit_moves({servo_id: direction})[servo_id]
+
+    def submit_moves(self, directions):
+        """
+        Startet Bewegungen für mehrere Servos ohne zu warten
+        :param directions: Dict {Servo-ID: 'left' oder 'right'}
+        :return: Dict {Servo-ID: MoveJob}; job.future liefert den erreichten Winkel
+        :raises ValueError: bei einer ungültigen Angabe; dann wird kein Servo bewegt
+        """
+        if self.kit1 is None:
+            raise Exception("Board nicht verfügbar")
+        
+        # Erst alles prüfen, dann bewegen
+        targets = {}
+        for servo_id, direction in directions.items():
+            if not isinstance(servo_id, int) or not 0 <= servo_id < self.num_servos:
+                raise ValueError(f"Ungültige Servo-ID: {servo_id}")
+            if direction not in ('left', 'right'):
+                raise ValueError(f"Ungültige Position für Servo {servo_id}: {direction}")
+            servo_data = self._servo_data(servo_id)
+            # Setze Zielwinkel basierend auf Richtung
+            targets[servo_id] = servo_data['left_angle'] if direction == 'left' else servo_data['right_angle']
+            self.logger.info("Bewege Servo %s nach %s (Winkel: %s°)", servo_id, direction, targets[servo_id])
+        
+        # Aufträge vor dem Planen anlegen, damit der Start-Zeitstempel der Motion-Engine sie erreicht
+        jobs = {servo_id: self.move_jobs.create(servo_id, directions[servo_id], angle)
+                for servo_id, angle in targets.items()}
+        try:
+            futures = self.set_angles(targets, steps=1, wait=False)
+        except Exception as e:
+            for job in jobs.values():
+                self.move_jobs.fail(job, e)
+            raise
+        
+        for servo_id, future in futures.items():
+            self.move_jobs.attach(jobs[servo_id], future, running=self.motion_engine.is_running(servo_id))
+        return jobs
+
+    def get_move_job(self, job_id):
+        """Stellauftrag zu einer ID oder None (abgeschlossene Aufträge werden nach einiger Zeit verworfen)"""
+        return self.move_jobs.get(job_id)
+
+    def _servo_data(self, servo_id):
+        """Konfiguration eines Servos aus dem Cache (neu geladen nur bei Dateiänderung) oder Standardwerte"""
+        servo_data = self.config_cache.get_servo(servo_id)
+        if not servo_data:
+            self.logger.warning("Keine Konfiguration für Servo %s gefunden", servo_id)
+            # Erstelle Standard-Konfiguration für diesen Servo
+            servo_data = {
+                'id': servo_id,
+                'gpio': servo_id,
+                'left_angle': 45.0,
+                'right_angle': 135.0,
+                'min_pulse': 500,
+                'max_pulse': 2500
+            }
+        return servo_data
             
+    @property
+    def config(self):
+        """Aktuelle Konfiguration aus dem Config-Cache"""
+        return self.config_cache.config
+
+    @config.setter
+    def config(self, config):
+        """Ersetzt die Konfiguration im Config-Cache"""
+        self.config_cache.config = config
+
     def load_config(self):
-        """Lädt die Konfiguration aus der Datei"""
+        """Lädt die Konfiguration aus der Datei (erzwingt ein Neuladen des Caches)"""
         try:
             self.logger.info(f"Versuche Config-Datei zu laden von: {self.config_file}")
-            
-            # Prüfe ob Datei existiert
-            if not os.path.exists(self.config_file):
-                self.logger.error(f"Config-Datei nicht gefunden: {self.config_file}")
-                raise FileNotFoundError(f"Config-Datei nicht gefunden: {self.config_file}")
-                
-            # Lade Konfiguration
-            with open(self.config_file, 'r') as f:
-                config = json.load(f)
-                self.logger.info(f"Config-Datei erfolgreich geladen: {json.dumps(config, indent=2)}")
-                return config
+            config = self.config_cache.load()
+            self.logger.info("Config-Datei erfolgreich geladen")
+            return config
                 
         except Exception as e:
             self.logger.error(f"Fehler beim Laden der Konfiguration: {str(e)}")
@@ -163,94 +289,269 @@ class ServoKitController:
         """Speichert die Konfiguration in der JSON-Datei"""
         try:
             self.logger.info(f"Speichere Konfiguration in: {self.config_file}")
-            with open(self.config_file, 'w') as f:
-                json.dump(self.config, f, indent=4)
+            self.config_cache.save(self.config)
             self.logger.info("Konfiguration erfolgreich gespeichert")
         except Exception as e:
             self.logger.error(f"Fehler beim Speichern der Konfiguration: {str(e)}")
             raise
             
-    def set_angle(self, servo_num: int, angle: float, steps=10) -> None:
-        """Setzt einen Servo auf einen bestimmten Winkel"""
-        try:
-            # Validiere Servo-Nummer
-            if not 0 <= servo_num < 16:
-                raise ValueError(f"Ungültige Servo-Nummer: {servo_num}")
-            
-            # Validiere Winkel
-            if not 0 <= angle <= 180:
-                raise ValueError(f"Winkel muss zwischen 0° und 180° liegen (war: {angle})")
-            
-            # Hole Servo-Konfiguration
-            servo_config = self.config.get('SERVO_CONFIG', {})
-            servos = servo_config.get('SERVOS', [])
-            servo_data = next((s for s in servos if s['id'] == servo_num), None)
-            
-            # Hole aktuellen Winkel, falls vorhanden, sonst setze auf 90°
-            current_angle = self.servo_states[str(servo_num)].get('current_angle')
-            if current_angle is None:
-                current_angle = 90.0  # Standardwinkel
+    def set_angle(self, servo_num: int, angle: float, steps=10, wait=True):
+        """
+        Setzt einen Servo auf einen bestimmten Winkel
+        :param wait: Bei False kehrt die Methode sofort zurück und liefert ein Future
+        """
+        futures = self.set_angles({servo_num: angle}, steps=steps, wait=wait)
+        if not wait:
+            return futures[servo_num]
+
+    def set_angles(self, targets, steps=10, wait=True, profile=None):
+        """
+        Bewegt mehrere Servos gleichzeitig über die Motion-Engine
+        :param targets: Dict {Servo-Nummer: Zielwinkel}
+        :param profile: Bewegungsprofil ('linear', 'trapezoidal', 's-curve'),
+                        Standard: 'profile' des Servos bzw. SERVO_CONFIG.MOTION_PROFILE
+        :param wait: Bei True wird gewartet bis alle Servos ihr Ziel erreicht haben
+        :return: Dict {Servo-Nummer: Future}; Servos, die ruhend und bestromt schon am Ziel stehen,
+                 bekommen ein bereits erfülltes Future (zählt als übersprungen)
+        """
+        motions = {}
+        skipped = {}
+        for servo_num, angle in targets.items():
+            try:
+                # Validiere Servo-Nummer
+                if not 0 <= servo_num < self.num_servos:
+                    raise ValueError(f"Ungültige Servo-Nummer: {servo_num}")
                 
-            # Berechne Schrittgröße
-            angle_diff = angle - current_angle
-            step_size = angle_diff / steps
-            
-            # Bewege Servo schrittweise
-            for step in range(steps):
-                current = current_angle + (step_size * (step + 1))
+                # Validiere Winkel
+                if not 0 <= angle <= 180:
+                    raise ValueError(f"Winkel muss zwischen 0° und 180° liegen (war: {angle})")
                 
-                if servo_data:
-                    # Berechne duty cycle basierend auf min_duty und max_duty
-                    min_duty = float(servo_data.get('min_duty', 2.5))
-                    max_duty = float(servo_data.get('max_duty', 12.5))
-                    duty_range = max_duty - min_duty
-                    duty = min_duty + (current / 180.0) * duty_range
-                    self.kit1._pca.channels[servo_num].duty_cycle = int(duty * 65535 / 100)
-                else:
-                    # Standard-Verhalten wenn keine spezifische Konfiguration
-                    self.kit1.servo[servo_num].angle = current
-                    
-                time.sleep(0.02)  # Kleine Pause zwischen den Schritten
-            
-            # Setze finalen Winkel
-            if servo_data:
-                min_duty = float(servo_data.get('min_duty', 2.5))
-                max_duty = float(servo_data.get('max_duty', 12.5))
-                duty_range = max_duty - min_duty
-                duty = min_duty + (angle / 180.0) * duty_range
-                self.kit1._pca.channels[servo_num].duty_cycle = int(duty * 65535 / 100)
-            else:
-                self.kit1.servo[servo_num].angle = angle
-            
-            # Aktualisiere Status
-            self.servo_states[str(servo_num)].update({
-                'current_angle': angle,
-                'last_move': time.time(),
-                'error': False,
-                'status': 'initialized'
+                # Hole aktuellen Winkel, falls vorhanden, sonst setze auf 90°
+                current_angle = self.servo_states[servo_num].current_angle
+                if current_angle is None:
+                    current_angle = 90.0  # Standardwinkel
+                elif current_angle == angle and self._holding(servo_num):
+                    # Steht schon am Ziel und wird gehalten: nichts zu planen oder zu schreiben
+                    skipped[servo_num] = angle
+                    continue
+                
+                motions[servo_num] = (current_angle, angle)
+                self.servo_states.update(servo_num, {'status': 'moving'})
+                self._energize(servo_num)
+                
+            except Exception as e:
+                self._set_angle_error(servo_num, e)
+                raise
+        
+        futures = self.motion_engine.move_many(motions, steps=steps, profile=profile) if motions else {}
+        for servo_num, angle in skipped.items():
+            futures[servo_num] = Future()
+            futures[servo_num].set_result(angle)
+        if skipped:
+            with self._power_lock:
+                self.skipped_commands += len(skipped)
+        
+        if wait:
+            for servo_num, future in futures.items():
+                try:
+                    future.result()
+                except Exception as e:
+                    self._set_angle_error(servo_num, e)
+                    raise
+        return futures
+
+    def _holding(self, servo_num):
+        """Servo ist bestromt und weder in Bewegung noch eingereiht"""
+        with self._power_lock:
+            return self.servo_states[servo_num].energized and not self.motion_engine.is_moving(servo_num)
+
+    def _set_angle_error(self, servo_num, error):
+        """Protokolliert einen Fehler beim Setzen eines Winkels und markiert den Servo"""
+        self.logger.error("Fehler beim Setzen des Winkels für Servo %s: %s", servo_num, error)
+        if servo_num in self.servo_states:
+            SERVO_ERRORS.inc(str(servo_num))
+            self.servo_states.update(servo_num, {
+                'error': True,
+                'status': 'error',
+                'message': str(error)
             })
-            
-        except Exception as e:
-            self.logger.error(f"Fehler beim Setzen des Winkels für Servo {servo_num}: {e}")
-            if str(servo_num) in self.servo_states:
-                self.servo_states[str(servo_num)].update({
-                    'error': True,
-                    'status': 'error',
-                    'message': str(e)
-                })
-            raise
-            
-    def move_to_angle(self, servo, current_angle, target_angle, step_size=1):
-        """Bewegt einen Servo langsam zu einem Zielwinkel"""
-        if current_angle < target_angle:
-            for angle in range(int(current_angle), int(target_angle), step_size):
-                servo.angle = angle
-                time.sleep(0.05)  # 50ms Pause zwischen den Schritten
-        else:
-            for angle in range(int(current_angle), int(target_angle), -step_size):
-                servo.angle = angle
-                time.sleep(0.05)  # 50ms Pause zwischen den Schritten
-        servo.angle = target_angle  # Stelle sicher, dass der endgültige Winkel exakt erreicht wird
+
+    def _calibration(self, servo_num, servo_data=None):
+        """Kalibrierung (Winkel -> Duty-Cycle) eines Servos, siehe motion_profile.calibration_from_config"""
+        if servo_data is None:
+            servo_data = self.config_cache.get_servo(servo_num)
+        return calibration_from_config(servo_data, self.pwm_frequency)
+
+    def _duty_for_angle(self, servo_num, angle, servo_data=None):
+        """Rechnet den Winkel eines Servos in einen 16-Bit Duty-Cycle um"""
+        return duty_for_angle(angle, self._calibration(servo_num, servo_data))
+
+    def _plan_motions(self, motions, steps, profile=None):
+        """Berechnet die Duty-Cycle-Trajektorien für {Servo: (Start, Ziel)} gruppiert nach Profil"""
+        default_profile = profile or self.config.get('SERVO_CONFIG', {}).get('MOTION_PROFILE', PROFILE_LINEAR)
+        groups = {}
+        for servo_num, (start, target) in motions.items():
+            servo_data = self.config_cache.get_servo(servo_num)
+            servo_profile = profile or (servo_data or {}).get('profile', default_profile)
+            groups.setdefault(servo_profile, {})[servo_num] = (
+                start, target, calibration_from_config(servo_data, self.pwm_frequency)
+            )
+        plans = {}
+        for servo_profile, requests in groups.items():
+            plans.update(self.trajectory_cache.plan(requests, servo_profile, steps))
+        return plans
+
+    def _moving_current(self, servo_num):
+        """Geschätzter Strom eines bewegten Servos in Ampere (moving_current pro Servo)"""
+        servo_data = self.config_cache.get_servo(servo_num)
+        return (servo_data or {}).get('moving_current')
+
+    def _settle_ticks(self, servo_num, start, target, steps):
+        """Zusätzliche Ticks, bis der Servo mit seiner Stellgeschwindigkeit das Ziel tatsächlich erreicht"""
+        tick = self.motion_engine.tick_interval
+        travel_time = abs(target - start) / self.slew_rate
+        return max(0, math.ceil((travel_time - steps * tick) / tick - 1e-9))
+
+    def get_power_stats(self):
+        """Liefert Stromkontingent, Spitzenlast sowie aktive und eingereihte Bewegungen"""
+        stats = self.motion_engine.get_stats()
+        power = stats.pop('power', {})
+        power.update(stats)
+        return power
+
+    def get_motion_stats(self):
+        """Liefert aktive, eingereihte und zusammengefasste Bewegungsbefehle"""
+        stats = self.motion_engine.get_stats()
+        stats.pop('power', None)
+        stats['skipped'] = self.skipped_commands
+        return stats
+
+    def write_angle(self, servo_num, angle, servo_data=None):
+        """Schreibt einen Winkel sofort (ohne Interpolation) über den Batch-Writer"""
+        self._energize(servo_num)
+        self.boards.stage(servo_num, self._duty_for_angle(servo_num, angle, servo_data))
+        self.boards.flush()
+        self._schedule_release(servo_num, servo_data)
+
+    def _release_delay(self, servo_num, servo_data=None):
+        """Haltezeit nach einer Bewegung bis zum Abschalten (None = Servo bleibt bestromt)"""
+        if servo_data is None:
+            servo_data = self.config_cache.get_servo(servo_num)
+        delay = (servo_data or {}).get('release_delay')
+        if delay is None:
+            delay = self.config.get('SERVO_CONFIG', {}).get('RELEASE_DELAY')
+        if delay is None or float(delay) <= 0:
+            return None
+        return float(delay)
+
+    def _energize(self, servo_num):
+        """Markiert einen Servo als bestromt und verwirft einen geplanten oder gerade laufenden Release"""
+        with self._power_lock:
+            self._power_generation[servo_num] += 1
+            self.release_timers.cancel(servo_num)
+            self.servo_states.modify(servo_num, self._energized_fields)
+
+    @staticmethod
+    def _energized_fields(state):
+        """Geänderte Felder beim Bestromen (None wenn der Servo schon bestromt ist)"""
+        if state.energized:
+            return None
+        fields = {'energized': True}
+        if state.release_count:
+            fields['reenergize_count'] = state.reenergize_count + 1
+        return fields
+
+    def _schedule_release(self, servo_num, servo_data=None):
+        """Plant das Abschalten eines Servos nach seiner Haltezeit"""
+        delay = self._release_delay(servo_num, servo_data)
+        if delay is not None:
+            self.release_timers.schedule(servo_num, delay, self._release, servo_num,
+                                         self._power_generation[servo_num])
+
+    def _release(self, servo_num, generation):
+        """
+        Schaltet einen Servo stromlos (PWM aus); läuft im Timer-Thread. Prüfung und Schreiben
+        unter derselben Sperre wie _energize: wurde der Servo seit dem Planen erneut bestromt
+        (auch wenn die Bewegung noch nicht in der Motion-Engine ist), bleibt er bestromt
+        """
+        with self._power_lock:
+            if generation != self._power_generation[servo_num] or self.motion_engine.is_moving(servo_num):
+                return
+            self.boards.stage(servo_num, 0)
+            self.boards.flush()
+            self.servo_states.modify(servo_num, lambda state: {
+                'energized': False,
+                'release_count': state.release_count + 1
+            })
+        self.logger.debug("Servo %s nach Haltezeit stromlos geschaltet", servo_num)
+
+    def get_all_servo_status(self):
+        """Konsistenter Status aller Servos als Snapshot mit Versionsnummer (ohne Sperre, ohne Kopie)"""
+        return self.servo_states.snapshot()
+
+    def get_state_version(self):
+        """Versionsnummer des Servo-Status; bleibt gleich, solange sich nichts ändert"""
+        return self.servo_states.version
+
+    def get_state_at(self, version):
+        """Früherer Status-Snapshot einer bestimmten Version (None, wenn er nicht mehr vorliegt)"""
+        return self.servo_states.snapshot_at(version)
+
+    def wait_for_state_change(self, version, timeout=None):
+        """Blockiert bis sich der Status nach version ändert; liefert den neuen Snapshot oder None"""
+        return self.servo_states.wait_for_change(version, timeout)
+
+    def get_bus_stats(self):
+        """Liefert Zähler für ausgeführte und übersprungene Register-Schreibzugriffe"""
+        return self.boards.get_stats()
+
+    def _apply_motion_updates(self, updates):
+        """Wird von der Motion-Engine einmal pro Tick mit den vorberechneten Duty-Cycles aufgerufen"""
+        self.boards.stage_many(dict(updates))
+        self.boards.flush()
+
+    def _on_motion_settled(self, servo_num, angle):
+        """Wird von der Motion-Engine aufgerufen, wenn ein Servo sein Ziel erreicht hat"""
+        fields = {
+            'current_angle': angle,
+            'last_move': time.time(),
+            'error': False,
+            'message': None,
+            'status': 'initialized'
+        }
+        position = self._position_for_angle(angle, self.config_cache.get_servo(servo_num))
+        if position is not None:
+            fields.update({'position': position, 'status': 'ok'})
+        self.servo_states.update(servo_num, fields)
+        self._schedule_release(servo_num)
+
+    @staticmethod
+    def _position_for_angle(angle, servo_data):
+        """Weichenstellung ('left'/'right') zu einem Winkel, None für Zwischenstellungen"""
+        if not servo_data:
+            # Standardwinkel wie in move_servo für Servos ohne Konfiguration
+            servo_data = {'left_angle': 45.0, 'right_angle': 135.0}
+        if angle == servo_data.get('left_angle'):
+            return 'left'
+        if angle == servo_data.get('right_angle'):
+            return 'right'
+        return None
+            
+    def move_to_angle(self, servo_num, current_angle, target_angle, step_size=1):
+        """
+        Bewegt einen Servo langsam zu einem Zielwinkel (blockierend, 50 ms pro Schritt)
+        :param servo_num: Servo-Nummer; geschrieben wird über den Batch-Writer (Bus-Sperre, Schattenregister)
+        """
+        servo_data = self.config_cache.get_servo(servo_num)
+        calibration = self._calibration(servo_num, servo_data)
+        self._energize(servo_num)
+        # Winkelfolge wird einmal berechnet und gecacht; der letzte Wert ist exakt der Zielwinkel
+        for angle in stepped_angles(float(current_angle), float(target_angle), step_size):
+            self.boards.stage(servo_num, duty_for_angle(angle, calibration))
+            self.boards.flush()
+            time.sleep(0.05)  # 50ms Pause zwischen den Schritten
+        self.servo_states.update(servo_num, {'current_angle': float(target_angle)})
+        self._schedule_release(servo_num, servo_data)
         
     def calibrate_servo(self, servo_id, left_angle, right_angle):
         """Kalibriert einen Servo mit neuen Winkeln"""
@@ -277,7 +578,7 @@ class ServoKitController:
             self.config['SERVO_CONFIG']['SERVOS'][servo_id]['right_angle'] = right_angle
             
             # Aktualisiere Status
-            self.servo_states[str(servo_id)].update({
+            self.servo_states.update(servo_id, {
                 'error': False,
                 'initialized': True,
                 'position': 'left',
@@ -296,10 +597,10 @@ class ServoKitController:
     def get_servo_position(self, servo_id):
         """Ermittelt die aktuelle Position eines Servos (links/rechts)"""
         try:
-            if str(servo_id) not in self.servo_states:
+            if servo_id not in self.servo_states:
                 return None
                 
-            return self.servo_states[str(servo_id)].get('position')
+            return self.servo_states[servo_id].position
             
         except Exception as e:
             self.logger.error(f"Fehler beim Ermitteln der Servo-Position {servo_id}: {e}")
@@ -308,10 +609,18 @@ class ServoKitController:
     def cleanup(self):
         """Räumt auf und gibt Ressourcen frei"""
         try:
-            # Deaktiviere alle Servos
-            for i in range(16):
-                # Setze PWM auf 0 um den Servo stromlos zu machen
-                self.kit1._pca.channels[i].duty_cycle = 0
+            # Laufende Bewegungen und geplante Releases abbrechen
+            if hasattr(self, 'motion_engine'):
+                self.motion_engine.stop()
+            if hasattr(self, 'release_timers'):
+                self.release_timers.stop()
+            
+            # Deaktiviere alle Servos: PWM auf 0 für alle Kanäle in einem Blockschreiben
+            self.boards.stage_many({i: 0 for i in range(self.num_servos)})
+            self.boards.flush()
+            
+            for i in range(self.num_servos):
+                self.servo_states.update(i, {'energized': False})
             
             self.logger.info("Alle Servos deaktiviert")
             
@@ -326,7 +635,7 @@ class ServoKitController:
         """Testet ob ein Servo funktioniert"""
         try:
             # Prüfe Board-Verfügbarkeit
-            if servo_num >= 16:
+            if servo_num >= self.num_servos:
                 return False
                 
             # Versuche den Servo zu bewegen
@@ -359,65 +668,83 @@ class ServoKitController:
             self.logger.error(f"Fehler beim Testen von Servo {servo_num}: {e}")
             return False
             
-    def initialize_servos(self):
-        """Initialisiert und testet alle Servos"""
+    def initialize_servos(self, parallel=True, max_concurrency=None):
+        """
+        Initialisiert und testet alle Servos
+        :param parallel: Alle Servos gleichzeitig auf einer gemeinsamen Zeitachse initialisieren
+        :param max_concurrency: Maximale Anzahl gleichzeitig initialisierter Servos
+                                (Standard: SERVO_CONFIG.INIT_CONCURRENCY, sonst alle)
+        :return: Gesamtdauer der Initialisierung in Sekunden
+        """
         self.logger.info("Initialisiere alle Servos...")
+        started = time.monotonic()
         
         # Lade die Servo-Konfigurationen
         servo_configs = self.config.get('SERVO_CONFIG', {}).get('SERVOS', [])
         if not servo_configs:
             self.logger.error("Keine Servo-Konfigurationen gefunden!")
-            return
+            return 0.0
         
         # Test-Winkel für die Initialisierung
         start_angle = 90.0  # Startposition
         end_angle = 85.0    # Endposition
         step_size = 0.1     # Sehr kleine Schritte für sanfte Bewegung
+        
+        if parallel:
+            if max_concurrency is None:
+                max_concurrency = self.config.get('SERVO_CONFIG', {}).get('INIT_CONCURRENCY', len(servo_configs))
+            self._initialize_servos_parallel(
+                list(range(len(servo_configs))), start_angle, end_angle, step_size, max(1, int(max_concurrency))
+            )
+            duration = time.monotonic() - started
+            self.logger.info(f"Servo-Initialisierung abgeschlossen in {duration:.2f} s")
+            return duration
             
         # Initialisiere jeden Servo
         for i, servo_config in enumerate(servo_configs):
             try:
                 # Initialisiere Status
-                self.servo_states[str(i)] = {
+                self.servo_states.update(i, {
                     'position': None,
                     'current_angle': None,
                     'last_move': 0,
                     'error': False,
                     'initialized': False,
                     'status': 'unknown'
-                }
+                })
                 
                 # Teste den Servo
                 self.logger.info(f"Initialisiere Servo {i} mit Bewegung von {start_angle}° nach {end_angle}°")
                 
                 try:
-                    # Hole den richtigen Servo
-                    servo = self.kit1.servo[i]
-                    
                     # Setze auf Startposition
-                    servo.angle = start_angle
+                    self._energize(i)
+                    self.boards.stage(i, self._duty_for_angle(i, start_angle))
+                    self.boards.flush()
                     time.sleep(0.5)  # Warte eine halbe Sekunde
                     
-                    # Bewege sehr langsam zur Endposition
-                    current_angle = start_angle
-                    while current_angle > end_angle:
-                        current_angle -= step_size
-                        if current_angle < end_angle:
-                            current_angle = end_angle
-                        servo.angle = current_angle
+                    # Bewege sehr langsam zur Endposition (Duty-Cycles vorberechnet)
+                    sweep_steps = len(stepped_angles(start_angle, end_angle, step_size))
+                    duties, _ = self.trajectory_cache.plan(
+                        {i: (start_angle, end_angle, self._calibration(i))}, PROFILE_LINEAR, sweep_steps
+                    )[i]
+                    for duty in duties:
+                        self.boards.stage(i, duty)
+                        self.boards.flush()
                         time.sleep(0.01)  # 10ms Pause zwischen den Schritten
                     
                     # Markiere als erfolgreich initialisiert
-                    self.servo_states[str(i)].update({
+                    self.servo_states.update(i, {
                         'position': 'initialized',
                         'current_angle': end_angle,
                         'initialized': True,
                         'status': 'initialized'
                     })
+                    self._schedule_release(i)
                     self.logger.info(f"Servo {i} erfolgreich initialisiert")
                     
                 except Exception as e:
-                    self.servo_states[str(i)].update({
+                    self.servo_states.update(i, {
                         'initialized': False,
                         'status': 'error',
                         'error': True
@@ -426,19 +753,80 @@ class ServoKitController:
                 
             except Exception as e:
                 self.logger.error(f"Fehler beim Laden der Konfiguration für Servo {i}: {str(e)}")
-                self.servo_states[str(i)] = {
+                self.servo_states.update(i, {
                     'initialized': False,
                     'status': 'config_error',
                     'error': True
-                }
+                })
+        
+        duration = time.monotonic() - started
+        self.logger.info(f"Servo-Initialisierung abgeschlossen in {duration:.2f} s")
+        return duration
+
+    def _initialize_servos_parallel(self, servo_ids, start_angle, end_angle, step_size, max_concurrency):
+        """Initialisiert Gruppen von bis zu max_concurrency Servos gleichzeitig über die Motion-Engine"""
+        # Gleiche Sweep-Dauer wie die sequentielle Variante (10ms pro Schritt), aber im Engine-Takt
+        sweep_time = (start_angle - end_angle) / step_size * 0.01
+        steps = max(1, round(sweep_time / self.motion_engine.tick_interval))
         
-        self.logger.info("Servo-Initialisierung abgeschlossen")
+        for offset in range(0, len(servo_ids), max_concurrency):
+            group = servo_ids[offset:offset + max_concurrency]
+            self.logger.info(f"Initialisiere Servos {group} gleichzeitig mit Bewegung von {start_angle}° nach {end_angle}°")
+            
+            for i in group:
+                self.servo_states.update(i, {
+                    'position': None,
+                    'current_angle': None,
+                    'last_move': 0,
+                    'error': False,
+                    'initialized': False,
+                    'status': 'unknown'
+                })
+            
+            try:
+                # Setze alle Servos der Gruppe in einem Blockschreiben auf die Startposition
+                for i in group:
+                    self._energize(i)
+                self.boards.stage_many({i: self._duty_for_angle(i, start_angle) for i in group})
+                self.boards.flush()
+                time.sleep(0.5)  # Eine gemeinsame Wartezeit für die ganze Gruppe
+                
+                # Bewege alle Servos der Gruppe im selben Takt zur Endposition
+                futures = self.motion_engine.move_many(
+                    {i: (start_angle, end_angle) for i in group}, steps=steps
+                )
+            except Exception as e:
+                self.logger.warning(f"Fehler bei der Initialisierung der Servos {group}: {str(e)}")
+                futures = {}
+                for i in group:
+                    self.servo_states.update(i, {
+                        'initialized': False,
+                        'status': 'error',
+                        'error': True
+                    })
+            
+            for i, future in futures.items():
+                try:
+                    future.result()
+                    self.servo_states.update(i, {
+                        'position': 'initialized',
+                        'current_angle': end_angle,
+                        'initialized': True,
+                        'status': 'initialized'
+                    })
+                except Exception as e:
+                    self.servo_states.update(i, {
+                        'initialized': False,
+                        'status': 'error',
+                        'error': True
+                    })
+                    self.logger.warning(f"Fehler bei der Initialisierung von Servo {i}: {str(e)}")
 
     def update_servo_config(self, servo_id, config_data):
         """Aktualisiert die Konfiguration eines Servos"""
         try:
             # Prüfe ob Servo-ID gültig ist
-            if servo_id >= 16:
+            if not 0 <= servo_id < self.num_servos:
                 raise Exception("Ungültige Servo-ID")
 
             # Validiere die Winkel
@@ -487,7 +875,7 @@ class ServoKitController:
             # Speichere die aktualisierte Konfiguration
             self.save_config()
             
-            self.logger.info(f"Konfiguration für Servo {servo_id} aktualisiert: {json.dumps(config_data, indent=2)}")
+            self.logger.info("Konfiguration für Servo %s aktualisiert: %s", servo_id, LazyJson(dict(config_data)))
             return True
             
         except Exception as e:
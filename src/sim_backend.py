@@ -0,0 +1,350 @@
+import time
+import threading
+
+from pca9685_batch import MODE1, MODE1_AI, LED0_ON_L, FULL_BIT, angle_to_duty_cycle
+
+# Weitere PCA9685 Register
+PRESCALE = 0xFE
+MODE1_RESTART = 0x80
+MODE1_SLEEP = 0x10
+MODE1_POWER_ON = 0x11   # SLEEP + ALLCALL nach dem Einschalten
+
+# Standardwerte für das Timing-Modell
+DEFAULT_SIM_CONFIG = {
+    'BUS_FREQUENCY': 100000,   # I2C-Takt in Hz (Raspberry Pi Standard)
+    'TRANSACTION_OVERHEAD_US': 50,  # Start/Stop, Treiber- und Kernel-Overhead pro Transaktion
+    'SLEW_RATE': 600.0,        # Servo-Stellgeschwindigkeit in Grad/s (MG90S: ~0.1s/60°)
+    'REALTIME': True           # Bus-Latenz tatsächlich abwarten (sonst nur mitzählen)
+}
+
+
+class SimulatedI2CBus:
+    """Simulierter I2C-Bus mit Latenzmodell pro Transaktion"""
+
+    def __init__(self, bus_id=1, sim_config=None):
+        config = dict(DEFAULT_SIM_CONFIG)
+        config.update(sim_config or {})
+        self.bus_id = bus_id
+        self.bus_frequency = config['BUS_FREQUENCY']
+        self.overhead = config['TRANSACTION_OVERHEAD_US'] / 1000000.0
+        self.realtime = config['REALTIME']
+        self.slew_rate = config['SLEW_RATE']
+
+        self._lock = threading.RLock()
+        self.devices = {}
+
+        # Statistik
+        self.transactions = 0
+        self.bytes_transferred = 0
+        self.busy_time = 0.0
+
+    def transaction_time(self, nbytes):
+        """Dauer einer Transaktion: Adressbyte + Daten mit je 9 Bit (inkl. ACK) plus Overhead"""
+        return self.overhead + (nbytes + 1) * 9 / self.bus_frequency
+
+    def transfer(self, nbytes):
+        """Bucht eine Transaktion auf den Bus (Aufrufer hält die Bus-Sperre)"""
+        duration = self.transaction_time(nbytes)
+        self.transactions += 1
+        self.bytes_transferred += nbytes
+        self.busy_time += duration
+        if self.realtime:
+            time.sleep(duration)
+
+    def get_stats(self):
+        """Liefert die Bus-Statistik"""
+        return {
+            'bus': self.bus_id,
+            'transactions': self.transactions,
+            'bytes': self.bytes_transferred,
+            'busy_time': self.busy_time
+        }
+
+
+class SimulatedI2CDevice:
+    """Nachbildung von adafruit_bus_device.I2CDevice für einen simulierten Baustein"""
+
+    def __init__(self, bus, device):
+        self.bus = bus
+        self.device = device
+
+    def __enter__(self):
+        self.bus._lock.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.bus._lock.release()
+        return False
+
+    def write(self, buf, *, start=0, end=None):
+        data = bytes(buf[start:end])
+        with self.bus._lock:
+            self.bus.transfer(len(data))
+            self.device.handle_write(data)
+
+    def readinto(self, buf, *, start=0, end=None):
+        end = len(buf) if end is None else end
+        with self.bus._lock:
+            self.bus.transfer(end - start)
+            buf[start:end] = self.device.handle_read(end - start)
+
+    def write_then_readinto(self, out_buffer, in_buffer, *, out_start=0, out_end=None, in_start=0, in_end=None):
+        data = bytes(out_buffer[out_start:out_end])
+        in_end = len(in_buffer) if in_end is None else in_end
+        with self.bus._lock:
+            # Repeated Start: eine Transaktion für Schreiben und Lesen
+            self.bus.transfer(len(data) + in_end - in_start)
+            self.device.handle_write(data)
+            in_buffer[in_start:in_end] = self.device.handle_read(in_end - in_start)
+
+
+class _ChannelModel:
+    """Physikalisches Modell eines Servos an einem PWM-Kanal (Stellgeschwindigkeit)"""
+
+    __slots__ = ('t_command', 'from_angle', 'to_angle', 'energized')
+
+    def __init__(self):
+        self.t_command = 0.0
+        self.from_angle = 90.0
+        self.to_angle = 90.0
+        self.energized = False
+
+
+class SimulatedPCA9685:
+    """PCA9685 mit Registersatz im Speicher (Oberfläche wie adafruit_pca9685.PCA9685)"""
+
+    def __init__(self, bus, address=0x40, reference_clock_speed=25000000):
+        self.bus = bus
+        self.address = address
+        self.reference_clock_speed = reference_clock_speed
+        self.registers = bytearray(256)
+        self.registers[MODE1] = MODE1_POWER_ON
+        self.registers[PRESCALE] = 0x1E
+        self._pointer = 0
+        self._models = [_ChannelModel() for _ in range(16)]
+
+        self.i2c_device = SimulatedI2CDevice(bus, self)
+        self.channels = [SimulatedPWMChannel(self, i) for i in range(16)]
+        bus.devices[address] = self
+
+    # --- Registerzugriff über den Bus ---
+
+    def handle_write(self, data):
+        """Verarbeitet ein geschriebenes Paket: erstes Byte Registeradresse, danach Daten"""
+        if not data:
+            return
+        self._pointer = data[0]
+        touched = set()
+        for value in data[1:]:
+            reg = self._pointer
+            self.registers[reg] = value
+            if LED0_ON_L <= reg < LED0_ON_L + 64:
+                touched.add((reg - LED0_ON_L) // 4)
+            if self.registers[MODE1] & MODE1_AI:
+                self._pointer = (self._pointer + 1) & 0xFF
+        now = time.monotonic()
+        for channel in touched:
+            self._update_model(channel, now)
+
+    def handle_read(self, length):
+        """Liest ab dem aktuellen Registerzeiger"""
+        out = bytearray(length)
+        for i in range(length):
+            out[i] = self.registers[self._pointer]
+            if self.registers[MODE1] & MODE1_AI:
+                self._pointer = (self._pointer + 1) & 0xFF
+        return out
+
+    def _read_register(self, reg):
+        buf = bytearray(1)
+        with self.i2c_device as i2c:
+            i2c.write_then_readinto(bytes([reg]), buf)
+        return buf[0]
+
+    def _write_register(self, reg, value):
+        with self.i2c_device as i2c:
+            i2c.write(bytes([reg, value & 0xFF]))
+
+    @property
+    def mode1_reg(self):
+        return self._read_register(MODE1)
+
+    @mode1_reg.setter
+    def mode1_reg(self, value):
+        self._write_register(MODE1, value)
+
+    @property
+    def prescale_reg(self):
+        return self._read_register(PRESCALE)
+
+    @prescale_reg.setter
+    def prescale_reg(self, value):
+        self._write_register(PRESCALE, value)
+
+    @property
+    def frequency(self):
+        return self.reference_clock_speed / 4096 / (self.prescale_reg + 1)
+
+    @frequency.setter
+    def frequency(self, freq):
+        # Ablauf wie adafruit_pca9685: Sleep, Prescale, Restart mit Auto-Increment
+        prescale = int(self.reference_clock_speed / 4096.0 / freq + 0.5) - 1
+        if prescale < 3:
+            raise ValueError("PCA9685 cannot output at the given frequency")
+        old_mode = self.mode1_reg
+        self.mode1_reg = (old_mode & 0x7F) | MODE1_SLEEP
+        self.prescale_reg = prescale
+        self.mode1_reg = old_mode & ~MODE1_SLEEP & 0xFF
+        self.mode1_reg = (old_mode & ~MODE1_SLEEP & 0xFF) | MODE1_RESTART | MODE1_AI
+
+    def reset(self):
+        self.mode1_reg = 0x00
+
+    def deinit(self):
+        self.reset()
+
+    # --- Kanalzustand ---
+
+    def channel_registers(self, channel):
+        """Liefert (ON, OFF) eines Kanals direkt aus dem Registersatz (ohne Buszugriff)"""
+        base = LED0_ON_L + 4 * channel
+        regs = self.registers
+        return regs[base] | (regs[base + 1] << 8), regs[base + 2] | (regs[base + 3] << 8)
+
+    def channel_duty_cycle(self, channel):
+        """16-Bit Duty-Cycle eines Kanals aus dem Registersatz"""
+        on, off = self.channel_registers(channel)
+        if on & FULL_BIT:
+            return 0xFFFF
+        if off & FULL_BIT:
+            return 0
+        return (off & 0x0FFF) << 4
+
+    def pulse_width_us(self, channel):
+        """Pulsbreite eines Kanals in µs"""
+        period_us = 1000000.0 / self.frequency_cached
+        return self.channel_duty_cycle(channel) / 0xFFFF * period_us
+
+    @property
+    def frequency_cached(self):
+        prescale = self.registers[PRESCALE]
+        return self.reference_clock_speed / 4096 / (prescale + 1)
+
+    def _update_model(self, channel, now):
+        """Übernimmt einen neuen Stellbefehl in das Servo-Modell des Kanals"""
+        model = self._models[channel]
+        pulse = self.pulse_width_us(channel)
+        if pulse < 400:
+            # Kein gültiger Puls: Servo stromlos, bleibt an der aktuellen Position stehen
+            model.from_angle = self.servo_angle(channel, now)
+            model.to_angle = model.from_angle
+            model.energized = False
+            return
+        target = max(0.0, min(180.0, (pulse - 500.0) / 2000.0 * 180.0))
+        model.from_angle = self.servo_angle(channel, now)
+        model.to_angle = target
+        model.t_command = now
+        model.energized = True
+
+    def servo_angle(self, channel, now=None):
+        """Physikalischer Winkel des Servos unter Berücksichtigung der Stellgeschwindigkeit"""
+        model = self._models[channel]
+        if now is None:
+            now = time.monotonic()
+        distance = model.to_angle - model.from_angle
+        travelled = (now - model.t_command) * self.bus.slew_rate
+        if travelled >= abs(distance):
+            return model.to_angle
+        return model.from_angle + (travelled if distance > 0 else -travelled)
+
+    def servo_settled(self, channel, now=None):
+        """Prüft ob der Servo seine Zielposition erreicht hat"""
+        return self.servo_angle(channel, now) == self._models[channel].to_angle
+
+    def servo_energized(self, channel):
+        return self._models[channel].energized
+
+
+class SimulatedPWMChannel:
+    """Nachbildung von adafruit_pca9685.PWMChannel"""
+
+    def __init__(self, pca, index):
+        self._pca = pca
+        self._index = index
+
+    @property
+    def duty_cycle(self):
+        base = LED0_ON_L + 4 * self._index
+        buf = bytearray(4)
+        with self._pca.i2c_device as i2c:
+            i2c.write_then_readinto(bytes([base]), buf)
+        on = buf[0] | (buf[1] << 8)
+        off = buf[2] | (buf[3] << 8)
+        if on & FULL_BIT:
+            return 0xFFFF
+        if off & FULL_BIT:
+            return 0
+        return (off & 0x0FFF) << 4
+
+    @duty_cycle.setter
+    def duty_cycle(self, value):
+        if not 0 <= value <= 0xFFFF:
+            raise ValueError(f"Out of range: value {value} not 0 <= value <= 65,535")
+        if value == 0xFFFF:
+            on, off = FULL_BIT, 0
+        elif value < 0x0010:
+            on, off = 0, FULL_BIT
+        else:
+            on, off = 0, value >> 4
+        base = LED0_ON_L + 4 * self._index
+        with self._pca.i2c_device as i2c:
+            i2c.write(bytes([base, on & 0xFF, on >> 8, off & 0xFF, off >> 8]))
+
+
+class SimulatedServo:
+    """Nachbildung von adafruit_motor.servo.Servo"""
+
+    def __init__(self, kit, channel, actuation_range=180, min_pulse=750, max_pulse=2250):
+        self._kit = kit
+        self._channel = channel
+        self.actuation_range = actuation_range
+        self._min_pulse = min_pulse
+        self._max_pulse = max_pulse
+        self._angle = None
+
+    def set_pulse_width_range(self, min_pulse=750, max_pulse=2250):
+        self._min_pulse = min_pulse
+        self._max_pulse = max_pulse
+
+    @property
+    def angle(self):
+        return self._angle
+
+    @angle.setter
+    def angle(self, new_angle):
+        if new_angle is None:
+            self._kit._pca.channels[self._channel].duty_cycle = 0
+            self._angle = None
+            return
+        if new_angle < 0 or new_angle > self.actuation_range:
+            raise ValueError("Angle out of range")
+        self._kit._pca.channels[self._channel].duty_cycle = angle_to_duty_cycle(
+            new_angle, self._min_pulse, self._max_pulse, self._kit.frequency, self.actuation_range
+        )
+        self._angle = new_angle
+
+
+class SimulatedServoKit:
+    """Drop-in Ersatz für adafruit_servokit.ServoKit ohne Hardware"""
+
+    def __init__(self, *, channels=16, i2c=None, address=0x40, reference_clock_speed=25000000,
+                 frequency=50, sim_config=None):
+        if channels not in (8, 16):
+            raise ValueError("servo_channels must be 8 or 16!")
+        self._items = [None] * channels
+        self._channels = channels
+        self.frequency = frequency
+        self.i2c = i2c or SimulatedI2CBus(sim_config=sim_config)
+        self._pca = SimulatedPCA9685(self.i2c, address=address, reference_clock_speed=reference_clock_speed)
+        self._pca.frequency = frequency
+        self.servo = [SimulatedServo(self, i) for i in range(channels)]
@@ -0,0 +1,145 @@
+"""
+Vorberechnete Auslieferung der Weboberfläche: alle Dateien werden beim Start einmal gelesen,
+mit gzip (und brotli, falls installiert) komprimiert und mit starkem ETag versehen.
+Pro Anfrage bleibt nur die Auswahl der Variante nach Accept-Encoding.
+"""
+import os
+import gzip
+import hashlib
+import mimetypes
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(__file__), 'templates')
+STATIC_DIR = os.path.join(os.path.dirname(__file__), 'static')
+
+# Einstiegsseite nur kurz cachen (danach Revalidierung per ETag), damit Updates ankommen.
+# Dateien unter /static/ haben keine Fingerprints in der URL: 0 = 'no-cache', d.h. der Browser
+# fragt jedes Mal per ETag nach und bekommt meist nur ein 304
+INDEX_MAX_AGE = 300
+STATIC_MAX_AGE = 0
+
+# Kleinere Dateien werden nicht komprimiert
+MIN_COMPRESS_SIZE = 256
+
+
+def parse_accept_encoding(header):
+    """Akzeptierte Kodierungen als Dict {Kodierung: q-Wert} (ungültige q-Werte zählen als 0)"""
+    accepted = {}
+    for part in (header or '').split(','):
+        name, *params = part.split(';')
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        for param in params:
+            key, _, value = param.strip().partition('=')
+            if key.strip().lower() == 'q':
+                try:
+                    q = min(max(float(value), 0.0), 1.0)
+                except ValueError:
+                    q = 0.0
+        accepted[name] = q
+    return accepted
+
+
+class Variant:
+    """Eine Darstellung einer Datei (unkomprimiert oder vorkomprimiert)"""
+
+    __slots__ = ('body', 'etag', 'encoding')
+
+    def __init__(self, body, etag, encoding=None):
+        self.body = body
+        self.etag = etag
+        self.encoding = encoding
+
+
+class Asset:
+    """Datei mit ihren Varianten und festen Antwort-Headern"""
+
+    def __init__(self, data, content_type, max_age):
+        self.content_type = content_type
+        self.cache_control = f"public, max-age={max_age}" if max_age else "public, no-cache"
+        digest = hashlib.sha256(data).hexdigest()[:20]
+        self.variants = {None: Variant(data, digest)}
+        if len(data) >= MIN_COMPRESS_SIZE:
+            compressed = gzip.compress(data, compresslevel=9, mtime=0)
+            if len(compressed) < len(data):
+                self.variants['gzip'] = Variant(compressed, f"{digest}-gz", 'gzip')
+            if brotli is not None:
+                compressed = brotli.compress(data, quality=11)
+                if len(compressed) < len(data):
+                    self.variants['br'] = Variant(compressed, f"{digest}-br", 'br')
+
+    def select(self, accept_encoding):
+        """
+        Variante mit dem höchsten q-Wert des Clients; bei Gleichstand br vor gzip und komprimiert
+        vor unkomprimiert. q=0 schließt eine Kodierung aus, ohne Angabe gilt der Wert von '*'.
+        Unkomprimiert ist immer der letzte Ausweg (kein 406)
+        """
+        accepted = parse_accept_encoding(accept_encoding)
+        best, best_q = None, 0.0
+        for encoding in ('br', 'gzip'):
+            q = accepted.get(encoding, accepted.get('*', 0.0))
+            if encoding in self.variants and q > best_q:
+                best, best_q = self.variants[encoding], q
+        if best is None or accepted.get('identity', 0.0) > best_q:
+            return self.variants[None]
+        return best
+
+    def headers(self, variant):
+        headers = {
+            'Content-Type': self.content_type,
+            'ETag': f'"{variant.etag}"',
+            'Cache-Control': self.cache_control,
+            'Vary': 'Accept-Encoding'
+        }
+        if variant.encoding:
+            headers['Content-Encoding'] = variant.encoding
+        return headers
+
+    def respond(self, accept_encoding, if_none_match):
+        """
+        Antwort auf eine Anfrage
+        :return: (Status, Header, Body) - 304 ohne Body, wenn der Client die Variante schon hat
+        """
+        variant = self.select(accept_encoding)
+        headers = self.headers(variant)
+        if if_none_match and (if_none_match.strip() == '*' or headers['ETag'] in
+                              [tag.strip().removeprefix('W/') for tag in if_none_match.split(',')]):
+            return 304, headers, b''
+        return 200, headers, variant.body
+
+
+class StaticBundle:
+    """Alle Dateien der Weboberfläche, beim Erzeugen einmal eingelesen und komprimiert"""
+
+    def __init__(self, template_dir=TEMPLATE_DIR, static_dir=STATIC_DIR):
+        self.index = self._load(os.path.join(template_dir, 'index.html'), INDEX_MAX_AGE)
+        self.static = {}
+        if os.path.isdir(static_dir):
+            for root, _, files in os.walk(static_dir):
+                for name in files:
+                    path = os.path.join(root, name)
+                    relative = os.path.relpath(path, static_dir).replace(os.sep, '/')
+                    self.static[relative] = self._load(path, STATIC_MAX_AGE)
+
+    @staticmethod
+    def _load(path, max_age):
+        with open(path, 'rb') as f:
+            data = f.read()
+        content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        if content_type.startswith('text/') or content_type in ('application/javascript', 'application/json'):
+            content_type += '; charset=utf-8'
+        return Asset(data, content_type, max_age)
+
+    def get_static(self, path):
+        """Datei unter /static/ oder None (nur vorab geladene Dateien, kein Zugriff außerhalb)"""
+        return self.static.get(path)
+
+    def get_stats(self):
+        """Größen der Einstiegsseite pro Variante in Bytes"""
+        return {encoding or 'identity': len(v.body) for encoding, v in self.index.variants.items()}
@@ -0,0 +1,220 @@
+"""
+Stresstest für das Nebenläufigkeitsmodell des Controllers (simuliertes Backend).
+
+Viele Threads bewegen Servos, schreiben Register und lesen gleichzeitig den Status.
+Geprüft wird, dass
+  - I2C-Transaktionen auf einem Bus nie ineinandergreifen,
+  - Registersatz der Boards und Schattenregister der Batch-Writer übereinstimmen,
+  - Status-Snapshots vollständig sind und sich nach dem Lesen nicht mehr ändern,
+  - der Status am Ende zu den tatsächlich geschriebenen Registern passt.
+
+    python3 stress_test.py --duration 10 --threads 8
+"""
+import os
+import sys
+import random
+import argparse
+import threading
+import time
+
+# Immer gegen die Simulation testen
+os.environ.setdefault('WEICHEN_BACKEND', 'sim')
+
+STATES = ('initialized', 'moving', 'ok', 'error', 'unknown')
+
+# Ein Bus (Schreiben direkt im aufrufenden Thread) und mehrere Busse (ein Worker pro Bus)
+STRESS_SETUPS = {
+    'ein Bus': [{'bus': 1, 'address': 0x40}, {'bus': 1, 'address': 0x41}],
+    'zwei Busse': [{'bus': 1, 'address': 0x40}, {'bus': 1, 'address': 0x41}, {'bus': 3, 'address': 0x40}]
+}
+
+
+class Result:
+    """Sammelt Zähler und Fehler aller Threads"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counts = {}
+        self.errors = []
+
+    def count(self, key, n=1):
+        with self.lock:
+            self.counts[key] = self.counts.get(key, 0) + n
+
+    def fail(self, message):
+        with self.lock:
+            if len(self.errors) < 20:
+                self.errors.append(message)
+            self.counts['failures'] = self.counts.get('failures', 0) + 1
+
+
+def run_threads(workers, duration):
+    """Startet alle Worker gleichzeitig und stoppt sie nach duration Sekunden"""
+    stop = threading.Event()
+    barrier = threading.Barrier(len(workers))
+
+    def wrap(func):
+        barrier.wait()
+        while not stop.is_set():
+            func()
+
+    threads = [threading.Thread(target=wrap, args=(w,), daemon=True) for w in workers]
+    for t in threads:
+        t.start()
+    time.sleep(duration)
+    stop.set()
+    for t in threads:
+        t.join(timeout=10)
+
+
+def stress_bus(board_configs, duration, threads, result):
+    """Paralleles Vormerken und Schreiben auf mehreren Boards und Bussen"""
+    from board_manager import BoardManager
+
+    boards = BoardManager(board_configs, backend='sim')
+
+    # Überwacht, ob auf einem Bus zwei Blockschreiben gleichzeitig laufen
+    active = {bus_id: 0 for bus_id in boards.buses}
+    active_lock = threading.Lock()
+
+    def checked(board, original):
+        def write_block(first_channel, registers):
+            with active_lock:
+                active[board.bus_id] += 1
+                if active[board.bus_id] > 1:
+                    result.fail(f"Überlappende Transaktion auf Bus {board.bus_id}")
+            try:
+                original(first_channel, registers)
+            finally:
+                with active_lock:
+                    active[board.bus_id] -= 1
+        return write_block
+
+    for board in boards.boards:
+        board.writer._write_block = checked(board, board.writer._write_block)
+
+    def worker():
+        rnd = random.Random()
+        channels = rnd.sample(range(boards.channel_count), rnd.randint(1, 12))
+        try:
+            boards.stage_many({c: rnd.randrange(0x0010, 0xFFF0) for c in channels})
+            boards.flush()
+        except Exception as e:
+            result.fail(f"flush: {e!r}")
+        result.count('flushes')
+
+    run_threads([worker] * threads, duration)
+    boards.flush()
+    boards.stop()
+
+    for board in boards.boards:
+        pca = board.kit._pca
+        if not pca.mode1_reg & 0x20:
+            result.fail(f"Auto-Increment auf Board {board.index} verloren")
+        for local in range(board.channels):
+            shadow = board.writer._shadow[local]
+            if shadow is not None and pca.channel_registers(local) != shadow:
+                result.fail(f"Board {board.index} Kanal {local}: Register {pca.channel_registers(local)} "
+                            f"!= Schatten {shadow}")
+    stats = boards.get_stats()
+    result.count('transactions', stats['transactions'])
+
+
+def stress_controller(duration, threads, result):
+    """Parallele Bewegungen, Releases und Status-Leser über den ServoKitController"""
+    from servokit_controller import ServoKitController
+
+    controller = ServoKitController()
+    controller.logger.setLevel('WARNING')
+    controller.config.setdefault('SERVO_CONFIG', {})['RELEASE_DELAY'] = 0.05
+    num_servos = controller.num_servos
+
+    def mover():
+        rnd = random.Random()
+        controller.move_servo(rnd.randrange(num_servos), rnd.choice(('left', 'right')))
+        result.count('moves')
+
+    def batch_mover():
+        rnd = random.Random()
+        targets = {i: float(rnd.randint(30, 150)) for i in rnd.sample(range(num_servos), 4)}
+        try:
+            controller.set_angles(targets, steps=rnd.randint(1, 5))
+        except Exception as e:
+            result.fail(f"set_angles: {e}")
+        result.count('batches')
+
+    def reader():
+        snapshot = controller.get_all_servo_status()
+        frozen = [state.to_dict() for state in snapshot]
+        if len(snapshot) != num_servos:
+            result.fail(f"Snapshot mit {len(snapshot)} statt {num_servos} Servos")
+        for key, state in enumerate(snapshot):
+            if state.status not in STATES:
+                result.fail(f"Servo {key}: unbekannter Status {state.status}")
+            if state.reenergize_count > state.release_count:
+                result.fail(f"Servo {key}: mehr Wiedereinschaltungen als Releases")
+        if controller.get_state_version() < snapshot.version:
+            result.fail("Versionsnummer ist gesunken")
+        time.sleep(0.001)
+        if [state.to_dict() for state in snapshot] != frozen:
+            result.fail("Snapshot wurde nach dem Lesen verändert")
+        result.count('reads')
+
+    workers = [mover] * threads + [batch_mover] * max(1, threads // 4) + [reader] * max(1, threads // 2)
+    run_threads(workers, duration)
+
+    # Warten bis alle Bewegungen abgeschlossen und Releases gelaufen sind
+    deadline = time.monotonic() + 5
+    while (controller.motion_engine.get_stats()['active'] or controller.release_timers.pending()) \
+            and time.monotonic() < deadline:
+        time.sleep(0.05)
+
+    states = controller.get_all_servo_status()
+    for i in range(num_servos):
+        state = states[i]
+        board, local = controller.boards.locate(i)
+        duty = board.kit._pca.channel_duty_cycle(local)
+        if not state.energized:
+            expected = 0
+        elif state.current_angle is None:
+            continue
+        else:
+            expected = controller._duty_for_angle(i, state.current_angle) & 0xFFF0
+        if duty != expected:
+            result.fail(f"Servo {i}: Status {state.current_angle}° / energized={state.energized} "
+                        f"passt nicht zum Register (Duty {duty}, erwartet {expected})")
+    result.counts['coalesced'] = controller.get_motion_stats()['coalesced']
+    controller.cleanup()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Stresstest für Bus-Sperren und Status-Snapshots (Simulation)')
+    parser.add_argument('--duration', type=float, default=5.0, help='Dauer pro Teiltest in Sekunden')
+    parser.add_argument('--threads', type=int, default=8, help='Anzahl schreibender Threads')
+    parser.add_argument('--no-realtime', action='store_true', help='I2C-Latenz nur mitzählen statt abwarten')
+    args = parser.parse_args(argv)
+
+    if args.no_realtime:
+        import sim_backend
+        sim_backend.DEFAULT_SIM_CONFIG['REALTIME'] = False
+
+    result = Result()
+    for name, board_configs in STRESS_SETUPS.items():
+        print(f"Bus-Stresstest ({name}): {args.threads} Threads, {args.duration / 2:.1f} s ...")
+        stress_bus(board_configs, args.duration / 2, args.threads, result)
+    print(f"Controller-Stresstest: {args.threads} Threads, {args.duration:.1f} s ...")
+    stress_controller(args.duration, args.threads, result)
+
+    for key, value in sorted(result.counts.items()):
+        print(f"  {key:<16}{value:>10}")
+    if result.errors:
+        print("\nFEHLER:")
+        for message in result.errors:
+            print(f"  {message}")
+        return 1
+    print("\nOK: keine überlappenden Transaktionen, keine inkonsistenten Zustände")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
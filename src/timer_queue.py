@@ -0,0 +1,85 @@
+import heapq
+import itertools
+import threading
+import time
+import logging
+
+
+class TimerQueue:
+    """Ein Thread für beliebig viele Timer (Min-Heap), je Schlüssel höchstens ein aktiver Timer"""
+
+    def __init__(self, name='timer-queue', logger=None):
+        self.name = name
+        self.logger = logger or logging.getLogger('servo_controller')
+        self._heap = []
+        self._active = {}          # Schlüssel -> Sequenznummer des gültigen Eintrags
+        self._counter = itertools.count()
+        self._cond = threading.Condition()
+        self._thread = None
+        self._running = False
+
+    def start(self):
+        """Startet den Timer-Thread (falls noch nicht gestartet)"""
+        with self._cond:
+            if self._running:
+                return
+            self._running = True
+            self._thread = threading.Thread(target=self._run, name=self.name)
+            self._thread.daemon = True
+            self._thread.start()
+
+    def stop(self):
+        """Stoppt den Timer-Thread; offene Timer verfallen"""
+        with self._cond:
+            self._running = False
+            self._heap.clear()
+            self._active.clear()
+            self._cond.notify()
+            thread = self._thread
+            self._thread = None
+        if thread and thread is not threading.current_thread():
+            thread.join(timeout=1.0)
+
+    def schedule(self, key, delay, callback, *args):
+        """Plant callback(*args) in delay Sekunden; ein bestehender Timer für key wird ersetzt"""
+        self.start()
+        with self._cond:
+            seq = next(self._counter)
+            self._active[key] = seq
+            heapq.heappush(self._heap, (time.monotonic() + delay, seq, key, callback, args))
+            # Nur wecken, wenn der neue Timer der früheste ist
+            if self._heap[0][1] == seq:
+                self._cond.notify()
+
+    def cancel(self, key):
+        """Verwirft den Timer für key (Eintrag bleibt bis zum Ablauf im Heap, wird dann ignoriert)"""
+        with self._cond:
+            return self._active.pop(key, None) is not None
+
+    def pending(self):
+        """Anzahl aktiver Timer"""
+        return len(self._active)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._running:
+                    if not self._heap:
+                        self._cond.wait()
+                        continue
+                    deadline, seq, key, callback, args = self._heap[0]
+                    delay = deadline - time.monotonic()
+                    if delay > 0:
+                        self._cond.wait(delay)
+                        continue
+                    heapq.heappop(self._heap)
+                    if self._active.get(key) == seq:
+                        del self._active[key]
+                        break
+                else:
+                    return
+
+            try:
+                callback(*args)
+            except Exception as e:
+                self.logger.error(f"Fehler im Timer {key}: {e}")
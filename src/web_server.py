@@ -1,21 +1,46 @@
-from flask import Flask, request, jsonify, render_template, send_from_directory
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
 import logging
 from logging.handlers import RotatingFileHandler
-import asyncio
-from functools import wraps
-from servokit_controller import ServoKitController
+from controller_client import create_controller
 import os
 import socket
+import json
+import uuid
+import time
+from concurrent import futures
+import log_queue
+import metrics
+from static_bundle import StaticBundle
+from admission import AdmissionControl, RateLimited
 
-app = Flask(__name__)
+# Weboberfläche und statische Dateien liefert StaticBundle (vorkomprimiert, mit ETag)
+app = Flask(__name__, static_folder=None)
 CORS(app)
 
+# Abstand der Keepalive-Kommentare im Event-Stream (Sekunden)
+SSE_KEEPALIVE = 15
+
+# Maximale Wartezeit beim Long-Polling mit ?since=<version> (Sekunden)
+LONG_POLL_TIMEOUT = 30
+
+# Umgebungsvariable zur Auswahl des Server-Modus ('flask' oder 'aiohttp')
+SERVER_MODE_ENV = 'WEICHEN_SERVER'
+SERVER_MODES = ('flask', 'aiohttp')
+
+HTTP_SECONDS = metrics.histogram('http_request_seconds', 'Bearbeitungszeit von HTTP-Anfragen',
+                                 ('method', 'route', 'status'))
+
 # Logging einrichten
 logger = logging.getLogger('car_motion_system')
 logger.setLevel(logging.INFO)
 
-def setup_logging():
+def setup_logging(log_config=None):
+    """
+    Schreibt Server- und Controller-Logs über einen Hintergrund-Thread in die Log-Datei
+    (Request-Threads reihen Einträge nur ein, Datei-I/O und Formatierung laufen asynchron)
+    """
+    log_config = log_config or {}
     log_dir = os.path.join(os.path.dirname(__file__), 'logs')
     os.makedirs(log_dir, exist_ok=True)
     
@@ -29,7 +54,10 @@ def setup_logging():
         '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
     )
     handler.setFormatter(formatter)
-    logger.addHandler(handler)
+    log_queue.attach(logger, handler)
+    log_queue.attach('servo_controller', handler,
+                     level=log_config.get('LEVEL', 'INFO'),
+                     sample_rate=log_config.get('SAMPLE_RATE', 1))
 
 def get_ip_address():
     """Ermittelt die IP-Adresse des Servers"""
@@ -43,30 +71,181 @@ def get_ip_address():
     except Exception:
         return "127.0.0.1"  # Fallback auf localhost
 
-def async_route(f):
-    @wraps(f)
-    def wrapped(*args, **kwargs):
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
+def servo_summary(state):
+    """Status eines Servos im Format von /api/servos"""
+    return {
+        'position': state.position,
+        'initialized': state.initialized,
+        'error': state.error,
+        'status': state.status,
+        'energized': state.energized,
+        'release_count': state.release_count,
+        'reenergize_count': state.reenergize_count
+    }
+
+def parse_batch(data, num_servos):
+    """
+    Liest Servo-Ziele aus einer Batch-Anfrage: Liste [{"id": 0, "position": "left"}, ...],
+    Map {"0": "left", ...} oder eines davon unter "servos"
+    :return: (Dict {Servo-ID: Richtung}, Dict {Eintrag: Fehlermeldung})
+    """
+    if isinstance(data, dict) and 'servos' in data:
+        data = data['servos']
+    if isinstance(data, dict):
+        items = list(data.items())
+    elif isinstance(data, list):
+        items = [(entry.get('id'), entry.get('position')) if isinstance(entry, dict) else (entry, None)
+                 for entry in data]
+    else:
+        return {}, {'request': 'Erwartet Liste oder Map von Servo-Zielen'}
+
+    directions = {}
+    errors = {}
+    for raw_id, position in items:
         try:
-            return loop.run_until_complete(f(*args, **kwargs))
-        finally:
-            loop.close()
-    return wrapped
+            servo_id = int(raw_id)
+        except (TypeError, ValueError):
+            errors[str(raw_id)] = 'Ungültige Servo-ID'
+            continue
+        if not 0 <= servo_id < num_servos:
+            errors[str(raw_id)] = 'Servo nicht verfügbar'
+        elif position not in ('left', 'right'):
+            errors[str(raw_id)] = 'Ungültige Position'
+        elif servo_id in directions:
+            errors[str(raw_id)] = 'Servo mehrfach angegeben'
+        else:
+            directions[servo_id] = position
+    if not directions and not errors:
+        errors['request'] = 'Keine Servo-Ziele angegeben'
+    return directions, errors
+
+def sse_event(event, data, event_id=None):
+    """Formatiert ein Server-Sent Event"""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data, separators=(',', ':'))}")
+    return "\n".join(lines) + "\n\n"
 
 class WebServer:
     def __init__(self, servo_controller=None):
-        # Erstelle neuen Controller wenn keiner übergeben wurde
-        self.servo_controller = servo_controller or ServoKitController()
-        setup_logging()
+        # Ohne übergebenen Controller: Client des Controller-Daemons bzw. eigener Controller
+        self.servo_controller = servo_controller or create_controller()
+        setup_logging(self.servo_controller.config.get('LOGGING'))
+        
+        # ETags bestehen aus Prozess-Kennung und Status-Version, damit nach einem Neustart
+        # (Version beginnt wieder bei 0) kein veralteter Stand als aktuell gilt
+        self.etag_prefix = uuid.uuid4().hex[:8]
+        self._servos_body = (None, None)
+        
+        # Weboberfläche einmal beim Start einlesen und komprimieren
+        self.static_bundle = StaticBundle()
+        
+        # Token-Buckets pro Client und Servo, faire Warteschlange (None: abgeschaltet)
+        self.admission = AdmissionControl.from_config(
+            self.servo_controller.num_servos, self.servo_controller.config.get('WEB', {}).get('ADMISSION'))
         
         # Routes definieren
         self.setup_routes()
         
+    def wait_for_version(self):
+        """
+        Long-Polling: bei ?since=<version> blockiert die Anfrage, bis der Status neuer als diese
+        Version ist oder das Timeout (?timeout=, höchstens LONG_POLL_TIMEOUT) abläuft
+        :return: aktueller Status-Snapshot
+        """
+        controller = self.servo_controller
+        since = request.args.get('since', type=int)
+        if since is not None:
+            timeout = min(max(request.args.get('timeout', LONG_POLL_TIMEOUT, type=float), 0), LONG_POLL_TIMEOUT)
+            controller.wait_for_state_change(since, timeout)
+        return controller.get_all_servo_status()
+        
+    def conditional_response(self, snapshot, build_body):
+        """
+        Antwort mit ETag/Version; 304 ohne Body, wenn der Client diesen Stand schon hat
+        :param build_body: Callable, das den JSON-Body nur bei Bedarf erzeugt
+        """
+        etag = f"{self.etag_prefix}-{snapshot.version}"
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+        else:
+            response = Response(build_body(), mimetype='application/json')
+        response.set_etag(etag)
+        response.headers['X-State-Version'] = str(snapshot.version)
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
+        
+    def servos_body(self, snapshot):
+        """JSON von /api/servos, einmal pro Status-Version erzeugt und für alle Clients wiederverwendet"""
+        version, body = self._servos_body
+        if version != snapshot.version:
+            servos = {str(i): servo_summary(state) for i, state in enumerate(snapshot)}
+            body = json.dumps(servos)
+            self._servos_body = (snapshot.version, body)
+        return body
+        
+    def admit(self, servo_ids):
+        """
+        Zugangsbegrenzung für einen Stellbefehl: blockiert, bis der Befehl in der fairen
+        Warteschlange an der Reihe ist; RateLimited, wenn er abgewiesen wird
+        """
+        if self.admission is not None:
+            self.admission.acquire(request.remote_addr, servo_ids).result()
+            
+    @staticmethod
+    def rate_limited_response(error):
+        """429 mit Retry-After"""
+        response = jsonify(error.to_dict())
+        response.status_code = 429
+        response.headers['Retry-After'] = error.retry_after_header
+        return response
+        
+    def static_response(self, asset):
+        """Vorberechnete Variante einer Datei passend zu Accept-Encoding (304 bei passendem ETag)"""
+        status, headers, body = asset.respond(request.headers.get('Accept-Encoding'),
+                                              request.headers.get('If-None-Match'))
+        return Response(body, status=status, headers=headers)
+        
+    def render_metrics(self):
+        """
+        Metriken dieses Prozesses plus die des Controller-Daemons, falls der Controller dort läuft
+        (gleichnamige Metriken wie log_queue_depth liefert dann der Daemon)
+        """
+        if not hasattr(self.servo_controller, 'get_metrics'):
+            return metrics.render()
+        remote = self.servo_controller.get_metrics()
+        return metrics.render(exclude=metrics.names(remote)) + remote
+        
     def setup_routes(self):
+        @app.before_request
+        def start_timer():
+            request.environ['metrics.started'] = time.perf_counter()
+            
+        @app.after_request
+        def record_latency(response):
+            started = request.environ.get('metrics.started')
+            if started is not None:
+                route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+                HTTP_SECONDS.observe(time.perf_counter() - started, request.method, route, str(response.status_code))
+            return response
+            
+        @app.route('/metrics')
+        def get_metrics():
+            """Zähler und Histogramme im Prometheus-Textformat"""
+            return Response(self.render_metrics(), content_type=metrics.CONTENT_TYPE)
+            
         @app.route('/')
         def index():
-            return render_template('index.html')
+            return self.static_response(self.static_bundle.index)
+            
+        @app.route('/static/<path:filename>')
+        def static_file(filename):
+            asset = self.static_bundle.get_static(filename)
+            if asset is None:
+                return jsonify({'error': 'Datei nicht gefunden'}), 404
+            return self.static_response(asset)
             
         @app.route('/api/ip')
         def ip():
@@ -77,25 +256,61 @@ class WebServer:
             
         @app.route('/api/servos', methods=['GET'])
         def get_servos():
-            """Liefert Status aller Servos"""
+            """Liefert Status aller Servos (ETag/304, Long-Polling mit ?since=<version>)"""
             try:
-                servos = {}
-                for i in range(16):
-                    state = self.servo_controller.servo_states.get(str(i), {})
-                    servos[str(i)] = {
-                        'position': state.get('position', 'unknown'),
-                        'initialized': state.get('initialized', False),
-                        'error': state.get('error', False),
-                        'status': state.get('status', 'unknown')
-                    }
-                return jsonify(servos)
+                # Ein Snapshot für alle Servos: konsistent, ohne die Schreiber zu blockieren
+                snapshot = self.wait_for_version()
+                return self.conditional_response(snapshot, lambda: self.servos_body(snapshot))
             except Exception as e:
-                logger.error(f"Fehler beim Abrufen der Servos: {e}")
+                logger.error("Fehler beim Abrufen der Servos: %s", e)
                 return jsonify({'error': str(e)}), 500
                 
+        @app.route('/api/events')
+        def servo_events():
+            """
+            Server-Sent Events: zuerst der vollständige Status ('snapshot'), danach nur geänderte
+            Servos ('delta'). Die Event-ID ist die Status-Version; nach einem Verbindungsabbruch
+            schickt der Browser sie als Last-Event-ID und erhält nur die verpassten Änderungen.
+            """
+            controller = self.servo_controller
+            last_id = request.headers.get('Last-Event-ID') or request.args.get('since')
+            previous = None
+            if last_id is not None:
+                try:
+                    previous = controller.get_state_at(int(last_id))
+                except ValueError:
+                    previous = None
+            
+            def stream():
+                base = previous
+                # Retry-Intervall für den Browser und sofortige Antwort, damit Proxys nicht puffern
+                yield "retry: 2000\n\n"
+                while True:
+                    snapshot = controller.wait_for_state_change(
+                        base.version if base is not None else -1, timeout=SSE_KEEPALIVE
+                    )
+                    if snapshot is None:
+                        # Kommentarzeile hält die Verbindung offen und erkennt getrennte Clients
+                        yield ": keepalive\n\n"
+                        continue
+                    changed = snapshot.changed_since(base)
+                    event = 'delta' if base is not None else 'snapshot'
+                    base = snapshot
+                    if not changed:
+                        continue
+                    yield sse_event(event, {str(i): servo_summary(snapshot[i]) for i in changed}, snapshot.version)
+            
+            response = Response(stream_with_context(stream()), mimetype='text/event-stream')
+            response.headers['Cache-Control'] = 'no-cache'
+            response.headers['X-Accel-Buffering'] = 'no'
+            return response
+                
         @app.route('/api/servo/<int:servo_id>', methods=['POST'])
         def set_servo(servo_id):
-            """Setzt die Position eines Servos"""
+            """
+            Setzt die Position eines Servos: antwortet sofort mit 202 und dem Stellauftrag,
+            dessen Fortschritt unter /api/jobs/<id> (oder per Event-Stream) verfolgt werden kann
+            """
             try:
                 data = request.get_json()
                 position = data.get('position')
@@ -103,44 +318,123 @@ class WebServer:
                 if position not in ['left', 'right']:
                     return jsonify({'error': 'Ungültige Position'}), 400
                     
-                self.servo_controller.move_servo(servo_id, position)
-                return jsonify({'status': 'success'})
+                # Servo-ID vor der Zugangsbegrenzung prüfen: ungültige Anfragen verbrauchen keine Tokens
+                if not 0 <= servo_id < self.servo_controller.num_servos:
+                    return jsonify({'error': f"Ungültige Servo-Nummer: {servo_id}"}), 400
+                    
+                self.admit((servo_id,))
+                job = self.servo_controller.submit_move(servo_id, position)
+                response = jsonify({'status': 'accepted', 'job': job.to_dict()})
+                response.status_code = 202
+                response.headers['Location'] = f"/api/jobs/{job.id}"
+                return response
                 
+            except RateLimited as e:
+                return self.rate_limited_response(e)
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
             except Exception as e:
-                logger.error(f"Fehler beim Setzen von Servo {servo_id}: {e}")
+                logger.error("Fehler beim Setzen von Servo %s: %s", servo_id, e)
+                return jsonify({'error': str(e)}), 500
+                
+        @app.route('/api/jobs/<int:job_id>', methods=['GET'])
+        def get_job(job_id):
+            """Status eines Stellauftrags; mit ?wait=<s> (max. LONG_POLL_TIMEOUT) bis zum Abschluss warten"""
+            job = self.servo_controller.get_move_job(job_id)
+            if job is None:
+                return jsonify({'error': 'Auftrag nicht gefunden'}), 404
+            wait = request.args.get('wait', 0, type=float)
+            if wait > 0 and not job.finished:
+                futures.wait([job.future], timeout=min(wait, LONG_POLL_TIMEOUT))
+            return jsonify(job.to_dict())
+                
+        @app.route('/api/servos/batch', methods=['POST'])
+        def set_servos_batch():
+            """
+            Setzt mehrere Servos mit einer Anfrage: alle Angaben werden vorab geprüft und dann
+            gemeinsam (gleichzeitig, im Rahmen des Stromkontingents) ausgeführt
+            """
+            started = time.perf_counter()
+            try:
+                directions, errors = parse_batch(request.get_json(silent=True), self.servo_controller.num_servos)
+                if errors:
+                    return jsonify({'error': 'Ungültige Anfrage, kein Servo bewegt', 'errors': errors}), 400
+                
+                self.admit(list(directions))
+                results = self.servo_controller.move_servos(directions)
+                failed = sum(1 for result in results.values() if result.get('status') != 'success')
+                return jsonify({
+                    'status': 'success' if not failed else ('error' if failed == len(results) else 'partial'),
+                    'results': {str(servo_id): result for servo_id, result in results.items()},
+                    'wall_time_ms': round((time.perf_counter() - started) * 1000, 1)
+                })
+                
+            except RateLimited as e:
+                return self.rate_limited_response(e)
+            except Exception as e:
+                logger.error("Fehler beim Setzen mehrerer Servos: %s", e)
                 return jsonify({'error': str(e)}), 500
                 
         @app.route('/api/servo/<int:servo_id>', methods=['GET'])
         def get_servo(servo_id):
             """Liefert Status eines Servos"""
             try:
-                # Prüfe ob Servo auf zweitem Board liegt und dieses verfügbar ist
-                if servo_id >= 16 and self.servo_controller.kit2 is None:
-                    return jsonify({'status': 'unavailable', 'message': 'Servo nicht verfügbar (kein zweites Board)'})
+                # Prüfe ob der Servo auf einem vorhandenen Board liegt
+                if servo_id >= self.servo_controller.num_servos:
+                    return jsonify({'status': 'unavailable', 'message': 'Servo nicht verfügbar (kein Board für diesen Kanal)'})
                     
-                status = self.servo_controller.get_servo_status(servo_id)
-                return jsonify(status)
+                snapshot = self.wait_for_version()
+                return self.conditional_response(snapshot, lambda: json.dumps(snapshot[servo_id].to_dict()))
             except Exception as e:
                 return jsonify({'status': 'error', 'message': str(e)})
 
 def init_controller():
-    """Initialisiert den ServoController"""
+    """Initialisiert den ServoController (Client des Controller-Daemons, falls dieser läuft)"""
     try:
-        return ServoKitController()
+        return create_controller()
     except Exception as e:
         logger.error(f"Fehler bei der Initialisierung des ServoControllers: {e}")
         raise
 
-def run_server(host='0.0.0.0', port=5000, debug=False):
-    """Startet den Car Motion System Server"""
+def get_server_mode(config=None):
+    """Ermittelt den Server-Modus: Umgebungsvariable vor config.json (WEB.MODE), Standard Flask"""
+    mode = os.environ.get(SERVER_MODE_ENV)
+    if not mode and config:
+        mode = config.get('WEB', {}).get('MODE')
+    mode = (mode or 'flask').lower()
+    if mode not in SERVER_MODES:
+        raise ValueError(f"Unbekannter Server-Modus: {mode}")
+    return mode
+
+def run_server(host='0.0.0.0', port=5000, debug=False, mode=None, threaded=True, admission=True):
+    """
+    Startet den Car Motion System Server
+    :param mode: 'flask' (ein Thread pro Anfrage) oder 'aiohttp' (eine dauerhaft laufende Event-Loop)
+    :param threaded: Flask bearbeitet Anfragen parallel (False: nacheinander, nur für Lasttests)
+    :param admission: Zugangsbegrenzung der Stellbefehle (False nur für Lasttests)
+    """
     try:
         servo_controller = init_controller()
+        mode = mode or get_server_mode(servo_controller.config)
+        if mode == 'aiohttp':
+            from async_server import run_async_server
+            run_async_server(servo_controller, host=host, port=port, admission=admission)
+            return
         server = WebServer(servo_controller)
+        if not admission:
+            server.admission = None
         logger.info(f"Car Motion System startet auf http://{get_ip_address()}:{port}")
-        app.run(host=host, port=port, debug=debug)
+        app.run(host=host, port=port, debug=debug, threaded=threaded)
     except Exception as e:
         logger.error(f"Fehler beim Starten des Servers: {e}")
         raise
 
 if __name__ == '__main__':
-    run_server()
+    import argparse
+    parser = argparse.ArgumentParser(description='Web-Server der Weichensteuerung')
+    parser.add_argument('--mode', choices=SERVER_MODES, help=f'Server-Modus (Standard: ${SERVER_MODE_ENV} oder flask)')
+    parser.add_argument('--port', type=int, default=5000)
+    parser.add_argument('--single-thread', action='store_true', help='Flask: Anfragen nacheinander bearbeiten (Lasttest)')
+    parser.add_argument('--no-admission', action='store_true', help='Stellbefehle nicht begrenzen (Lasttest)')
+    args = parser.parse_args()
+    run_server(port=args.port, mode=args.mode, threaded=not args.single_thread, admission=not args.no_admission)
@@ -23,6 +23,19 @@ fi
 # Warte auf Netzwerk
 sleep 10
 
+# Starte den Controller-Daemon (einziger Prozess mit Zugriff auf die Servo-Boards)
+export WEICHEN_SOCKET=/tmp/weichensteuerung.sock
+python3 controller_daemon.py &
+
+# Warte bis der Daemon bereit ist (höchstens 30 Sekunden)
+for i in $(seq 1 60); do
+    [ -S "$WEICHEN_SOCKET" ] && break
+    sleep 0.5
+done
+
+# GUI und Webserver verbinden sich als Clients mit dem Daemon
+export WEICHEN_CONTROLLER=daemon
+
 # Starte die GUI
 python3 main.py &
 